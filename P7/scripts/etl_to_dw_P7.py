@@ -1,136 +1,35 @@
-import pandas as pd
-import sqlite3
-import pathlib
-import sys
-
-# For local imports, temporarily add project root to sys.path
-PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
-if str(PROJECT_ROOT) not in sys.path:
-    sys.path.append(str(PROJECT_ROOT))
-
-# Constants
-DW_DIR = pathlib.Path("P7").joinpath("dw")
-DB_PATH = DW_DIR.joinpath("smart_sales_P7.db")
-PREPARED_DATA_DIR = pathlib.Path("P7").joinpath("data")
+r"""
+P7 data warehouse loader
+File: P7/scripts/etl_to_dw_P7.py
 
-def create_schema(cursor: sqlite3.Cursor) -> None:
-    """Create tables in the data warehouse if they don't exist."""
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS customer (
-            customer_id INTEGER PRIMARY KEY,
-            name TEXT,
-            region TEXT,
-            join_date TEXT
-        );
-    """)
+The P7 schema (customer, product with unit cost and profit, and sale with
+sale_month) is declared in the "p7" entry of WAREHOUSE_MANIFESTS in
+scripts/etl_to_dw.py, and loaded through the same bulk path as the main
+warehouse. This script is the same as:
 
-    cursor.execute("""   
-         CREATE TABLE IF NOT EXISTS product (
-            product_id INTEGER PRIMARY KEY,
-            product_name TEXT,
-            category TEXT,
-            unit_price REAL,
-            unit_cost REAL,
-            unit_profit REAL
-        );
-    """)
+    python3 scripts/etl_to_dw.py --deployment p7
 
-    cursor.execute("""   
-        CREATE TABLE IF NOT EXISTS sale (
-            sale_id INTEGER PRIMARY KEY,
-            sale_date TEXT,
-            sale_month TEXT,
-            customer_id INTEGER,
-            product_id INTEGER,
-            store_id INTEGER,
-            campaign_id INTEGER,
-            sale_amount_usd REAL,
-            FOREIGN KEY (customer_id) REFERENCES customer (customer_id),
-            FOREIGN KEY (product_id) REFERENCES product (product_id)
-        );
-   """)
-                   
-def delete_existing_records(cursor: sqlite3.Cursor) -> None:
-    """Delete all existing records from the customer, product, and sale tables."""
-    cursor.execute("DELETE FROM customer")
-    cursor.execute("DELETE FROM product")
-    cursor.execute("DELETE FROM sale")
+To run it, open a terminal in the root project folder:
 
-def insert_customers(customers_df: pd.DataFrame, cursor: sqlite3.Cursor) -> None:
-    """Insert customer data into the customer table."""
-      
-    try:
-        # Rename columns to match the database schema
-        customers_df = customers_df.rename(columns={
-            "CustomerID": "customer_id",
-            "Name": "name",
-            "Region": "region",
-            "JoinDate": "join_date"
-        })
-        customers_df.to_sql("customer", cursor.connection, if_exists="append", index=False)
-    except Exception as e:
-        print(f"Error while inserting customers: {e}")
-    
-def insert_products(products_df: pd.DataFrame, cursor: sqlite3.Cursor) -> None:
-    """Insert product data into the product table."""
-      
-    try:
-        # Rename columns to match the database schema
-        products_df = products_df.rename(columns={
-            "ProductID": "product_id",
-            "ProductName": "product_name",
-            "Category": "category",
-            "UnitPrice": "unit_price",
-            "UnitCost": "unit_cost",
-            "UnitProfit": "unit_profit"
-        })
-        products_df.to_sql("product", cursor.connection, if_exists="append", index=False)
-    except Exception as e:
-        print(f"Error while inserting products: {e}")
+py P7\scripts\etl_to_dw_P7.py
+python3 P7/scripts/etl_to_dw_P7.py --incremental
+"""
 
-def insert_sales(sales_df: pd.DataFrame, cursor: sqlite3.Cursor) -> None:
-    """Insert sales data into the sale table."""
-      
-    try:
-        # Rename columns to match the database schema
-        sales_df = sales_df.rename(columns={
-            "TransactionID": "sale_id",
-            "SaleDate": "sale_date",
-            "SaleMonth": "sale_month",
-            "CustomerID": "customer_id",
-            "ProductID": "product_id",
-            "StoreID": "store_id",
-            "CampaignID": "campaign_id",
-            "SaleAmount": "sale_amount_usd"
-        })
-        sales_df.to_sql("sale", cursor.connection, if_exists="append", index=False)
-    except Exception as e:
-        print(f"Error while inserting sales: {e}")
-
-def load_data_to_db() -> None:
-    try:
-        # Connect to SQLite – will create the file if it doesn't exist
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+import pathlib
+import sys
 
-        # Create schema and clear existing records
-        create_schema(cursor)
-        delete_existing_records(cursor)
+# For local imports, temporarily add project root to sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
 
-        # Load prepared data using pandas
-        customers_df = pd.read_csv(PREPARED_DATA_DIR.joinpath("customers_data_P7_prepared.csv"))
-        products_df = pd.read_csv(PREPARED_DATA_DIR.joinpath("products_data_P7_prepared.csv"))
-        sales_df = pd.read_csv(PREPARED_DATA_DIR.joinpath("sales_data_P7_prepared.csv"))
-          
-        # Insert data into the database
-        insert_customers(customers_df, cursor)
-        insert_products(products_df, cursor)
-        insert_sales(sales_df,cursor)
+from scripts.etl_to_dw import WAREHOUSE_MANIFESTS, load_data_to_db  # noqa: E402
 
-        conn.commit()
-    finally:
-        if conn:
-            conn.close()
+# Constants
+MANIFEST = WAREHOUSE_MANIFESTS["p7"]
+DW_DIR = MANIFEST.db_path.parent
+DB_PATH = MANIFEST.db_path
+PREPARED_DATA_DIR = MANIFEST.prepared_dir
 
 if __name__ == "__main__":
-    load_data_to_db()
\ No newline at end of file
+    load_data_to_db(incremental="--incremental" in sys.argv, manifest=MANIFEST)
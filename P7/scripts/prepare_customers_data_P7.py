@@ -39,6 +39,15 @@ def save_prepared_data(df: pd.DataFrame, file_name: str) -> None:
     df.to_csv(file_path, index=False)
     logger.info(f"Data saved to {file_path}")
 
+def clean_customers_data(df_customers: pd.DataFrame) -> pd.DataFrame:
+    """Apply the P7 customers cleaning steps."""
+    df_customers.columns = df_customers.columns.str.strip()  # Clean column names
+    df_customers = df_customers.drop_duplicates()            # Remove duplicates
+
+    df_customers['Name'] = df_customers['Name'].str.strip()  # Trim whitespace from column values
+    df_customers = df_customers.dropna(subset=['CustomerID', 'Name'])  # Drop rows missing critical info
+    return df_customers
+
 def main() -> None:
     """Main function for pre-processing customer, product, and sales data."""
     logger.info("======================")
@@ -50,12 +59,7 @@ def main() -> None:
     logger.info("========================")
 
     df_customers = read_raw_data("customers_data_P7.csv")
-
-    df_customers.columns = df_customers.columns.str.strip()  # Clean column names
-    df_customers = df_customers.drop_duplicates()            # Remove duplicates
-
-    df_customers['Name'] = df_customers['Name'].str.strip()  # Trim whitespace from column values
-    df_customers = df_customers.dropna(subset=['CustomerID', 'Name'])  # Drop rows missing critical info
+    df_customers = clean_customers_data(df_customers)
 
     save_prepared_data(df_customers, "customers_data_P7_prepared.csv")
    
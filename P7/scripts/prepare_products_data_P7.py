@@ -40,6 +40,15 @@ def save_prepared_data(df: pd.DataFrame, file_name: str) -> None:
     df.to_csv(file_path, index=False)
     logger.info(f"Data saved to {file_path}")
 
+def clean_products_data(df_products: pd.DataFrame) -> pd.DataFrame:
+    """Apply the P7 products cleaning steps."""
+    df_products.columns = df_products.columns.str.strip()  # Clean column names
+    df_products = df_products.drop_duplicates()            # Remove duplicates
+
+    df_products['ProductName'] = df_products['ProductName'].str.strip()  # Trim whitespace from column values
+    df_products = df_products.dropna(subset=['ProductID', 'ProductName'])  # Drop rows missing critical info
+    return df_products
+
 def main() -> None:
     """Main function for pre-processing customer, product, and sales data."""
     logger.info("======================")
@@ -51,12 +60,7 @@ def main() -> None:
     logger.info("========================")
 
     df_products = read_raw_data("products_data_P7.csv")
-
-    df_products.columns = df_products.columns.str.strip()  # Clean column names
-    df_products = df_products.drop_duplicates()            # Remove duplicates
-
-    df_products['ProductName'] = df_products['ProductName'].str.strip()  # Trim whitespace from column values
-    df_products = df_products.dropna(subset=['ProductID', 'ProductName'])  # Drop rows missing critical info
+    df_products = clean_products_data(df_products)
        
     #scrubber_products = DataScrubber(df_products)
     #scrubber_products.check_data_consistency_before_cleaning()
@@ -9,6 +9,10 @@ This script loads raw CSV files from the 'P7/data/' directory, cleans and prepar
 and saves the prepared data to 'P7/data/'.
 The data preparation steps include removing duplicates, handling missing values, 
 trimming whitespace, and more.
+
+Run the customers and products scripts first: sales are checked against their
+prepared files, and sales with an unknown CustomerID or ProductID are moved to
+P7/data/quarantine/sales_data_P7_orphans.csv.
 """
 
 import pathlib
@@ -22,11 +26,19 @@ if str(PROJECT_ROOT) not in sys.path:
 
 # Now we can import local modules
 from utils.logger import logger  # noqa: E402
+from scripts.data_prep import enforce_foreign_keys, load_key_indexes  # noqa: E402
 
 # Constants
 DATA_DIR: pathlib.Path = PROJECT_ROOT.joinpath("P7")
 RAW_DATA_DIR: pathlib.Path = DATA_DIR.joinpath("data")
 PREPARED_DATA_DIR: pathlib.Path = DATA_DIR.joinpath("data")
+ORPHANS_PATH: pathlib.Path = PREPARED_DATA_DIR.joinpath("quarantine").joinpath("sales_data_P7_orphans.csv")
+
+# Foreign key column -> (prepared file of the referenced table, its key column)
+FOREIGN_KEYS = {
+    "CustomerID": (PREPARED_DATA_DIR.joinpath("customers_data_P7_prepared.csv"), "CustomerID"),
+    "ProductID": (PREPARED_DATA_DIR.joinpath("products_data_P7_prepared.csv"), "ProductID"),
+}
 
 def read_raw_data(file_name: str) -> pd.DataFrame:
     """Read raw data from CSV."""
@@ -39,6 +51,15 @@ def save_prepared_data(df: pd.DataFrame, file_name: str) -> None:
     df.to_csv(file_path, index=False)
     logger.info(f"Data saved to {file_path}")
 
+def clean_sales_data(df_sales: pd.DataFrame) -> pd.DataFrame:
+    """Apply the P7 sales cleaning steps."""
+    df_sales.columns = df_sales.columns.str.strip()  # Clean column names
+    df_sales = df_sales.drop_duplicates()            # Remove duplicates
+
+    df_sales['SaleDate'] = pd.to_datetime(df_sales['SaleDate'], errors='coerce')  # Ensure sale_date is datetime
+    df_sales = df_sales.dropna(subset=['TransactionID','CustomerID','ProductID','StoreID', 'SaleDate'])  # Drop rows missing key information
+    return df_sales
+
 def main() -> None:
     """Main function for pre-processing customer, product, and sales data."""
     logger.info("======================")
@@ -50,13 +71,9 @@ def main() -> None:
     logger.info("========================")
 
     df_sales = read_raw_data("sales_data_P7.csv")
+    df_sales = clean_sales_data(df_sales)
+    df_sales = enforce_foreign_keys(df_sales, load_key_indexes(FOREIGN_KEYS), ORPHANS_PATH)
 
-    df_sales.columns = df_sales.columns.str.strip()  # Clean column names
-    df_sales = df_sales.drop_duplicates()            # Remove duplicates
-
-    df_sales['SaleDate'] = pd.to_datetime(df_sales['SaleDate'], errors='coerce')  # Ensure sale_date is datetime
-    df_sales = df_sales.dropna(subset=['TransactionID','CustomerID','ProductID','StoreID', 'SaleDate'])  # Drop rows missing key information
-    
     save_prepared_data(df_sales, "sales_data_P7_prepared.csv")
 
     logger.info("======================")
@@ -0,0 +1,133 @@
+r"""
+Benchmark: cube queries while a load is writing, with and without the warehouse access layer
+File: benchmarks/benchmark_concurrent_reads.py
+
+Creates a throwaway SQLite warehouse with synthetic sale facts (see
+benchmark_sale_indexes.fill_sales()). A writer thread then reloads the sale table
+several times, each reload one transaction like etl_to_dw.load_data_to_db(). Meanwhile,
+reader threads run the month x product rollup over and over. This runs twice:
+
+- legacy: rollback journal, and a fresh sqlite3.connect() per query (the old code path)
+- pooled: WAL mode and busy timeout from connect_writer(), readers from scripts/warehouse.reader()
+
+For each run it reports completed reads, "database is locked" errors, and read latency.
+
+To run, open a terminal in the root project folder:
+
+    py benchmarks\benchmark_concurrent_reads.py --rows 1000000
+    python3 benchmarks/benchmark_concurrent_reads.py --rows 1000000 --readers 4 --loads 3
+"""
+
+import argparse
+import pathlib
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from benchmarks.benchmark_sale_indexes import fill_sales  # noqa: E402
+from scripts.etl_to_dw import create_schema  # noqa: E402
+from scripts.warehouse import close_pools, connect_writer, reader  # noqa: E402
+
+ROLLUP_SQL = """
+    SELECT CAST(strftime('%m', sale_date) AS INTEGER) AS Month, product_id, SUM(sale_amount_usd), COUNT(*)
+    FROM sale GROUP BY 1, 2
+"""
+
+
+def run(db_path: pathlib.Path, pooled: bool, rows: int, readers: int, loads: int) -> Dict[str, float]:
+    """Reload the sale table loads times while readers query it; return read counts and latencies."""
+    if pooled:
+        writer = connect_writer(db_path, isolation_level=None)
+    else:
+        writer = sqlite3.connect(db_path, isolation_level=None)
+        writer.execute("PRAGMA journal_mode = DELETE")
+    cursor = writer.cursor()
+
+    done = threading.Event()
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def read_loop() -> None:
+        while not done.is_set():
+            start = time.perf_counter()
+            try:
+                if pooled:
+                    with reader(db_path) as conn:
+                        conn.execute(ROLLUP_SQL).fetchall()
+                else:
+                    conn = sqlite3.connect(db_path)
+                    try:
+                        conn.execute(ROLLUP_SQL).fetchall()
+                    finally:
+                        conn.close()
+            except sqlite3.OperationalError:
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=read_loop) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    for _ in range(loads):
+        cursor.execute("BEGIN")
+        cursor.execute("DELETE FROM sale")
+        fill_sales(cursor, rows)
+        cursor.execute("COMMIT")
+    load_seconds = time.perf_counter() - started
+    done.set()
+    for thread in threads:
+        thread.join()
+    writer.close()
+    close_pools()
+
+    return {
+        "reads": len(latencies),
+        "errors": errors[0],
+        "median": statistics.median(latencies) if latencies else float("nan"),
+        "max": max(latencies, default=float("nan")),
+        "load_seconds": load_seconds,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark reads during a warehouse load.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--loads", type=int, default=3)
+    args = parser.parse_args()
+
+    results = {}
+    for mode, pooled in (("legacy", False), ("pooled", True)):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = pathlib.Path(tmp).joinpath("bench.db")
+            conn = sqlite3.connect(db_path)
+            create_schema(conn.cursor())
+            fill_sales(conn.cursor(), args.rows)
+            conn.commit()
+            conn.close()
+            results[mode] = run(db_path, pooled, args.rows, args.readers, args.loads)
+
+    print(f"\nrows={args.rows:,} readers={args.readers} loads={args.loads}")
+    print(f"{'mode':<8}{'reads':>8}{'locked':>8}{'median s':>10}{'max s':>10}{'load s':>10}")
+    for mode, result in results.items():
+        print(
+            f"{mode:<8}{result['reads']:>8}{result['errors']:>8}{result['median']:>10.3f}"
+            f"{result['max']:>10.3f}{result['load_seconds']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
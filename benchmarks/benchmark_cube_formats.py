@@ -0,0 +1,91 @@
+r"""
+Benchmark: loading the OLAP cube from CSV vs. the columnar .npcube bundle
+File: benchmarks/benchmark_cube_formats.py
+
+Builds a synthetic cube shaped like monthlysales_olap_cube.csv, writes it both
+as CSV and with write_cube_to_npy_bundle(), and times
+olap_goal_sales_by_month.load_olap_cube() on each.
+
+To run, open a terminal in the root project folder:
+
+    py benchmarks\benchmark_cube_formats.py --cells 1000000
+    python3 benchmarks/benchmark_cube_formats.py --cells 1000000
+"""
+
+import argparse
+import pathlib
+import sys
+import tempfile
+import time
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+import scripts.olap.olap_cubing as olap_cubing  # noqa: E402
+from scripts.olap.olap_cubing import MONTH_NAMES, write_cube_to_npy_bundle  # noqa: E402
+from scripts.olap.olap_goal_sales_by_month import load_olap_cube  # noqa: E402
+
+
+def make_cube(cells: int, seed: int = 42) -> pd.DataFrame:
+    """Create a synthetic cube with the same columns as the monthly sales cube."""
+    rng = np.random.default_rng(seed)
+    months = rng.integers(1, 13, cells).astype("int32")
+    sizes = rng.integers(1, 20, cells)
+    sums = rng.uniform(10, 10_000, cells).round(2)
+    stops = np.cumsum(sizes)
+    return pd.DataFrame({
+        "Month": months,
+        "MonthName": np.array(MONTH_NAMES)[months - 1],
+        "product_id": rng.integers(100, 100 + cells, cells),
+        "sale_amount_usd_sum": sums,
+        "sale_amount_usd_mean": sums / sizes,
+        "sale_amount_usd_min": (sums / sizes / 2).round(2),
+        "sale_amount_usd_max": (sums / sizes * 2).round(2),
+        "sale_id_count": sizes,
+        "sale_ids_start": stops - sizes,
+        "sale_ids_stop": stops,
+    })
+
+
+def best_time(func, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark CSV vs. npy bundle cube loading.")
+    parser.add_argument("--cells", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    cube = make_cube(args.cells)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = pathlib.Path(tmp)
+        csv_dir = tmp_dir.joinpath("csv_only")
+        csv_dir.mkdir()
+        csv_path = csv_dir.joinpath("cube.csv")
+        cube.to_csv(csv_path, index=False)
+        with mock.patch.object(olap_cubing, "OLAP_OUTPUT_DIR", tmp_dir):
+            bundle_path = write_cube_to_npy_bundle(cube, "cube.npcube")
+
+        csv_time = best_time(lambda: load_olap_cube(csv_path))
+        bundle_time = best_time(lambda: load_olap_cube(bundle_path))
+        csv_mib = csv_path.stat().st_size / 2**20
+        bundle_mib = sum(f.stat().st_size for f in bundle_path.iterdir()) / 2**20
+
+    print(f"cells={args.cells:,}")
+    print(f"csv:    {csv_time:8.4f} s  {csv_mib:8.1f} MiB on disk")
+    print(f"npcube: {bundle_time:8.4f} s  {bundle_mib:8.1f} MiB on disk  ({csv_time / bundle_time:,.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
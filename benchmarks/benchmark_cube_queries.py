@@ -0,0 +1,89 @@
+r"""
+Benchmark: Cube queries vs. pandas groupby over the cube cells
+File: benchmarks/benchmark_cube_queries.py
+
+Builds a synthetic cube shaped like monthlysales_olap_cube.csv (see
+benchmark_cube_formats.make_cube()), indexes it once as a Cube, and times the
+goal script's questions plus a slice and a dice: with a pandas groupby or
+boolean mask over all cells, with a first (uncached) Cube query, and with a
+repeated (cached) Cube query. Roll ups aggregate every measure both ways.
+
+To run, open a terminal in the root project folder:
+
+    py benchmarks\benchmark_cube_queries.py --cells 1000000
+    python3 benchmarks/benchmark_cube_queries.py --cells 100000
+"""
+
+import argparse
+import pathlib
+import sys
+import time
+from typing import Callable
+
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from benchmarks.benchmark_cube_formats import make_cube  # noqa: E402
+from scripts.olap.olap_cube import Cube  # noqa: E402
+
+
+def best_time(func: Callable[[], pd.DataFrame], repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark Cube queries against pandas groupby.")
+    parser.add_argument("--cells", type=int, default=100_000)
+    args = parser.parse_args()
+
+    cells = make_cube(args.cells).drop(columns=["sale_amount_usd_mean"])
+    cells["product_id"] = cells["product_id"] % 500 + 100  # A realistic number of products
+    start = time.perf_counter()
+    cube = Cube(cells)
+    index_seconds = time.perf_counter() - start
+
+    merge = {"sale_amount_usd_sum": "sum", "sale_amount_usd_min": "min", "sale_amount_usd_max": "max", "sale_id_count": "sum"}
+    march = cells["MonthName"] == "March"
+    queries = {
+        "sales by Month": (
+            lambda: cells.groupby("Month").agg(merge),
+            lambda: cube.rollup(["Month"]),
+        ),
+        "sales by Month, product": (
+            lambda: cells.groupby(["Month", "product_id"]).agg(merge),
+            lambda: cube.drill_down(["Month"], "product_id"),
+        ),
+        "March by product": (
+            lambda: cells[march].groupby("product_id").agg(merge),
+            lambda: cube.rollup(["product_id"], {"MonthName": "March"}),
+        ),
+        "slice product 123": (
+            lambda: cells[cells["product_id"] == 123],
+            lambda: cube.slice("product_id", 123),
+        ),
+        "dice March, 3 products": (
+            lambda: cells[march & cells["product_id"].isin([101, 123, 456])],
+            lambda: cube.dice({"MonthName": "March", "product_id": [101, 123, 456]}),
+        ),
+    }
+
+    print(f"cells={args.cells:,}  indexed in {index_seconds:.3f} s")
+    print(f"{'query':<26}{'pandas (ms)':>13}{'cube (ms)':>12}{'cached (ms)':>13}")
+    for name, (pandas_query, cube_query) in queries.items():
+        pandas_ms = best_time(pandas_query) * 1e3
+        cube_ms = best_time(lambda: (cube.cache.clear(), cube_query())) * 1e3
+        cached_ms = best_time(cube_query) * 1e3
+        print(f"{name:<26}{pandas_ms:>13.3f}{cube_ms:>12.3f}{cached_ms:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
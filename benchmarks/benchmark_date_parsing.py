@@ -0,0 +1,70 @@
+r"""
+Benchmark: pd.to_datetime() vs. DataScrubber.parse_dates() on sales dates
+File: benchmarks/benchmark_date_parsing.py
+
+Builds a SaleDate column of m/d/yyyy strings like data/raw/sales_data.csv
+(a year of distinct dates, many rows, a few malformed values) and parses it
+with pd.to_datetime(errors='coerce'), as data_prep.py used to, and with
+DataScrubber.parse_dates(errors='coerce'), on strings and on a categorical column.
+
+To run, open a terminal in the root project folder:
+
+    py benchmarks\benchmark_date_parsing.py --rows 10000000
+    python3 benchmarks/benchmark_date_parsing.py --rows 10000000
+"""
+
+import argparse
+import pathlib
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from scripts.data_scrubber import DataScrubber  # noqa: E402
+
+
+def make_sale_dates(rows: int, seed: int = 42) -> pd.Series:
+    """Create m/d/yyyy date strings, with the malformed values found in the raw sales file mixed in."""
+    rng = np.random.default_rng(seed)
+    dates = [f"{d.month}/{d.day}/{d.year}" for d in pd.date_range("2024-01-01", "2024-12-31")]
+    values = rng.choice(np.array(dates + ["2/60/2024", "13/6/2024"], dtype=object), rows)
+    return pd.Series(values, name="SaleDate")
+
+
+def best_time(func, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark sales date parsing.")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    sale_dates = make_sale_dates(args.rows)
+    pd.testing.assert_series_equal(
+        DataScrubber.parse_dates(sale_dates, errors="coerce"), pd.to_datetime(sale_dates, errors="coerce")
+    )
+
+    baseline = best_time(lambda: pd.to_datetime(sale_dates, errors="coerce"))
+    engine = best_time(lambda: DataScrubber.parse_dates(sale_dates, errors="coerce"))
+    categorical_dates = sale_dates.astype("category")  # As read with dtype={"SaleDate": "category"}
+    categorical = best_time(lambda: DataScrubber.parse_dates(categorical_dates, errors="coerce"))
+    print(f"rows={args.rows:,}  distinct={sale_dates.nunique():,}")
+    print(f"pd.to_datetime:           {baseline:8.3f} s")
+    print(f"DataScrubber.parse_dates: {engine:8.3f} s  ({baseline / engine:.1f}x faster)")
+    print(f"  on a categorical column: {categorical:7.3f} s  ({baseline / categorical:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+r"""
+Benchmark: foreign key validation throughput on streaming sales chunks
+File: benchmarks/benchmark_foreign_keys.py
+
+Builds KeyIndex objects over synthetic customer and product keys once, then checks
+chunks of synthetic sales (float-ified IDs, with a small share of orphans) with
+DataScrubber.split_foreign_key_orphans(), and reports rows per second. A plain
+pandas Series.isin() check of the same chunks is timed for comparison.
+
+To run, open a terminal in the root project folder:
+
+    py benchmarks\benchmark_foreign_keys.py --rows 10000000
+    python3 benchmarks/benchmark_foreign_keys.py --rows 10000000 --chunk-rows 1000000
+"""
+
+import argparse
+import pathlib
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from scripts.data_scrubber import DataScrubber, KeyIndex  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark vectorized foreign key validation.")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    parser.add_argument("--customers", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=10_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    customers = pd.Series(np.arange(1001, 1001 + args.customers))
+    products = pd.Series(np.arange(101, 101 + args.products))
+    start = time.perf_counter()
+    references = {"CustomerID": KeyIndex(customers), "ProductID": KeyIndex(products)}
+    index_seconds = time.perf_counter() - start
+
+    chunks = []
+    for first in range(0, args.rows, args.chunk_rows):
+        n = min(args.chunk_rows, args.rows - first)
+        chunks.append(pd.DataFrame({
+            "TransactionID": np.arange(first, first + n),
+            "CustomerID": rng.integers(1001, 1001 + int(args.customers * 1.001), n).astype("float64"),  # ~0.1% orphans
+            "ProductID": rng.integers(101, 101 + args.products, n).astype("float64"),
+            "SaleAmount": rng.uniform(1, 1000, n).round(2),
+        }))
+
+    start = time.perf_counter()
+    orphan_count = 0
+    for chunk in chunks:
+        _, orphans = DataScrubber(chunk).split_foreign_key_orphans(references)
+        orphan_count += len(orphans)
+    scrubber_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for chunk in chunks:
+        chunk[chunk["CustomerID"].isin(customers) & chunk["ProductID"].isin(products)]
+    isin_seconds = time.perf_counter() - start
+
+    print(f"rows={args.rows:,} chunk_rows={args.chunk_rows:,} keys indexed in {index_seconds:.3f} s, orphans={orphan_count:,}")
+    print(f"KeyIndex (with Int64 normalization): {args.rows / scrubber_seconds / 1e6:6.1f} M rows/s")
+    print(f"pandas isin (no normalization):      {args.rows / isin_seconds / 1e6:6.1f} M rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+r"""
+Benchmark: in-memory vs. out-of-core OLAP cube builds
+File: benchmarks/benchmark_out_of_core_cube.py
+
+Creates a throwaway SQLite warehouse with synthetic sale facts (see
+benchmark_sale_indexes.fill_sales()), then builds the Month x MonthName x product_id
+cube twice: by reading the whole sale table into pandas for create_olap_cube(),
+and with create_olap_cube_out_of_core() under a memory budget, streaming the cube
+into an .npcube bundle. Reports wall time and peak traced memory (tracemalloc sees
+numpy and pandas allocations) for each, and checks that both cubes agree.
+
+To run, open a terminal in the root project folder:
+
+    py benchmarks\benchmark_out_of_core_cube.py --rows 10000000 --budget-mb 64
+    python3 benchmarks/benchmark_out_of_core_cube.py --rows 10000000 --budget-mb 64
+    python3 benchmarks/benchmark_out_of_core_cube.py --rows 100000000 --budget-mb 256 --skip-in-memory
+"""
+
+import argparse
+import pathlib
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Tuple
+
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from benchmarks.benchmark_sale_indexes import fill_sales  # noqa: E402
+from scripts.etl_to_dw import create_schema, drop_indexes  # noqa: E402
+from scripts.olap.olap_cubing import add_time_dimensions, create_olap_cube, create_olap_cube_out_of_core  # noqa: E402
+from scripts.warehouse import close_pools  # noqa: E402
+
+DIMENSIONS = ["Month", "MonthName", "product_id"]
+METRICS = {"sale_amount_usd": ["sum", "mean", "min", "max"], "sale_id": "count"}
+
+
+def traced(func: Callable[[], pd.DataFrame]) -> Tuple[pd.DataFrame, float, int]:
+    """Run func and return (result, seconds, peak traced bytes)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark in-memory vs. out-of-core cube builds.")
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--chunk-rows", type=int, default=500_000)
+    parser.add_argument("--budget-mb", type=float, default=64)
+    parser.add_argument("--skip-in-memory", action="store_true", help="Only run the out-of-core build.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = pathlib.Path(tmp).joinpath("bench.db")
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        create_schema(cursor)
+        drop_indexes(cursor, ["sale"])
+        fill_sales(cursor, args.rows)
+        conn.commit()
+        conn.close()
+
+        def in_memory() -> pd.DataFrame:
+            conn = sqlite3.connect(db_path)
+            sales_df = pd.read_sql_query("SELECT * FROM sale", conn)
+            conn.close()
+            return create_olap_cube(add_time_dimensions(sales_df), DIMENSIONS, METRICS)
+
+        out_of_core, ooc_seconds, ooc_peak = traced(lambda: create_olap_cube_out_of_core(
+            DIMENSIONS, METRICS, db_path=db_path, chunk_rows=args.chunk_rows,
+            memory_budget=int(args.budget_mb * 2**20), spill_dir=pathlib.Path(tmp),
+            output_path=pathlib.Path(tmp).joinpath("cube.npcube"),
+        ))
+
+        print(f"rows={args.rows:,} chunk_rows={args.chunk_rows:,} budget={args.budget_mb:g} MiB cells={len(out_of_core):,}")
+        print(f"out of core: {ooc_seconds:8.2f} s  peak {ooc_peak / 2**20:8.1f} MiB")
+        if not args.skip_in_memory:
+            expected, seconds, peak = traced(in_memory)
+            pd.testing.assert_frame_equal(out_of_core, expected, check_dtype=False)
+            print(f"in memory:   {seconds:8.2f} s  peak {peak / 2**20:8.1f} MiB  (cubes match)")
+        close_pools()  # Release the database before the folder is removed
+
+
+if __name__ == "__main__":
+    main()
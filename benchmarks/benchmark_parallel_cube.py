@@ -0,0 +1,75 @@
+r"""
+Benchmark: parallel cube aggregation with 1, 2, 4 and 8 worker processes
+File: benchmarks/benchmark_parallel_cube.py
+
+Creates a throwaway SQLite warehouse with synthetic sale facts (see
+benchmark_sale_indexes.fill_sales()) and builds the Month x MonthName x product_id
+cube with create_olap_cube_parallel() at each worker count, reporting wall time
+and speedup over one worker. The single-core create_olap_cube_sql() build is
+timed too, and every cube is checked against it.
+
+To run, open a terminal in the root project folder:
+
+    py benchmarks\benchmark_parallel_cube.py --rows 10000000
+    python3 benchmarks/benchmark_parallel_cube.py --rows 10000000 --workers 1 2 4 8
+"""
+
+import argparse
+import pathlib
+import sqlite3
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from benchmarks.benchmark_sale_indexes import fill_sales  # noqa: E402
+from scripts.etl_to_dw import create_schema  # noqa: E402
+from scripts.olap.olap_cubing import create_olap_cube_parallel, create_olap_cube_sql  # noqa: E402
+from scripts.warehouse import close_pools  # noqa: E402
+
+DIMENSIONS = ["Month", "MonthName", "product_id"]
+METRICS = {"sale_amount_usd": ["sum", "mean", "min", "max"], "sale_id": "count"}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark parallel cube aggregation.")
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = pathlib.Path(tmp).joinpath("bench.db")
+        conn = sqlite3.connect(db_path)
+        create_schema(conn.cursor())
+        fill_sales(conn.cursor(), args.rows)
+        conn.commit()
+        conn.close()
+
+        start = time.perf_counter()
+        expected = create_olap_cube_sql(DIMENSIONS, METRICS, db_path=db_path)
+        sql_seconds = time.perf_counter() - start
+
+        timings = {}
+        for workers in args.workers:
+            start = time.perf_counter()
+            cube = create_olap_cube_parallel(DIMENSIONS, METRICS, db_path=db_path, max_workers=workers)
+            timings[workers] = time.perf_counter() - start
+            pd.testing.assert_frame_equal(cube, expected)
+        close_pools()  # Release the database before the folder is removed
+
+    print(f"\nrows={args.rows:,} cells={len(expected):,}")
+    print(f"{'engine':<22}{'seconds':>10}{'speedup':>10}")
+    print(f"{'sqlite (1 core)':<22}{sql_seconds:>10.2f}")
+    baseline = timings[args.workers[0]]
+    for workers, seconds in timings.items():
+        print(f"{f'parallel, {workers} workers':<22}{seconds:>10.2f}{baseline / seconds:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
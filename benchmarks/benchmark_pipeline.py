@@ -0,0 +1,132 @@
+r"""
+Benchmark: the four scripts run by hand vs scripts/pipeline.py
+File: benchmarks/benchmark_pipeline.py
+
+Copies the project's code into a throwaway folder with synthetic raw customers,
+products and sales files, and times, each as a fresh Python process:
+
+- data_prep.py, etl_to_dw.py, olap_cubing.py and olap_goal_sales_by_month.py, one after another,
+- pipeline.py on the same raw files (first run, nothing to skip),
+- pipeline.py again with nothing changed (every stage skipped),
+- pipeline.py after new sales arrive (customers and products prep skipped).
+
+The pipeline logs its own stage timings and critical path to the copy's logs folder;
+the last run's lines are printed at the end.
+
+To run, open a terminal in the root project folder:
+
+    py benchmarks\benchmark_pipeline.py --rows 1000000
+    python3 benchmarks/benchmark_pipeline.py --rows 1000000
+"""
+
+import argparse
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+SCRIPTS = [
+    "scripts/data_prep.py",
+    "scripts/etl_to_dw.py",
+    "scripts/olap/olap_cubing.py",
+    "scripts/olap/olap_goal_sales_by_month.py",
+]
+REGIONS = ["North", "South", "East", "West"]
+CATEGORIES = ["Electronics", "Clothing", "Sports"]
+
+
+def write_raw_sales(path: pathlib.Path, first_id: int, rows: int, seed: int, mode: str = "w") -> None:
+    """Write (or append) raw sales with unique TransactionIDs and some repeated rows."""
+    rng = np.random.default_rng(seed)
+    dates = [f"{d.month}/{d.day}/{d.year}" for d in pd.date_range("2024-01-01", "2024-12-31")]
+    sales = pd.DataFrame({
+        "TransactionID": np.arange(first_id, first_id + rows),
+        "SaleDate": rng.choice(dates, rows),
+        "CustomerID": rng.integers(1001, 2001, rows),
+        "ProductID": rng.integers(101, 201, rows),
+        "StoreID": rng.integers(401, 421, rows),
+        "CampaignID": rng.integers(0, 5, rows),
+        "SaleAmount": rng.uniform(1, 1000, rows).round(2),
+        "DiscountPercent": rng.choice([0.0, 0.1, 0.2], rows),
+        "PaymentType": rng.choice(["Cash", "Debit", "Credit"], rows),
+    })
+    sales = pd.concat([sales, sales.iloc[: rows // 100]])  # Exact duplicates, dropped by prep
+    sales.to_csv(path, mode=mode, header=mode == "w", index=False)
+
+def make_project(folder: pathlib.Path, rows: int) -> None:
+    """Copy the code into folder and write synthetic raw files to its data/raw."""
+    ignore = shutil.ignore_patterns("__pycache__")
+    for package in ("scripts", "utils"):
+        shutil.copytree(PROJECT_ROOT.joinpath(package), folder.joinpath(package), ignore=ignore)
+    raw_dir = folder.joinpath("data").joinpath("raw")
+    raw_dir.mkdir(parents=True)
+    folder.joinpath("data").joinpath("prepared").mkdir()
+
+    rng = np.random.default_rng(42)
+    customer_ids = np.arange(1001, 2001)
+    pd.DataFrame({
+        "CustomerID": customer_ids,
+        "Name": [f" Customer {customer_id} " for customer_id in customer_ids],
+        "Region": rng.choice(REGIONS, len(customer_ids)),
+        "JoinDate": rng.choice([f"{month}/1/2023" for month in range(1, 13)], len(customer_ids)),
+        "LoyaltyPoints": rng.integers(0, 500, len(customer_ids)),
+        "PreferredContactMethod": rng.choice(["Email", "Text"], len(customer_ids)),
+    }).to_csv(raw_dir.joinpath("customers_data.csv"), index=False)
+    product_ids = np.arange(101, 201)
+    pd.DataFrame({
+        "ProductID": product_ids,
+        "ProductName": [f" product {product_id}" for product_id in product_ids],
+        "Category": rng.choice(CATEGORIES, len(product_ids)),
+        "UnitPrice": rng.uniform(5, 900, len(product_ids)).round(2),
+        "StockQuantity": rng.integers(0, 100, len(product_ids)),
+        "BinNumber": rng.choice(["A1", "A2", "A3", "A4", "A5"], len(product_ids)),
+    }).to_csv(raw_dir.joinpath("products_data.csv"), index=False)
+    write_raw_sales(raw_dir.joinpath("sales_data.csv"), 1, rows, seed=42)
+
+def time_scripts(folder: pathlib.Path, scripts: list) -> float:
+    """Run scripts one after another, each in a fresh Python process, and return the total seconds."""
+    start = time.perf_counter()
+    for script in scripts:
+        subprocess.run([sys.executable, script], cwd=folder, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline runner against the scripts run by hand.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--new-rows", type=int, default=10_000, help="Sales appended before the last pipeline run.")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        by_hand, pipelined = pathlib.Path(tmp).joinpath("by_hand"), pathlib.Path(tmp).joinpath("pipelined")
+        make_project(by_hand, args.rows)
+        make_project(pipelined, args.rows)
+
+        results["4 scripts, one after another"] = time_scripts(by_hand, SCRIPTS)
+        results["pipeline, first run"] = time_scripts(pipelined, ["scripts/pipeline.py"])
+        results["pipeline, nothing changed"] = time_scripts(pipelined, ["scripts/pipeline.py"])
+        write_raw_sales(pipelined.joinpath("data", "raw", "sales_data.csv"), args.rows + 1, args.new_rows, seed=7, mode="a")
+        results[f"pipeline, {args.new_rows:,} new sales"] = time_scripts(pipelined, ["scripts/pipeline.py"])
+
+        log_lines = pipelined.joinpath("logs", "project_log.log").read_text().splitlines()
+        report = [line.split(" - ", 1)[1] for line in log_lines if "report_timings" in line]
+        runs_ended = [i for i, line in enumerate(report[:-1]) if line.startswith("Pipeline finished")]
+        report = report[runs_ended[-1] + 1:]  # Only the last run's lines
+
+    print(f"\nrows={args.rows:,}")
+    print(f"{'run':<36}{'seconds':>10}")
+    for name, seconds in results.items():
+        print(f"{name:<36}{seconds:>10.2f}")
+    print("\nLast pipeline run:")
+    print("\n".join(report))
+
+
+if __name__ == "__main__":
+    main()
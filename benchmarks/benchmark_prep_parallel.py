@@ -0,0 +1,72 @@
+r"""
+Benchmark: sharded sales prep with 1, 2, 4 and 8 worker processes
+File: benchmarks/benchmark_prep_parallel.py
+
+Writes a synthetic raw sales file shaped like data/raw/sales_data.csv and
+prepares it with scripts/prep_parallel.run_prep_jobs() at each worker count,
+reporting wall time and speedup over one worker.
+
+To run, open a terminal in the root project folder:
+
+    py benchmarks\benchmark_prep_parallel.py --rows 5000000
+    python3 benchmarks/benchmark_prep_parallel.py --rows 5000000 --workers 1 2 4 8
+"""
+
+import argparse
+import pathlib
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from scripts.prep_parallel import PrepJob, clean_sales, run_prep_jobs  # noqa: E402
+
+
+def write_raw_sales(path: pathlib.Path, rows: int, seed: int = 42) -> None:
+    """Write a raw sales CSV with some duplicates and missing values."""
+    rng = np.random.default_rng(seed)
+    dates = [f"{d.month}/{d.day}/{d.year}" for d in pd.date_range("2024-01-01", "2024-12-31")]
+    pd.DataFrame({
+        "TransactionID": rng.integers(0, rows, rows),
+        "SaleDate": rng.choice(dates, rows),
+        "CustomerID": rng.integers(1001, 2001, rows),
+        "ProductID": rng.integers(101, 201, rows),
+        "StoreID": rng.integers(401, 421, rows),
+        "CampaignID": rng.integers(0, 5, rows),
+        "SaleAmount": rng.uniform(1, 1000, rows).round(2),
+        "DiscountPercent": rng.choice([0.0, 0.1, np.nan], rows),
+        "PaymentType": rng.choice(["Cash", "Debit", "Credit"], rows),
+    }).to_csv(path, index=False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark parallel sharded sales prep.")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--shard-mb", type=float, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_path = pathlib.Path(tmp).joinpath("sales_data.csv")
+        write_raw_sales(raw_path, args.rows)
+        job = PrepJob("sales", raw_path, pathlib.Path(tmp).joinpath("sales_data_prepared.csv"), clean_sales)
+
+        print(f"rows={args.rows:,}  file={raw_path.stat().st_size / 2**20:,.0f} MiB")
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            run_prep_jobs([job], max_workers=workers, shard_bytes=int(args.shard_mb * 2**20))
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"workers={workers:<3} {elapsed:8.2f} s  {baseline / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+r"""
+Benchmark: separate consistency/inspect scans vs. the cached DataScrubber.profile()
+File: benchmarks/benchmark_profiling.py
+
+Runs what the prep scripts call on one table (check_data_consistency_before_cleaning,
+inspect_data, check_data_consistency_after_cleaning) the old way, as separate
+isnull/duplicated/info/describe scans, and through DataScrubber, where all three
+read one cached profile. Also times a sampled profile.
+
+To run, open a terminal in the root project folder:
+
+    py benchmarks\benchmark_profiling.py --rows 5000000
+    python3 benchmarks/benchmark_profiling.py --rows 5000000 --sample-rows 200000
+"""
+
+import argparse
+import io
+import pathlib
+import sys
+import time
+
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from benchmarks.benchmark_scrubber_plan import make_sales_frame  # noqa: E402
+from scripts.data_scrubber import DataScrubber  # noqa: E402
+
+
+def separate_scans(df: pd.DataFrame) -> None:
+    """The checks as the prep scripts used to run them: every call scans the frame again."""
+    df.isnull().sum()
+    df.duplicated().sum()
+    df.info(buf=io.StringIO())
+    df.describe()
+    df.isnull().sum()
+    df.duplicated().sum()
+
+
+def profiled(df: pd.DataFrame) -> None:
+    scrubber = DataScrubber(df)
+    scrubber.check_data_consistency_before_cleaning()
+    scrubber.inspect_data()
+    scrubber.check_data_consistency_before_cleaning()  # Same checks as the after-cleaning call, without the asserts
+
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark single-pass profiling.")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--sample-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    df = make_sales_frame(args.rows)
+    before = timed(separate_scans, df)
+    after = timed(profiled, df)
+    sampled = timed(lambda: DataScrubber(df).profile(sample_rows=args.sample_rows))
+
+    print(f"rows={args.rows:,}")
+    print(f"separate scans:        {before:8.3f} s")
+    print(f"cached profile:        {after:8.3f} s  ({before / after:.1f}x faster)")
+    print(f"sampled ({args.sample_rows:,} rows): {sampled:8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
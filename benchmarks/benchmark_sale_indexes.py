@@ -0,0 +1,111 @@
+r"""
+Benchmark: sale table queries with and without the star schema indexes
+File: benchmarks/benchmark_sale_indexes.py
+
+Creates a throwaway SQLite warehouse with scripts/etl_to_dw.create_schema(),
+fills the sale table with synthetic facts, and times the typical cube and
+goal queries first without the secondary indexes and then with
+SALE_INDEXES built and ANALYZE run.
+
+To run, open a terminal in the root project folder:
+
+    py benchmarks\benchmark_sale_indexes.py --rows 1000000 10000000
+    python3 benchmarks/benchmark_sale_indexes.py --rows 1000000 10000000
+"""
+
+import argparse
+import pathlib
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from scripts.etl_to_dw import SALE_INDEXES, create_schema, drop_indexes, execute_in_batches  # noqa: E402
+
+QUERIES: Dict[str, str] = {
+    "month x product rollup": """
+        SELECT CAST(strftime('%m', sale_date) AS INTEGER) AS Month, product_id,
+               SUM(sale_amount_usd), MIN(sale_amount_usd), MAX(sale_amount_usd), COUNT(sale_id)
+        FROM sale GROUP BY Month, product_id
+    """,
+    "one month total": "SELECT SUM(sale_amount_usd) FROM sale WHERE sale_date BETWEEN '2024-03-01' AND '2024-03-31'",
+    "product since June": "SELECT SUM(sale_amount_usd) FROM sale WHERE product_id = 103 AND sale_date >= '2024-06-01'",
+    "one customer": "SELECT COUNT(*), SUM(sale_amount_usd) FROM sale WHERE customer_id = 1005",
+    "one store": "SELECT COUNT(*) FROM sale WHERE store_id = 404",
+}
+
+
+def fill_sales(cursor: sqlite3.Cursor, rows: int, seed: int = 42) -> None:
+    """Insert rows synthetic facts into the sale table, one million at a time."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2024-01-01", "2024-12-31").strftime("%Y-%m-%d").to_numpy()
+    for start in range(0, rows, 1_000_000):
+        n = min(1_000_000, rows - start)
+        chunk = pd.DataFrame({
+            "sale_id": np.arange(start, start + n),
+            "sale_date": rng.choice(dates, n),
+            "customer_id": rng.integers(1001, 2001, n),
+            "product_id": rng.integers(101, 201, n),
+            "store_id": rng.integers(401, 421, n),
+            "campaign_id": rng.integers(0, 5, n),
+            "sale_amount_usd": rng.uniform(1, 1000, n).round(2),
+        })
+        execute_in_batches(
+            cursor,
+            f"INSERT INTO sale ({', '.join(chunk.columns)}) VALUES ({', '.join('?' for _ in chunk.columns)})",
+            chunk.itertuples(index=False, name=None),
+        )
+
+
+def time_queries(cursor: sqlite3.Cursor) -> Dict[str, float]:
+    """Return the best of three wall times, in seconds, for each query."""
+    timings = {}
+    for name, sql in QUERIES.items():
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            cursor.execute(sql).fetchall()
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark sale table queries with and without indexes.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000])
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = sqlite3.connect(pathlib.Path(tmp).joinpath("bench.db"))
+            cursor = conn.cursor()
+            create_schema(cursor)
+            drop_indexes(cursor, ["sale"])
+            fill_sales(cursor, rows)
+            conn.commit()
+            before = time_queries(cursor)
+
+            for statement in SALE_INDEXES:
+                cursor.execute(statement)
+            cursor.execute("ANALYZE")
+            conn.commit()
+            after = time_queries(cursor)
+            conn.close()
+
+        print(f"\nrows={rows:,}")
+        print(f"{'query':<24}{'no index (s)':>14}{'indexed (s)':>14}{'speedup':>10}")
+        for name in QUERIES:
+            print(f"{name:<24}{before[name]:>14.4f}{after[name]:>14.4f}{before[name] / after[name]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
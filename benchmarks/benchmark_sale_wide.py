@@ -0,0 +1,127 @@
+r"""
+Benchmark: region x category cubes from the denormalized sale_wide table
+File: benchmarks/benchmark_sale_wide.py
+
+Creates a throwaway SQLite warehouse with synthetic sale facts (see
+benchmark_sale_indexes.fill_sales()) plus customer and product tables, and times:
+
+- materializing sale_wide from scratch with refresh_sale_wide(),
+- the region x category x Month cube built by joining in pandas on every run,
+  by joining inside SQLite on every run, and with create_olap_cube_sql() on sale_wide,
+- an incremental refresh after a handful of customers change region.
+
+To run, open a terminal in the root project folder:
+
+    py benchmarks\benchmark_sale_wide.py --rows 2000000
+    python3 benchmarks/benchmark_sale_wide.py --rows 2000000 --changed-customers 10
+"""
+
+import argparse
+import pathlib
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from benchmarks.benchmark_sale_indexes import fill_sales  # noqa: E402
+from scripts.etl_to_dw import create_schema, refresh_sale_wide  # noqa: E402
+from scripts.olap.olap_cubing import add_time_dimensions, create_olap_cube, create_olap_cube_sql  # noqa: E402
+from scripts.warehouse import close_pools  # noqa: E402
+
+DIMENSIONS = ["region", "category", "Month"]
+METRICS = {"sale_amount_usd": ["sum", "mean", "min", "max"], "sale_id": "count"}
+REGIONS = ["North", "South", "East", "West", "Central"]
+CATEGORIES = ["Electronics", "Clothing", "Sports", "Home", "Garden", "Toys"]
+
+JOINED_SQL = """
+    SELECT c.region, p.category, CAST(strftime('%m', s.sale_date) AS INTEGER) AS Month,
+           SUM(s.sale_amount_usd), AVG(s.sale_amount_usd), MIN(s.sale_amount_usd), MAX(s.sale_amount_usd),
+           COUNT(s.sale_id)
+    FROM sale s
+    JOIN customer c ON c.customer_id = s.customer_id
+    JOIN product p ON p.product_id = s.product_id
+    GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+"""
+
+
+def fill_dimensions(cursor: sqlite3.Cursor, seed: int = 42) -> None:
+    """Insert the customers and products that fill_sales() refers to."""
+    rng = np.random.default_rng(seed)
+    cursor.executemany(
+        "INSERT INTO customer (customer_id, name, region) VALUES (?, ?, ?)",
+        [(customer_id, f"Customer {customer_id}", str(rng.choice(REGIONS))) for customer_id in range(1001, 2001)],
+    )
+    cursor.executemany(
+        "INSERT INTO product (product_id, product_name, category) VALUES (?, ?, ?)",
+        [(product_id, f"Product {product_id}", str(rng.choice(CATEGORIES))) for product_id in range(101, 201)],
+    )
+
+
+def time_call(function) -> tuple:
+    """Return (result, seconds) for one call."""
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark cubes over customer and product attributes.")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--changed-customers", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = pathlib.Path(tmp).joinpath("bench.db")
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        cursor = conn.cursor()
+        create_schema(cursor)
+        cursor.execute("BEGIN")
+        fill_dimensions(cursor)
+        fill_sales(cursor, args.rows)
+        cursor.execute("COMMIT")
+
+        cursor.execute("BEGIN")
+        _, materialize_seconds = time_call(lambda: refresh_sale_wide(cursor))
+        cursor.execute("COMMIT")
+
+        def pandas_join_cube() -> pd.DataFrame:
+            wide = (
+                pd.read_sql_query("SELECT sale_id, sale_date, customer_id, product_id, sale_amount_usd FROM sale", conn)
+                .merge(pd.read_sql_query("SELECT customer_id, region FROM customer", conn), on="customer_id")
+                .merge(pd.read_sql_query("SELECT product_id, category FROM product", conn), on="product_id")
+            )
+            return create_olap_cube(add_time_dimensions(wide), DIMENSIONS, METRICS)
+
+        expected, pandas_seconds = time_call(pandas_join_cube)
+        joined, sql_join_seconds = time_call(lambda: pd.read_sql_query(JOINED_SQL, conn))
+        cube, wide_seconds = time_call(lambda: create_olap_cube_sql(DIMENSIONS, METRICS, db_path=db_path))
+        pd.testing.assert_frame_equal(cube, expected, check_dtype=False)
+        assert len(joined) == len(cube)
+
+        changed = list(range(1001, 1001 + args.changed_customers))
+        cursor.execute("BEGIN")
+        cursor.executemany("UPDATE customer SET region = 'Central' WHERE customer_id = ?", [(key,) for key in changed])
+        written, refresh_seconds = time_call(lambda: refresh_sale_wide(cursor))
+        cursor.execute("COMMIT")
+        conn.close()
+        close_pools()  # Release the database before the folder is removed
+
+    print(f"\nrows={args.rows:,} cells={len(cube):,}")
+    print(f"{'step':<40}{'seconds':>10}")
+    print(f"{'materialize sale_wide (once)':<40}{materialize_seconds:>10.2f}")
+    print(f"{'cube, pandas merge every run':<40}{pandas_seconds:>10.2f}")
+    print(f"{'cube, SQLite join every run':<40}{sql_join_seconds:>10.2f}")
+    print(f"{'cube, create_olap_cube_sql on sale_wide':<40}{wide_seconds:>10.2f}")
+    print(f"{f'refresh after {len(changed)} customers change':<40}{refresh_seconds:>10.3f}  ({written:,} rows)")
+
+
+if __name__ == "__main__":
+    main()
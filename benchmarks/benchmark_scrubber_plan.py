@@ -0,0 +1,114 @@
+r"""
+Benchmark: eager DataScrubber methods vs. the fused ScrubberPlan
+File: benchmarks/benchmark_scrubber_plan.py
+
+Builds a synthetic sales-like DataFrame and runs the same ten cleaning steps
+twice: once with the eager DataScrubber methods (one new DataFrame per step)
+and once with scrubber.plan() ... execute(). Reports wall time and peak
+memory (as tracked by tracemalloc) for each.
+
+To run, open a terminal in the root project folder:
+
+    py benchmarks\benchmark_scrubber_plan.py --rows 2000000
+    python3 benchmarks/benchmark_scrubber_plan.py --rows 2000000
+"""
+
+import argparse
+import pathlib
+import sys
+import time
+import tracemalloc
+from typing import Callable, Tuple
+
+import numpy as np
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from scripts.data_scrubber import DataScrubber  # noqa: E402
+
+
+def make_sales_frame(rows: int, seed: int = 42) -> pd.DataFrame:
+    """Create a synthetic raw sales DataFrame with some duplicates and missing values."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "TransactionID": rng.integers(0, rows, rows),
+        "SaleDate": rng.choice(pd.date_range("2024-01-01", periods=365).strftime("%Y-%m-%d"), rows),
+        "CustomerID": rng.integers(1001, 1100, rows),
+        "ProductID": rng.integers(101, 200, rows),
+        "StoreID": rng.integers(401, 410, rows),
+        "CampaignID": rng.integers(0, 5, rows),
+        "SaleAmount": rng.uniform(-50, 5000, rows).round(2),
+        "DiscountPercent": rng.choice([0.0, 0.1, np.nan], rows),
+        "PaymentType": rng.choice(["  Cash", "Debit ", "Credit"], rows),
+        "Notes": rng.choice(["", "gift", "return"], rows),
+    })
+    return df
+
+
+def run_eager(df: pd.DataFrame) -> pd.DataFrame:
+    scrubber = DataScrubber(df)
+    scrubber.drop_columns(["Notes", "CampaignID"])
+    scrubber.remove_duplicate_records()
+    scrubber.filter_column_outliers("SaleAmount", 0, 4000)
+    scrubber.filter_column_outliers("StoreID", 402, 408)
+    scrubber.handle_missing_data(fill_value=0)
+    scrubber.format_column_strings_to_upper_and_trim("PaymentType")
+    scrubber.rename_columns({"TransactionID": "sale_id", "SaleAmount": "sale_amount_usd"})
+    scrubber.rename_columns({"PaymentType": "payment_type"})
+    scrubber.parse_dates_to_add_standard_datetime("SaleDate")
+    scrubber.reorder_columns(["sale_id", "StandardDateTime", "CustomerID", "ProductID", "sale_amount_usd", "payment_type"])
+    return scrubber.df
+
+
+def run_fused(df: pd.DataFrame) -> pd.DataFrame:
+    return (
+        DataScrubber(df).plan()
+        .drop_columns(["Notes", "CampaignID"])
+        .remove_duplicate_records()
+        .filter_column_outliers("SaleAmount", 0, 4000)
+        .filter_column_outliers("StoreID", 402, 408)
+        .handle_missing_data(fill_value=0)
+        .format_column_strings_to_upper_and_trim("PaymentType")
+        .rename_columns({"TransactionID": "sale_id", "SaleAmount": "sale_amount_usd"})
+        .rename_columns({"PaymentType": "payment_type"})
+        .parse_dates_to_add_standard_datetime("SaleDate")
+        .reorder_columns(["sale_id", "StandardDateTime", "CustomerID", "ProductID", "sale_amount_usd", "payment_type"])
+        .execute()
+    )
+
+
+def measure(func: Callable[[pd.DataFrame], pd.DataFrame], df: pd.DataFrame) -> Tuple[float, float, pd.DataFrame]:
+    """Return (seconds, peak MiB, result) for func. Time and memory are measured in separate runs."""
+    start = time.perf_counter()
+    result = func(df)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(df)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark eager vs. fused DataScrubber cleaning.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = make_sales_frame(args.rows)
+    eager_time, eager_peak, eager_df = measure(run_eager, df)
+    fused_time, fused_peak, fused_df = measure(run_fused, df)
+    pd.testing.assert_frame_equal(eager_df, fused_df)
+
+    print(DataScrubber(df).plan().drop_columns(["Notes", "CampaignID"]).remove_duplicate_records().explain())
+    print(f"rows={args.rows:,}")
+    print(f"eager: {eager_time:8.3f} s  peak {eager_peak:8.1f} MiB")
+    print(f"fused: {fused_time:8.3f} s  peak {fused_peak:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-"""
+r"""
 Module 3: Data Preparation Script
 File: scripts/data_prep.py
 
@@ -8,6 +8,36 @@ and saves the prepared data to 'data/prepared/'.
 The data preparation steps include removing duplicates, handling missing values, 
 trimming whitespace, and more.
 
+For very large raw files, run it with --stream. Each file is then read in bounded
+chunks, each chunk goes through the same cleaning steps, and the result is appended
+to the prepared file. Duplicates are still detected across chunks by keeping a set
+of 64-bit row hashes for every row already written.
+
+Raw files are read with the RAW_DTYPES map, so low-cardinality text columns
+(Region, Category, PaymentType, ...) are categoricals from the start, and
+DataScrubber.optimize_dtypes() downcasts the rest. The memory saved is logged per table.
+
+With --history, sales are also deduped by TransactionID against every earlier run:
+the fingerprints of all transactions kept so far are persisted in
+data/fingerprints/sales (see DataScrubber.remove_duplicate_records() and
+FingerprintStore), so a transaction repeated in a later daily drop is not
+prepared, and loaded into smart_sales.db, a second time. The prepared sales file
+keeps the transactions of earlier runs and the new ones are appended to it, so it
+always holds the full deduplicated set: a full reload with etl_to_dw.py loads every
+sale, and etl_to_dw.py --incremental writes only the new ones. The store is seeded
+once from the prepared file and then read alone, and a transaction is added to it
+only after it is written. Leave --history off to re-prepare the raw files from
+scratch; that also removes the store, to be seeded again by the next --history run.
+
+Sales are checked against the prepared customers and products before they are
+saved (the foreign keys of the sale table). CustomerID and ProductID are written as
+integers, and sales whose customer or product does not exist are moved to
+data/quarantine/sales_data_orphans.csv instead of being loaded into smart_sales.db.
+
+Each table's prep is its own function returning the prepared frame. Sales are split
+into clean_sales_data() and finish_sales_data(), the foreign key check, so that
+scripts/pipeline.py can clean sales while customers and products are prepared.
+
 This script uses the general DataScrubber class and its methods to perform common, reusable tasks.
 
 To run it, open a terminal in the root project folder.
@@ -16,6 +46,8 @@ Choose the correct command for your OS to run this script.
 
 py scripts\data_prep.py
 python3 scripts\data_prep.py
+py scripts\data_prep.py --stream --chunk-size 100000
+py scripts\data_prep.py --stream --history
 
 NOTE: I use the ruff linter. 
 It warns if all import statements are not at the top of the file.  
@@ -25,8 +57,12 @@ By adding this comment at the end of an import line noqa: E402
 ruff will ignore the warning on just that line. 
 """
 
+import argparse
 import pathlib
+import shutil
 import sys
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+import numpy as np
 import pandas as pd
 
 # For local imports, temporarily add project root to Python sys.path
@@ -36,17 +72,195 @@ if str(PROJECT_ROOT) not in sys.path:
 
 # Now we can import local modules
 from utils.logger import logger  # noqa: E402
-from scripts.data_scrubber import DataScrubber  # noqa: E402
+from scripts.data_scrubber import DataScrubber, FingerprintStore, KeyIndex, fingerprint_rows  # noqa: E402
 
 # Constants
 DATA_DIR: pathlib.Path = PROJECT_ROOT.joinpath("data")
 RAW_DATA_DIR: pathlib.Path = DATA_DIR.joinpath("raw")
 PREPARED_DATA_DIR: pathlib.Path = DATA_DIR.joinpath("prepared")
+SALES_FINGERPRINTS_DIR: pathlib.Path = DATA_DIR.joinpath("fingerprints").joinpath("sales")
+SALES_KEY_COLUMNS: List[str] = ["TransactionID"]
+QUARANTINE_DIR: pathlib.Path = DATA_DIR.joinpath("quarantine")
+SALES_ORPHANS_PATH: pathlib.Path = QUARANTINE_DIR.joinpath("sales_data_orphans.csv")
+
+# Foreign key column -> (prepared file of the referenced table, its key column)
+SALES_FOREIGN_KEYS: Dict[str, Tuple[pathlib.Path, str]] = {
+    "CustomerID": (PREPARED_DATA_DIR.joinpath("customers_data_prepared.csv"), "CustomerID"),
+    "ProductID": (PREPARED_DATA_DIR.joinpath("products_data_prepared.csv"), "ProductID"),
+}
+CHUNK_SIZE: int = 100_000  # Rows per chunk in streaming mode
+
+# Raw customers headers renamed to the prepared header the warehouse manifest reads (see etl_to_dw.py)
+CUSTOMER_COLUMN_NAMES: Dict[str, str] = {"PreferredContact Method": "PreferredContactMethod"}
+
+# Read-time dtypes for the low-cardinality text columns of each raw file.
+# Columns that may hold missing values or malformed numbers are left to optimize_dtypes().
+RAW_DTYPES: Dict[str, Dict[str, str]] = {
+    "customers_data.csv": {"Region": "category", "PreferredContact Method": "category"},
+    "products_data.csv": {"Category": "category", "BinNumber": "category"},
+    "sales_data.csv": {"SaleDate": "category", "PaymentType": "category"},
+    "customers_data_P7.csv": {"Region": "category"},
+    "products_data_P7.csv": {"Category": "category"},
+    "sales_data_P7.csv": {"SaleDate": "category", "SaleMonth": "category"},
+}
 
 def read_raw_data(file_name: str) -> pd.DataFrame:
     """Read raw data from CSV."""
     file_path: pathlib.Path = RAW_DATA_DIR.joinpath(file_name)
-    return pd.read_csv(file_path)
+    return pd.read_csv(file_path, dtype=RAW_DTYPES.get(file_name))
+
+def read_raw_data_in_chunks(file_name: str, chunksize: int = CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Read raw data from CSV as an iterator of DataFrames with at most chunksize rows."""
+    file_path: pathlib.Path = RAW_DATA_DIR.joinpath(file_name)
+    return pd.read_csv(file_path, dtype=RAW_DTYPES.get(file_name), chunksize=chunksize)
+
+def hash_rows(df: pd.DataFrame) -> pd.Series:
+    """
+    Hash every row of a DataFrame to a 64-bit value.
+
+    Numeric columns are hashed as float64 so the same row gets the same hash
+    whether its chunk was parsed as int (no missing values) or float (some missing values).
+    """
+    return pd.Series(fingerprint_rows(df), index=df.index)
+
+def drop_duplicates_across_chunks(df: pd.DataFrame, seen_hashes: Set[int]) -> pd.DataFrame:
+    """
+    Remove rows that are duplicated within this chunk or were already seen in an earlier chunk.
+
+    Parameters:
+        df (pd.DataFrame): The current chunk.
+        seen_hashes (set): Row hashes of all rows kept so far. Updated in place.
+
+    Returns:
+        pd.DataFrame: The chunk without duplicate rows.
+    """
+    row_hashes = hash_rows(df)
+    keep = ~row_hashes.duplicated() & ~row_hashes.isin(seen_hashes)
+    seen_hashes.update(row_hashes[keep].tolist())
+    return df[keep]
+
+def load_key_indexes(foreign_keys: Dict[str, Tuple[pathlib.Path, str]]) -> Dict[str, KeyIndex]:
+    """Build a KeyIndex for each foreign key from the referenced prepared file, reading only its key column."""
+    return {
+        column: KeyIndex(pd.read_csv(file_path, usecols=[key_column])[key_column])
+        for column, (file_path, key_column) in foreign_keys.items()
+    }
+
+def quarantine_orphans(orphans: pd.DataFrame, quarantine_path: pathlib.Path, append: bool = False) -> None:
+    """
+    Write rows that failed a foreign key check to the quarantine file.
+
+    A run that starts with append=False first removes the previous run's file, so the
+    file only ever holds the current run's orphans.
+    """
+    if not append and quarantine_path.exists():
+        quarantine_path.unlink()
+    if len(orphans):
+        quarantine_path.parent.mkdir(parents=True, exist_ok=True)
+        orphans.to_csv(quarantine_path, mode="a", header=not quarantine_path.exists(), index=False)
+        logger.warning(f"{len(orphans)} rows with unknown foreign keys moved to {quarantine_path}")
+
+def enforce_foreign_keys(
+    df: pd.DataFrame, references: Dict[str, KeyIndex], quarantine_path: pathlib.Path, append: bool = False
+) -> pd.DataFrame:
+    """Drop the rows whose foreign keys are not in references, quarantining them. Returns the valid rows."""
+    valid, orphans = DataScrubber(df).split_foreign_key_orphans(references)
+    quarantine_orphans(orphans, quarantine_path, append)
+    return valid
+
+def clean_customers_chunk(df_customers: pd.DataFrame, seen_hashes: Set[int]) -> pd.DataFrame:
+    """Apply the customers cleaning steps to one chunk."""
+    df_customers.columns = df_customers.columns.str.strip()
+    df_customers = df_customers.rename(columns=CUSTOMER_COLUMN_NAMES)
+    df_customers = drop_duplicates_across_chunks(df_customers, seen_hashes)
+    df_customers['Name'] = df_customers['Name'].str.strip()
+    df_customers = df_customers.dropna(subset=['CustomerID', 'Name'])
+
+    scrubber_customers = DataScrubber(df_customers)
+    df_customers = scrubber_customers.handle_missing_data(fill_value="N/A")
+    df_customers = scrubber_customers.parse_dates_to_add_standard_datetime('JoinDate')
+    scrubber_customers.check_data_consistency_after_cleaning()
+    return df_customers
+
+def clean_products_chunk(df_products: pd.DataFrame, seen_hashes: Set[int]) -> pd.DataFrame:
+    """Apply the products cleaning steps to one chunk."""
+    df_products.columns = df_products.columns.str.strip()
+    df_products = drop_duplicates_across_chunks(df_products, seen_hashes)
+    df_products['ProductName'] = df_products['ProductName'].str.strip()
+    df_products = df_products.dropna(subset=['ProductID', 'ProductName'])
+    DataScrubber(df_products).check_data_consistency_after_cleaning()
+    return df_products
+
+def clean_sales_chunk(df_sales: pd.DataFrame, seen_hashes: Set[int]) -> pd.DataFrame:
+    """Apply the sales cleaning steps to one chunk."""
+    df_sales.columns = df_sales.columns.str.strip()
+    df_sales = drop_duplicates_across_chunks(df_sales, seen_hashes)
+    df_sales['SaleDate'] = DataScrubber.parse_dates(df_sales['SaleDate'], errors='coerce')
+    df_sales = df_sales.dropna(subset=['TransactionID', 'SaleDate'])
+
+    scrubber_sales = DataScrubber(df_sales)
+    df_sales = scrubber_sales.handle_missing_data(fill_value="Unknown")
+    scrubber_sales.check_data_consistency_after_cleaning()
+    return df_sales
+
+def stream_prepare_data(
+    raw_file_name: str,
+    prepared_file_name: str,
+    clean_chunk: Callable[[pd.DataFrame, Set[int]], pd.DataFrame],
+    chunksize: int = CHUNK_SIZE,
+    fingerprint_store: Optional[FingerprintStore] = None,
+    key_columns: Optional[List[str]] = None,
+    references: Optional[Dict[str, KeyIndex]] = None,
+    quarantine_path: Optional[pathlib.Path] = None,
+) -> int:
+    """
+    Clean a raw CSV file chunk by chunk and append each cleaned chunk to the prepared file.
+
+    Only one chunk is held in memory at a time, plus one 64-bit hash per row kept.
+
+    Parameters:
+        raw_file_name (str): Name of the file in data/raw.
+        prepared_file_name (str): Name of the file to write in data/prepared.
+        clean_chunk (callable): Function that cleans one chunk, given the shared set of row hashes.
+        chunksize (int): Number of raw rows per chunk.
+        fingerprint_store (FingerprintStore, optional): If given, cleaned rows whose key_columns
+            were kept in an earlier run are dropped too. The rows kept are appended to the
+            prepared file, and added to the store once each chunk is written.
+        key_columns (list, optional): Columns identifying a record for fingerprint_store.
+        references (dict, optional): Foreign key column -> KeyIndex. Rows with unknown
+            keys are written to quarantine_path instead of the prepared file.
+        quarantine_path (pathlib.Path, optional): Quarantine file for references.
+
+    Returns:
+        int: Number of rows written to the prepared file.
+    """
+    file_path: pathlib.Path = PREPARED_DATA_DIR.joinpath(prepared_file_name)
+    seen_hashes: Set[int] = set()
+    rows_written = 0
+    for chunk_number, chunk in enumerate(read_raw_data_in_chunks(raw_file_name, chunksize)):
+        cleaned = clean_chunk(chunk, seen_hashes)
+        if references:
+            cleaned = enforce_foreign_keys(cleaned, references, quarantine_path, append=chunk_number > 0)
+        if fingerprint_store is not None:
+            cleaned = DataScrubber(cleaned).remove_duplicate_records(key_columns, fingerprint_store)
+            append_prepared_data(cleaned, prepared_file_name)
+            fingerprint_store.add(fingerprint_rows(cleaned, key_columns), assume_new=True)  # Only once written
+        else:
+            cleaned.to_csv(file_path, mode="w" if chunk_number == 0 else "a", header=chunk_number == 0, index=False)
+        rows_written += len(cleaned)
+    logger.info(f"Streamed {rows_written} rows to {file_path}")
+    return rows_written
+
+def optimize_dtypes_and_report(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    """Downcast and dictionary-encode a table with DataScrubber.optimize_dtypes() and log the memory saved."""
+    before = df.memory_usage(deep=True).sum()
+    df = DataScrubber(df).optimize_dtypes()
+    after = df.memory_usage(deep=True).sum()
+    logger.info(
+        f"{table}: {before / 1024:,.1f} KiB -> {after / 1024:,.1f} KiB in memory "
+        f"(saved {before - after:,} bytes, {1 - after / before:.0%})"
+    )
+    return df
 
 def save_prepared_data(df: pd.DataFrame, file_name: str) -> None:
     """Save cleaned data to CSV."""
@@ -54,19 +268,81 @@ def save_prepared_data(df: pd.DataFrame, file_name: str) -> None:
     df.to_csv(file_path, index=False)
     logger.info(f"Data saved to {file_path}")
 
-def main() -> None:
-    """Main function for pre-processing customer, product, and sales data."""
+def append_prepared_data(df: pd.DataFrame, file_name: str) -> None:
+    """Append cleaned rows to a prepared CSV, or start it if it does not exist yet."""
+    file_path: pathlib.Path = PREPARED_DATA_DIR.joinpath(file_name)
+    exists = file_path.exists()
+    if exists:
+        columns = pd.read_csv(file_path, nrows=0).columns.tolist()
+        if columns != list(df.columns):
+            logger.error(f"Cannot append to {file_path}: its columns {columns} differ from {list(df.columns)}")
+            raise ValueError(f"Columns of {file_path} differ from the rows to append.")
+    df.to_csv(file_path, mode="a", header=not exists, index=False)
+    logger.info(f"{len(df)} rows appended to {file_path}")
+
+def open_sales_history(history: bool) -> Optional[FingerprintStore]:
+    """
+    Open the persisted sales fingerprints if history dedupe is on.
+
+    A new store is seeded once with the transactions already in the prepared sales
+    file, so the rows appended to it never repeat one, whichever run prepared the file.
+    After that the store alone is read, so a run costs time in proportion to its batch.
+    """
+    if not history:
+        return None
+    store = FingerprintStore(SALES_FINGERPRINTS_DIR)
+    if not store.seeded:
+        prepared_path = PREPARED_DATA_DIR.joinpath("sales_data_prepared.csv")
+        prepared = pd.read_csv(prepared_path, usecols=SALES_KEY_COLUMNS) if prepared_path.exists() else None
+        seeded = store.seed(fingerprint_rows(prepared, SALES_KEY_COLUMNS) if prepared is not None else np.empty(0, np.uint64))
+        logger.info(f"Seeded {SALES_FINGERPRINTS_DIR} with {seeded} transactions from {prepared_path}")
+    logger.info(f"Deduping sales against {len(store)} transactions from earlier runs in {SALES_FINGERPRINTS_DIR}")
+    return store
+
+def record_sales_history(store: FingerprintStore, df_sales: pd.DataFrame) -> None:
+    """Add the transactions just written to the prepared sales file to the store."""
+    store.add(fingerprint_rows(df_sales, SALES_KEY_COLUMNS), assume_new=True)
+
+def reset_sales_history() -> None:
+    """
+    Remove the persisted sales fingerprints after the prepared sales file was rewritten
+    from scratch, so the next --history run seeds a new store from that file.
+    """
+    if SALES_FINGERPRINTS_DIR.exists():
+        shutil.rmtree(SALES_FINGERPRINTS_DIR)
+        logger.info(f"Removed {SALES_FINGERPRINTS_DIR}; the next --history run seeds it from the prepared file")
+
+def main_streaming(chunksize: int = CHUNK_SIZE, history: bool = False) -> None:
+    """Pre-process customer, product, and sales data in bounded chunks."""
     logger.info("======================")
-    logger.info("STARTING data_prep.py")
+    logger.info("STARTING data_prep.py (streaming)")
     logger.info("======================")
 
+    stream_prepare_data("customers_data.csv", "customers_data_prepared.csv", clean_customers_chunk, chunksize)
+    stream_prepare_data("products_data.csv", "products_data_prepared.csv", clean_products_chunk, chunksize)
+    stream_prepare_data(
+        "sales_data.csv", "sales_data_prepared.csv", clean_sales_chunk, chunksize,
+        fingerprint_store=open_sales_history(history), key_columns=SALES_KEY_COLUMNS,
+        references=load_key_indexes(SALES_FOREIGN_KEYS), quarantine_path=SALES_ORPHANS_PATH,
+    )
+    if not history:
+        reset_sales_history()
+
+    logger.info("======================")
+    logger.info("FINISHED data_prep.py (streaming)")
+    logger.info("======================")
+
+def prepare_customers_data() -> pd.DataFrame:
+    """Clean the raw customers file, save it to data/prepared, and return the prepared frame."""
     logger.info("========================")
     logger.info("Starting CUSTOMERS prep")
     logger.info("========================")
 
     df_customers = read_raw_data("customers_data.csv")
+    df_customers = optimize_dtypes_and_report(df_customers, "customers")
 
     df_customers.columns = df_customers.columns.str.strip()  # Clean column names
+    df_customers = df_customers.rename(columns=CUSTOMER_COLUMN_NAMES)  # Column names the warehouse expects
     df_customers = df_customers.drop_duplicates()            # Remove duplicates
 
     df_customers['Name'] = df_customers['Name'].str.strip()  # Trim whitespace from column values
@@ -81,17 +357,22 @@ def main() -> None:
     scrubber_customers.check_data_consistency_after_cleaning()
 
     save_prepared_data(df_customers, "customers_data_prepared.csv")
+    return df_customers
 
+def prepare_products_data() -> pd.DataFrame:
+    """Clean the raw products file, save it to data/prepared, and return the prepared frame."""
     logger.info("========================")
     logger.info("Starting PRODUCTS prep")
     logger.info("========================")
 
     df_products = read_raw_data("products_data.csv")
+    df_products = optimize_dtypes_and_report(df_products, "products")
 
     df_products.columns = df_products.columns.str.strip()  # Clean column names
     df_products = df_products.drop_duplicates()            # Remove duplicates
 
     df_products['ProductName'] = df_products['ProductName'].str.strip()  # Trim whitespace from column values
+    df_products = df_products.dropna(subset=['ProductID', 'ProductName'])  # Drop rows missing critical info
     
     scrubber_products = DataScrubber(df_products)
     scrubber_products.check_data_consistency_before_cleaning()
@@ -99,31 +380,85 @@ def main() -> None:
 
     scrubber_products.check_data_consistency_after_cleaning()
     save_prepared_data(df_products, "products_data_prepared.csv")
+    return df_products
 
+def clean_sales_data() -> pd.DataFrame:
+    """
+    Clean the raw sales file, up to but not including the foreign key check.
+
+    This step does not need the customers or products, so it can run alongside
+    their prep (see scripts/pipeline.py). finish_sales_data() completes it.
+    """
     logger.info("========================")
     logger.info("Starting SALES prep")
     logger.info("========================")
 
     df_sales = read_raw_data("sales_data.csv")
+    df_sales = optimize_dtypes_and_report(df_sales, "sales")
 
     df_sales.columns = df_sales.columns.str.strip()  # Clean column names
     df_sales = df_sales.drop_duplicates()            # Remove duplicates
 
-    df_sales['SaleDate'] = pd.to_datetime(df_sales['SaleDate'], errors='coerce')  # Ensure sale_date is datetime
+    df_sales['SaleDate'] = DataScrubber.parse_dates(df_sales['SaleDate'], errors='coerce')  # Ensure sale_date is datetime
     df_sales = df_sales.dropna(subset=['TransactionID', 'SaleDate'])  # Drop rows missing key information
     
     scrubber_sales = DataScrubber(df_sales)
     scrubber_sales.check_data_consistency_before_cleaning()
     scrubber_sales.inspect_data()
     
-    df_sales = scrubber_sales.handle_missing_data(fill_value="Unknown")
+    return scrubber_sales.handle_missing_data(fill_value="Unknown")
+
+def finish_sales_data(
+    df_sales: pd.DataFrame, df_customers: pd.DataFrame, df_products: pd.DataFrame, history: bool = False
+) -> pd.DataFrame:
+    """
+    Check cleaned sales against the prepared customers and products, then save and return them.
+
+    Sales with unknown keys are quarantined. With history=True, transactions
+    prepared in an earlier run are dropped and the rest are appended to the
+    prepared file, and only the appended rows are returned. Their transactions
+    are added to the history store only after the append succeeds.
+    """
+    sales_references = {
+        "CustomerID": KeyIndex(df_customers["CustomerID"]),
+        "ProductID": KeyIndex(df_products["ProductID"]),
+    }
+    df_sales = enforce_foreign_keys(df_sales, sales_references, SALES_ORPHANS_PATH)
+    scrubber_sales = DataScrubber(df_sales)
+    sales_history = open_sales_history(history)
+    if sales_history is not None:
+        df_sales = scrubber_sales.remove_duplicate_records(SALES_KEY_COLUMNS, sales_history)
     scrubber_sales.check_data_consistency_after_cleaning()
 
-    save_prepared_data(df_sales, "sales_data_prepared.csv")
+    if sales_history is not None:
+        append_prepared_data(df_sales, "sales_data_prepared.csv")
+        record_sales_history(sales_history, df_sales)
+    else:
+        save_prepared_data(df_sales, "sales_data_prepared.csv")
+        reset_sales_history()
+    return df_sales
+
+def main(history: bool = False) -> None:
+    """Main function for pre-processing customer, product, and sales data."""
+    logger.info("======================")
+    logger.info("STARTING data_prep.py")
+    logger.info("======================")
+
+    df_customers = prepare_customers_data()
+    df_products = prepare_products_data()
+    finish_sales_data(clean_sales_data(), df_customers, df_products, history)
 
     logger.info("======================")
     logger.info("FINISHED data_prep.py")
     logger.info("======================")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Prepare raw data files.")
+    parser.add_argument("--stream", action="store_true", help="Process raw files in bounded chunks.")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows per chunk in streaming mode.")
+    parser.add_argument("--history", action="store_true", help="Drop sales already prepared in an earlier run.")
+    args = parser.parse_args()
+    if args.stream:
+        main_streaming(args.chunk_size, args.history)
+    else:
+        main(args.history)
\ No newline at end of file
@@ -55,7 +55,7 @@ def main() -> None:
     df_sales.columns = df_sales.columns.str.strip()  # Clean column names
     df_sales = df_sales.drop_duplicates()            # Remove duplicates
 
-    df_sales['SaleDate'] = pd.to_datetime(df_sales['SaleDate'], errors='coerce')  # Ensure sale_date is datetime
+    df_sales['SaleDate'] = DataScrubber.parse_dates(df_sales['SaleDate'], errors='coerce')  # Ensure sale_date is datetime
     df_sales = df_sales.dropna(subset=['TransactionID','CustomerID','ProductID','StoreID', 'SaleDate'])  # Drop rows missing key information
     
     scrubber_sales = DataScrubber(df_sales)
@@ -12,11 +12,365 @@ re-usable cleaning and preparation methods.
 
 See the associated test script in the tests folder. 
 
+To avoid one full DataFrame copy per cleaning step, call plan() to record the steps
+lazily, then explain() to see the fused plan and execute() to run it in one pass.
+
+    scrubber.plan().drop_columns(['Date']).filter_column_outliers('Score', 10, 25) \
+        .rename_columns({'ID': 'Identifier'}).execute()
+
+Date strings are parsed with DataScrubber.parse_dates(): the format is inferred from
+a sample of the distinct strings, each distinct string is parsed once with that
+explicit format, and only the strings that do not match it are parsed one by one.
+
+optimize_dtypes() downcasts numbers and dictionary-encodes low-cardinality strings.
+
+profile() computes null counts, the duplicate row count, min/max/mean and a
+HyperLogLog distinct-count estimate per column in one pass, optionally over a
+random sample. The consistency checks and inspect_data() read from it. The result
+is cached on the scrubber until its DataFrame is replaced or changed by a method;
+call invalidate_profile() after changing scrubber.df in place yourself.
+
+remove_duplicate_records() can dedupe on chosen key columns, and against every
+earlier batch when given a FingerprintStore: a folder holding the 64-bit
+fingerprints of all rows kept so far as sorted .npy runs behind a Bloom filter.
+
+split_foreign_key_orphans() checks foreign key columns (e.g. a sale's CustomerID)
+against a KeyIndex of each referenced table's keys: a sorted int64 array built once
+and probed with one searchsorted per column. Float-ified IDs such as 1008.0 are
+turned back into integers first.
+
 """
 
 import io
+import json
+import os
+import pathlib
+import numpy as np
 import pandas as pd
-from typing import Dict, Tuple, Union, List
+from typing import Any, Dict, Optional, Tuple, Union, List
+
+# Candidate formats for DataScrubber.infer_date_format(), tried in this order.
+# Month-first comes before day-first, as in pd.to_datetime(dayfirst=False).
+DATE_FORMATS: List[str] = [
+    "%Y-%m-%d",
+    "%m/%d/%Y",
+    "%d/%m/%Y",
+    "%Y/%m/%d",
+    "%m-%d-%Y",
+    "%d-%m-%Y",
+    "%d.%m.%Y",
+    "%Y%m%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%Y %H:%M",
+]
+DATE_SAMPLE_SIZE: int = 1000  # Distinct strings used to infer a date format
+CATEGORY_THRESHOLD: float = 0.5  # Strings with at most this share of distinct values become categoricals
+HLL_PRECISION: int = 14  # 2**14 HyperLogLog registers, about 0.8% standard error
+
+BLOOM_FALSE_POSITIVE_RATE: float = 0.01
+FINGERPRINT_RUNS_PER_TIER: int = 4  # Runs of one size tier in a FingerprintStore that are merged into one
+DENSE_KEY_SPAN: int = 64  # A KeyIndex uses a lookup table when max - min is at most this many times the key count
+
+def fingerprint_rows(df: pd.DataFrame, key_columns: Optional[List[str]] = None) -> np.ndarray:
+    """
+    Hash every row of a DataFrame, or just its key columns, to a 64-bit fingerprint.
+
+    Numeric columns are hashed as float64 so the same row gets the same fingerprint
+    whether it was parsed as int (no missing values) or float (some missing values).
+    """
+    if key_columns is not None:
+        missing = [column for column in key_columns if column not in df.columns]
+        if missing:
+            raise ValueError(f"Key columns {missing} not found in the DataFrame.")
+        df = df[key_columns]
+    normalized = df.apply(
+        lambda col: col.astype("float64") if pd.api.types.is_numeric_dtype(col) else col
+    )
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+class FingerprintStore:
+    """
+    A persisted set of 64-bit row fingerprints, for deduping each new batch against all of history.
+
+    The fingerprints are kept in a folder as sorted .npy runs, memory-mapped on lookup.
+    A Bloom filter in front of them answers "never seen" for most new rows without
+    touching the runs, and the runs give the exact answer for the rest. Adding a batch
+    writes one new run and sets its Bloom bits, so the cost follows the batch size.
+
+    Runs are compacted by size tier, as in a log-structured merge tree: once runs_per_tier
+    runs of about the same size (the same power of runs_per_tier) exist, only those are
+    merged into one run of the next tier. Each fingerprint is merged O(log n) times in all,
+    and a lookup probes at most runs_per_tier - 1 runs per tier, O(log n) runs.
+    """
+
+    def __init__(self, directory: pathlib.Path, capacity: int = 10_000_000, runs_per_tier: int = FINGERPRINT_RUNS_PER_TIER):
+        """
+        Open the store in directory, creating it if needed.
+        
+        Parameters:
+            directory (pathlib.Path): Folder for the Bloom filter, the runs and meta.json.
+            capacity (int): Expected number of fingerprints, used to size a new Bloom filter.
+                More are allowed; lookups stay exact but the filter skips fewer of them.
+            runs_per_tier (int): Number of runs of one size tier that are merged into one.
+        """
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.runs_per_tier = runs_per_tier
+        self.meta_path = self.directory.joinpath("meta.json")
+        self.bloom_path = self.directory.joinpath("bloom.npy")
+        if self.meta_path.exists():
+            self.meta = json.loads(self.meta_path.read_text())
+        else:
+            bits = int(np.ceil(-capacity * np.log(BLOOM_FALSE_POSITIVE_RATE) / np.log(2) ** 2 / 8)) * 8
+            hashes = max(1, int(round(bits / capacity * np.log(2))))
+            self.meta = {"bits": bits, "hashes": hashes, "count": 0, "runs": [], "next_run": 0, "seeded": False}
+            np.save(self.bloom_path, np.zeros(bits // 8, dtype=np.uint8))
+            self._write_meta()
+        self.meta.setdefault("run_sizes", {})
+        self.bloom = np.load(self.bloom_path, mmap_mode="r+")
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    @property
+    def seeded(self) -> bool:
+        """True once seed() has run. Stores written before seed() existed count as not seeded."""
+        return self.meta.get("seeded", False)
+
+    def _write_meta(self) -> None:
+        temp_path = self.meta_path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(self.meta))
+        os.replace(temp_path, self.meta_path)  # Readers see the old or the new run list, never half of one
+
+    def _bloom_positions(self, fingerprints: np.ndarray) -> np.ndarray:
+        """Return the Bloom bit positions of each fingerprint, shape (hashes, n), by double hashing."""
+        low = fingerprints & np.uint64(0xFFFFFFFF)
+        high = (fingerprints >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.meta["hashes"], dtype=np.uint64)[:, None]
+        return ((low + steps * high) % np.uint64(self.meta["bits"])).astype(np.int64)
+
+    def _run_size(self, run: str) -> int:
+        """Number of fingerprints in a run, read from its .npy header if meta.json predates run_sizes."""
+        if run not in self.meta["run_sizes"]:
+            self.meta["run_sizes"][run] = len(np.load(self.directory.joinpath(run), mmap_mode="r"))
+        return self.meta["run_sizes"][run]
+
+    def _tier(self, run: str) -> int:
+        return int(np.log(max(self._run_size(run), 1)) // np.log(self.runs_per_tier))
+
+    def contains(self, fingerprints: np.ndarray) -> np.ndarray:
+        """Return a boolean array, True where the fingerprint is already in the store."""
+        fingerprints = np.asarray(fingerprints, dtype=np.uint64)
+        positions = self._bloom_positions(fingerprints)
+        maybe = np.all((self.bloom[positions >> 3] >> (positions & 7).astype(np.uint8)) & 1, axis=0)
+        found = np.zeros(len(fingerprints), dtype=bool)
+        candidates = np.flatnonzero(maybe)
+        for run in self.meta["runs"]:
+            if not len(candidates):
+                break
+            sorted_run = np.load(self.directory.joinpath(run), mmap_mode="r")
+            probe = fingerprints[candidates]
+            slots = np.minimum(np.searchsorted(sorted_run, probe), len(sorted_run) - 1)
+            hit = sorted_run[slots] == probe
+            found[candidates[hit]] = True
+            candidates = candidates[~hit]
+        return found
+
+    def add(self, fingerprints: np.ndarray, assume_new: bool = False) -> int:
+        """
+        Add fingerprints to the store, skipping any already in it.
+
+        Parameters:
+            fingerprints (np.ndarray): 64-bit fingerprints to add.
+            assume_new (bool): The caller has already removed duplicates and fingerprints
+                found by contains(), e.g. with DataScrubber.remove_duplicate_records(),
+                so they are stored without being looked up again.
+        
+        Returns:
+            int: Number of new fingerprints stored.
+        """
+        new = np.asarray(fingerprints, dtype=np.uint64)
+        if assume_new:
+            new = np.sort(new)  # A run must be sorted
+        else:
+            new = np.unique(new)
+            new = new[~self.contains(new)]
+        if not len(new):
+            return 0
+
+        run = f"run_{self.meta['next_run']:06d}.npy"
+        np.save(self.directory.joinpath(run), new)
+        positions = self._bloom_positions(new).ravel()
+        np.bitwise_or.at(self.bloom, positions >> 3, (1 << (positions & 7)).astype(np.uint8))
+        self.bloom.flush()
+
+        self.meta["runs"].append(run)
+        self.meta["run_sizes"][run] = len(new)
+        self.meta["next_run"] += 1
+        self.meta["count"] += len(new)
+        self._compact()
+        self._write_meta()
+        return len(new)
+
+    def seed(self, fingerprints: np.ndarray) -> int:
+        """
+        Add the fingerprints of rows kept before the store existed, and mark the store seeded.
+
+        Call it once, when seeded is False; the flag is written with the new run, so a
+        store is never left seeded with only part of its history.
+
+        Returns:
+            int: Number of new fingerprints stored.
+        """
+        self.meta["seeded"] = True
+        added = self.add(fingerprints)
+        if not added:
+            self._write_meta()
+        return added
+
+    def _compact(self) -> None:
+        """
+        Merge the runs of any size tier that holds runs_per_tier runs into one run, repeatedly.
+
+        Only runs of similar size are merged, so merging never rewrites all of history
+        just because a small batch arrived. The merged runs are already sorted, so the
+        stable sort of their concatenation is a merge of a few runs.
+        """
+        while True:
+            tiers: Dict[int, List[str]] = {}
+            for run in self.meta["runs"]:
+                tiers.setdefault(self._tier(run), []).append(run)
+            full = [runs for runs in tiers.values() if len(runs) >= self.runs_per_tier]
+            if not full:
+                return
+            old_runs = full[0]
+            merged = np.sort(np.concatenate([np.load(self.directory.joinpath(run)) for run in old_runs]), kind="stable")
+            run = f"run_{self.meta['next_run']:06d}.npy"
+            np.save(self.directory.joinpath(run), merged)
+            self.meta["runs"] = [kept for kept in self.meta["runs"] if kept not in old_runs] + [run]
+            self.meta["run_sizes"][run] = len(merged)
+            for old_run in old_runs:
+                del self.meta["run_sizes"][old_run]
+            self.meta["next_run"] += 1
+            self._write_meta()
+            for old_run in old_runs:
+                self.directory.joinpath(old_run).unlink()
+
+def normalize_key_column(column: pd.Series) -> Tuple[pd.Series, np.ndarray]:
+    """
+    Turn an ID column into nullable integers, e.g. 1008.0 or "1008" into 1008.
+
+    Returns:
+        tuple: (the Int64 column, boolean array that is True where a value was present
+            but is not a whole number, e.g. 1008.5 or "abc"; those become NA).
+    """
+    if pd.api.types.is_integer_dtype(column) and not pd.api.types.is_extension_array_dtype(column):
+        return column.astype("Int64"), np.zeros(len(column), dtype=bool)
+    numeric = pd.to_numeric(column, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    whole = np.isfinite(numeric) & (numeric == np.round(numeric))
+    keys = pd.array(np.where(whole, numeric, 0).astype(np.int64), dtype="Int64")
+    keys[~whole] = pd.NA
+    return pd.Series(keys, index=column.index, name=column.name), ~whole & column.notna().to_numpy()
+
+class KeyIndex:
+    """
+    The distinct keys of a referenced table, for vectorized lookups.
+
+    Keys are kept as a sorted int64 array probed with searchsorted. When they are
+    compact (surrogate IDs usually are), a boolean table indexed by key - min is
+    kept as well, so each probe is one array read instead of a binary search.
+    """
+
+    def __init__(self, keys: pd.Series):
+        """
+        Build the index once from the referenced table's key column.
+
+        Parameters:
+            keys (pd.Series): The primary key column, e.g. customers['CustomerID']. Missing
+                and non-integer values are left out.
+        """
+        normalized, _ = normalize_key_column(keys)
+        sorted_keys = np.sort(normalized.dropna().to_numpy(dtype=np.int64))
+        self.keys = sorted_keys[np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]])] if len(sorted_keys) else sorted_keys
+        self.table = None
+        if len(self.keys) and self.keys[-1] - self.keys[0] <= DENSE_KEY_SPAN * len(self.keys):
+            self.table = np.zeros(int(self.keys[-1] - self.keys[0]) + 1, dtype=bool)
+            self.table[self.keys - self.keys[0]] = True
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def contains(self, values: np.ndarray) -> np.ndarray:
+        """Return a boolean array, True where the int64 value is one of the keys."""
+        if not len(self.keys):
+            return np.zeros(len(values), dtype=bool)
+        if self.table is not None:
+            offsets = values - self.keys[0]
+            in_range = (offsets >= 0) & (offsets < len(self.table))
+            found = np.zeros(len(values), dtype=bool)
+            found[in_range] = self.table[offsets[in_range]]
+            return found
+        slots = np.minimum(np.searchsorted(self.keys, values), len(self.keys) - 1)
+        return self.keys[slots] == values
+
+def hyperloglog_registers(hashes: np.ndarray, precision: int = HLL_PRECISION) -> np.ndarray:
+    """
+    Build the HyperLogLog registers for an array of 64-bit hashes.
+
+    The top precision bits pick a register, which keeps the highest position of the
+    first set bit seen in the remaining bits. Registers of two sets merge with np.maximum.
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    index = (hashes >> np.uint64(64 - precision)).astype(np.intp)
+    rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+    # Bit length of rest: smear the highest set bit downwards, then count the set bits
+    for shift in (1, 2, 4, 8, 16, 32):
+        rest |= rest >> np.uint64(shift)
+    rank = (64 - precision + 1 - np.bitwise_count(rest)).astype(np.uint8)
+    registers = np.zeros(1 << precision, dtype=np.uint8)
+    np.maximum.at(registers, index, rank)
+    return registers
+
+def hyperloglog_estimate(registers: np.ndarray) -> int:
+    """Estimate the number of distinct hashes from HyperLogLog registers."""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * np.log(m / zeros)  # Linear counting for small sets
+    return int(round(estimate))
+
+def optimize_column_dtype(column: pd.Series, category_threshold: float = CATEGORY_THRESHOLD) -> pd.Series:
+    """
+    Return the column in the smallest dtype that holds the same values.
+
+    Integers are downcast to the smallest signed integer type, floats to float32 only when
+    no value changes, and strings with few distinct values are dictionary-encoded as categoricals.
+    """
+    if pd.api.types.is_bool_dtype(column) or isinstance(column.dtype, pd.CategoricalDtype):
+        return column
+    if pd.api.types.is_integer_dtype(column) and not pd.api.types.is_extension_array_dtype(column):
+        return pd.to_numeric(column, downcast="integer")
+    if pd.api.types.is_float_dtype(column) and not pd.api.types.is_extension_array_dtype(column):
+        narrowed = column.astype("float32")
+        if np.array_equal(narrowed.to_numpy(dtype="float64"), column.to_numpy(), equal_nan=True):
+            return narrowed
+        return column
+    if pd.api.types.is_object_dtype(column) or pd.api.types.is_string_dtype(column):
+        distinct = column.nunique()
+        if len(column) and distinct < len(column) and distinct <= category_threshold * len(column):
+            return column.astype("category")
+    return column
+
+def fillna_keeping_categories(column: pd.Series, fill_value: Union[float, int, str]) -> pd.Series:
+    """Fill missing values, first adding fill_value to the categories of a categorical column."""
+    if not column.hasnans:
+        return column
+    if isinstance(column.dtype, pd.CategoricalDtype) and fill_value not in column.cat.categories:
+        column = column.cat.add_categories([fill_value])
+    return column.fillna(fill_value)
 
 class DataScrubber:
     def __init__(self, df: pd.DataFrame):
@@ -26,8 +380,90 @@ class DataScrubber:
         Parameters:
             df (pd.DataFrame): The DataFrame to be scrubbed.
         """
+        self._profiles: Dict[Tuple[Optional[int], int], Dict[str, Any]] = {}
         self.df = df
 
+    @property
+    def df(self) -> pd.DataFrame:
+        """The DataFrame being scrubbed. Assigning a new one invalidates the cached profile."""
+        return self._df
+
+    @df.setter
+    def df(self, df: pd.DataFrame) -> None:
+        self._df = df
+        self.invalidate_profile()
+
+    def invalidate_profile(self) -> None:
+        """Drop the cached profile. Call this after changing self.df in place."""
+        self._profiles.clear()
+
+    def profile(self, sample_rows: Optional[int] = None, seed: int = 42) -> Dict[str, Any]:
+        """
+        Profile the DataFrame in one pass: nulls, duplicates, min/max/mean and distinct counts.
+        
+        Each column is hashed once. The column hashes give the HyperLogLog distinct-count
+        estimate and are combined into row hashes for the duplicate count. Results are cached
+        until the DataFrame is replaced or a scrubber method changes it.
+        
+        Parameters:
+            sample_rows (int, optional): Profile a random sample of this many rows instead of
+                every row. Null counts are then scaled up to the full frame. The duplicate
+                count is the sample's own: a duplicate is only seen when both copies are
+                sampled, so scaling it up linearly would be biased, but unscaled it is a
+                lower bound on the frame's. Distinct counts are those of the sample.
+            seed (int): Random seed for the sample.
+        
+        Returns:
+            dict: 'rows', 'sampled', 'null_counts' (Series), 'duplicate_count' (int) and
+                'stats' (DataFrame with dtype, nulls, distinct, min, max and mean per column).
+        """
+        key = (sample_rows, seed)
+        if key in self._profiles:
+            return self._profiles[key]
+
+        df = self.df
+        sampled = sample_rows is not None and sample_rows < len(df)
+        if sampled:
+            df = df.sample(n=sample_rows, random_state=seed)
+        scale = len(self.df) / len(df) if len(df) else 1.0
+
+        row_hashes = np.zeros(len(df), dtype=np.uint64)
+        stats = {}
+        for position in range(df.shape[1]):
+            column = df.iloc[:, position]
+            missing = column.isna().to_numpy()
+            column_hashes = pd.util.hash_pandas_object(column, index=False).to_numpy()
+            row_hashes = row_hashes * np.uint64(0x100000001B3) ^ column_hashes  # FNV-style combine
+
+            entry = {"dtype": str(column.dtype), "nulls": int(round(missing.sum() * scale))}
+            entry["distinct"] = hyperloglog_estimate(hyperloglog_registers(column_hashes[~missing])) if (~missing).any() else 0
+            if pd.api.types.is_numeric_dtype(column) or pd.api.types.is_datetime64_any_dtype(column):
+                present = column[~missing]
+                entry["min"] = present.min() if len(present) else None
+                entry["max"] = present.max() if len(present) else None
+                entry["mean"] = present.mean() if len(present) and pd.api.types.is_numeric_dtype(column) else None
+            stats[df.columns[position]] = entry
+
+        stats_df = pd.DataFrame.from_dict(stats, orient="index", columns=["dtype", "nulls", "distinct", "min", "max", "mean"])
+        result = {
+            "rows": len(self.df),
+            "sampled": sampled,
+            "null_counts": stats_df["nulls"].astype("int64"),
+            "duplicate_count": int(pd.Series(row_hashes).duplicated().sum()),
+            "stats": stats_df,
+        }
+        self._profiles[key] = result
+        return result
+
+    def plan(self) -> "ScrubberPlan":
+        """
+        Start a lazy cleaning plan on this scrubber's DataFrame.
+        
+        Returns:
+            ScrubberPlan: A plan that records cleaning steps until execute() is called.
+        """
+        return ScrubberPlan(self)
+
     def check_data_consistency_before_cleaning(self) -> Dict[str, Union[pd.Series, int]]:
         """
         Check data consistency before cleaning by calculating counts of null and duplicate entries.
@@ -35,9 +471,8 @@ class DataScrubber:
         Returns:
             dict: Dictionary with counts of null values and duplicate rows.
         """
-        null_counts = self.df.isnull().sum()
-        duplicate_count = self.df.duplicated().sum()
-        return {'null_counts': null_counts, 'duplicate_count': duplicate_count}
+        profile = self.profile()
+        return {'null_counts': profile['null_counts'], 'duplicate_count': profile['duplicate_count']}
 
     def check_data_consistency_after_cleaning(self) -> Dict[str, Union[pd.Series, int]]:
         """
@@ -46,8 +481,8 @@ class DataScrubber:
         Returns:
             dict: Dictionary with counts of null values and duplicate rows, expected to be zero for each.
         """
-        null_counts = self.df.isnull().sum()
-        duplicate_count = self.df.duplicated().sum()
+        profile = self.profile()
+        null_counts, duplicate_count = profile['null_counts'], profile['duplicate_count']
         assert null_counts.sum() == 0, "Data still contains null values after cleaning."
         assert duplicate_count == 0, "Data still contains duplicate records after cleaning."
         return {'null_counts': null_counts, 'duplicate_count': duplicate_count}
@@ -68,6 +503,7 @@ class DataScrubber:
         """
         try:
             self.df[column] = self.df[column].astype(new_type)
+            self.invalidate_profile()
             return self.df
         except KeyError:
             raise ValueError(f"Column name '{column}' not found in the DataFrame.")
@@ -127,6 +563,7 @@ class DataScrubber:
         """
         try:
             self.df[column] = self.df[column].str.lower().str.strip()
+            self.invalidate_profile()
             return self.df
         except KeyError:
             raise ValueError(f"Column name '{column}' not found in the DataFrame.")
@@ -148,6 +585,7 @@ class DataScrubber:
             # TODO: Fix the following logic to call str.upper() and str.strip() on the given column 
             # HINT: See previous function for an example
             self.df[column] = self.df[column].str.upper().str.strip()
+            self.invalidate_profile()
             return self.df
         except KeyError:
             raise ValueError(f"Column name '{column}' not found in the DataFrame.")
@@ -166,7 +604,10 @@ class DataScrubber:
         if drop:
             self.df = self.df.dropna()
         elif fill_value is not None:
-            self.df = self.df.fillna(fill_value)
+            df = self.df.copy(deep=False)
+            for column in df.select_dtypes("category").columns:
+                df[column] = fillna_keeping_categories(df[column], fill_value)
+            self.df = df.fillna(fill_value)
         return self.df
 
     def inspect_data(self) -> Tuple[str, str]:
@@ -175,16 +616,109 @@ class DataScrubber:
         
         Returns:
             tuple: (info_str, describe_str), where `info_str` is a string representation of DataFrame.info()
-                   and `describe_str` is a string representation of DataFrame.describe().
+                   and `describe_str` is the profile() statistics table as a string.
         """
         buffer = io.StringIO()
-        self.df.info(buf=buffer)
+        self.df.info(buf=buffer, show_counts=False)  # The null counts come from the profile
         info_str = buffer.getvalue()  # Retrieve the string content of the buffer
 
-        # Capture the describe output as a string
-        describe_str = self.df.describe().to_string()  # Convert DataFrame.describe() output to a string
+        # Capture the profile statistics as a string
+        describe_str = self.profile()['stats'].to_string()
         return info_str, describe_str
 
+    @staticmethod
+    def infer_date_format(values: Union[pd.Series, pd.Index, np.ndarray], sample_size: int = DATE_SAMPLE_SIZE) -> Optional[str]:
+        """
+        Infer the date format of a set of strings from a sample of them.
+        
+        Parameters:
+            values: Date strings. Missing values are ignored.
+            sample_size (int): Number of distinct strings to try each candidate format on.
+        
+        Returns:
+            str or None: The format in DATE_FORMATS that parses the most sampled strings,
+                or None if none of them parses any.
+        """
+        sample = pd.Series(pd.unique(pd.Series(values).dropna())[:sample_size], dtype=object)
+        best_format, best_count = None, 0
+        for date_format in DATE_FORMATS:
+            count = pd.to_datetime(sample, format=date_format, errors="coerce").notna().sum()
+            if count > best_count:
+                best_format, best_count = date_format, count
+        return best_format
+
+    @staticmethod
+    def parse_dates(values: pd.Series, date_format: Optional[str] = None, errors: str = "raise") -> pd.Series:
+        """
+        Parse a column of date strings to datetime, parsing each distinct string only once.
+        
+        The format is inferred from a sample when not given. Strings that do not match it
+        are tried against the other DATE_FORMATS, except those that only swap day and month
+        (so an invalid 13/6/2024 is not silently read as 13 June).
+        
+        Parameters:
+            values (pd.Series): The date strings.
+            date_format (str, optional): An explicit strftime format.
+            errors (str): 'raise' or 'coerce', as for pd.to_datetime().
+        
+        Returns:
+            pd.Series: The parsed dates, with the same index and name.
+
+        Raises:
+            ValueError: If errors is 'raise' and a date string cannot be parsed.
+        """
+        if pd.api.types.is_datetime64_any_dtype(values):
+            return values
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes, uniques = values.cat.codes.to_numpy(), values.cat.categories  # Already factorized
+        elif pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+            codes, uniques = pd.factorize(values)  # Missing values get code -1
+        else:
+            return pd.to_datetime(values, errors=errors)
+        uniques = pd.Index(uniques, dtype=object)
+        date_format = date_format or DataScrubber.infer_date_format(uniques)
+        if date_format is None:
+            parsed = pd.DatetimeIndex(pd.to_datetime(uniques, format="mixed", errors=errors))
+        else:
+            parsed_values = pd.to_datetime(uniques, format=date_format, errors="coerce").to_numpy().copy()
+
+            # Per-string fallback, for the few strings that do not match the inferred format
+            swapped = date_format.replace("%d", "%m")
+            for fallback in DATE_FORMATS:
+                outliers = np.isnat(parsed_values)
+                if not outliers.any():
+                    break
+                if fallback == date_format or fallback.replace("%d", "%m") == swapped:
+                    continue
+                retry = pd.to_datetime(uniques[outliers], format=fallback, errors="coerce")
+                parsed_values[outliers] = retry.to_numpy().astype(parsed_values.dtype)
+
+            if errors == "raise" and np.isnat(parsed_values).any():
+                bad = list(uniques[np.isnat(parsed_values)][:5])
+                raise ValueError(f"Could not parse dates {bad} with format '{date_format}' or a fallback format.")
+            parsed = pd.DatetimeIndex(parsed_values)
+
+        return pd.Series(parsed.take(codes, allow_fill=True, fill_value=pd.NaT), index=values.index, name=values.name)
+
+    def optimize_dtypes(self, category_threshold: float = CATEGORY_THRESHOLD) -> pd.DataFrame:
+        """
+        Store every column in the smallest dtype that holds the same values.
+        
+        Integers are downcast, floats become float32 when that is lossless, and string
+        columns with at most category_threshold distinct values per row become categoricals.
+        
+        Parameters:
+            category_threshold (float): Largest share of distinct values for a categorical column.
+        
+        Returns:
+            pd.DataFrame: Updated DataFrame with optimized dtypes.
+        """
+        df = self.df.copy(deep=False)
+        for column in df.columns:
+            df[column] = optimize_column_dtype(df[column], category_threshold)
+        self.df = df
+        return self.df
+
     def parse_dates_to_add_standard_datetime(self, column: str) -> pd.DataFrame:
         """
         Parse a specified column as datetime format and add it as a new column named 'StandardDateTime'.
@@ -199,22 +733,84 @@ class DataScrubber:
             ValueError: If the specified column not found in the DataFrame.
         """
         try:
-            self.df['StandardDateTime'] = pd.to_datetime(self.df[column])
+            self.df['StandardDateTime'] = self.parse_dates(self.df[column])
+            self.invalidate_profile()
             return self.df
         except KeyError:
             raise ValueError(f"Column name '{column}' not found in the DataFrame.")
 
-    def remove_duplicate_records(self) -> pd.DataFrame:
+    def remove_duplicate_records(
+        self, key_columns: Optional[List[str]] = None, fingerprint_store: Optional[FingerprintStore] = None
+    ) -> pd.DataFrame:
         """
-        Remove duplicate rows from the DataFrame.
+        Remove duplicate rows from the DataFrame, keeping the first of each.
+        
+        Rows are compared by their 64-bit fingerprint over key_columns, or over the whole row.
+        With a fingerprint_store, rows already kept in an earlier batch are removed too. The
+        store is only read: once the kept rows are safely written, add their fingerprints with
+        fingerprint_store.add(fingerprint_rows(df, key_columns), assume_new=True), so rows
+        that never reach the output are not marked as seen.
+        
+        Parameters:
+            key_columns (list, optional): Columns that identify a record, e.g. ['TransactionID'].
+            fingerprint_store (FingerprintStore, optional): Fingerprints of all earlier batches.
         
         Returns:
             pd.DataFrame: Updated DataFrame with duplicates removed.
 
+        Raises:
+            ValueError: If a key column is not found in the DataFrame.
         """
-        self.df = self.df.drop_duplicates()
+        fingerprints = fingerprint_rows(self.df, key_columns)
+        keep = ~pd.Series(fingerprints).duplicated().to_numpy()
+        if fingerprint_store is not None:
+            keep &= ~fingerprint_store.contains(fingerprints)
+        self.df = self.df[keep]
         return self.df
 
+    def split_foreign_key_orphans(self, references: Dict[str, KeyIndex]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Keep only the rows whose foreign keys exist in the referenced tables.
+
+        Each foreign key column is turned into Int64 (so 1008.0 is kept as 1008) and
+        checked against its KeyIndex in one vectorized pass. A missing key is allowed,
+        as a NULL foreign key is in SQL. A key that is not found, or is not a whole
+        number, makes the row an orphan.
+
+        Parameters:
+            references (dict): Foreign key column -> KeyIndex of the referenced keys,
+                e.g. {'CustomerID': KeyIndex(customers['CustomerID'])}.
+
+        Returns:
+            tuple: (the valid rows, now the scrubber's DataFrame; the orphan rows as they
+                were, with an OrphanKeys column naming the keys that failed).
+
+        Raises:
+            ValueError: If a foreign key column is not found in the DataFrame.
+        """
+        missing = [column for column in references if column not in self.df.columns]
+        if missing:
+            raise ValueError(f"Foreign key columns {missing} not found in the DataFrame.")
+
+        normalized = {}
+        failed = {}
+        for column, key_index in references.items():
+            keys, malformed = normalize_key_column(self.df[column])
+            present = keys.notna().to_numpy()
+            found = np.ones(len(keys), dtype=bool)
+            found[present] = key_index.contains(keys.to_numpy(dtype=np.int64, na_value=0)[present])
+            normalized[column] = keys
+            failed[column] = malformed | ~found
+
+        orphan = np.logical_or.reduce(list(failed.values())) if failed else np.zeros(len(self.df), dtype=bool)
+        orphans = self.df[orphan].copy()
+        orphans["OrphanKeys"] = [
+            ",".join(column for column in references if failed[column][position])
+            for position in np.flatnonzero(orphan)
+        ]
+        self.df = self.df.assign(**normalized)[~orphan]
+        return self.df, orphans
+
     def rename_columns(self, column_mapping: Dict[str, str]) -> pd.DataFrame:
         """
         Rename columns in the DataFrame based on a provided mapping.
@@ -253,4 +849,234 @@ class DataScrubber:
             if column not in self.df.columns:
                 raise ValueError(f"Column name '{column}' not found in the DataFrame.")
         self.df = self.df[columns]
-        return self.df
\ No newline at end of file
+        return self.df
+
+
+class ScrubberPlan:
+    """
+    A lazy, fused version of the DataScrubber cleaning methods.
+
+    Each method records a step and returns the plan so calls can be chained.
+    Renames, drops and reorders only change the column bookkeeping. execute() then
+    reads just the source columns the plan needs, combines every row filter into
+    one boolean mask, and builds the output DataFrame once.
+    """
+
+    def __init__(self, scrubber: DataScrubber):
+        """
+        Initialize the plan with the scrubber whose DataFrame will be cleaned.
+        
+        Parameters:
+            scrubber (DataScrubber): The scrubber to update when the plan is executed.
+        """
+        self.scrubber = scrubber
+        self.steps: List[Tuple[Any, ...]] = []
+        # Current columns as (current name, source key) pairs
+        self.columns: List[Tuple[str, str]] = [(name, name) for name in scrubber.df.columns]
+
+    def _source_key(self, column: str) -> str:
+        """Return the source key for a current column name, or raise ValueError if missing."""
+        for name, key in self.columns:
+            if name == column:
+                return key
+        raise ValueError(f"Column name '{column}' not found in the DataFrame.")
+
+    def _current_keys(self) -> List[str]:
+        """Return the source keys of all current columns."""
+        return [key for _, key in self.columns]
+
+    def convert_column_to_new_data_type(self, column: str, new_type: type) -> "ScrubberPlan":
+        """Record a conversion of a column to a new data type."""
+        self.steps.append(("astype", self._source_key(column), new_type))
+        return self
+
+    def drop_columns(self, columns: List[str]) -> "ScrubberPlan":
+        """Record dropping the specified columns."""
+        for column in columns:
+            self._source_key(column)
+        self.columns = [(name, key) for name, key in self.columns if name not in columns]
+        return self
+
+    def filter_column_outliers(self, column: str, lower_bound: Union[float, int], upper_bound: Union[float, int]) -> "ScrubberPlan":
+        """Record a filter that keeps rows where the column is within the bounds."""
+        self.steps.append(("filter", self._source_key(column), lower_bound, upper_bound))
+        return self
+
+    def format_column_strings_to_lower_and_trim(self, column: str) -> "ScrubberPlan":
+        """Record converting a string column to lowercase and trimming whitespace."""
+        self.steps.append(("lower", self._source_key(column)))
+        return self
+
+    def format_column_strings_to_upper_and_trim(self, column: str) -> "ScrubberPlan":
+        """Record converting a string column to uppercase and trimming whitespace."""
+        self.steps.append(("upper", self._source_key(column)))
+        return self
+
+    def handle_missing_data(self, drop: bool = False, fill_value: Union[None, float, int, str] = None) -> "ScrubberPlan":
+        """Record dropping rows with missing values, or filling them with fill_value."""
+        if drop:
+            self.steps.append(("dropna", self._current_keys()))
+        elif fill_value is not None:
+            self.steps.append(("fillna", self._current_keys(), fill_value))
+        return self
+
+    def parse_dates_to_add_standard_datetime(self, column: str) -> "ScrubberPlan":
+        """Record parsing a column as datetime into a new 'StandardDateTime' column."""
+        source_key = self._source_key(column)
+        new_key = f"StandardDateTime#{len(self.steps)}"  # Derived columns get a unique key
+        self.steps.append(("to_datetime", source_key, new_key))
+        self.columns = [(name, key) for name, key in self.columns if name != "StandardDateTime"]
+        self.columns.append(("StandardDateTime", new_key))
+        return self
+
+    def remove_duplicate_records(self, key_columns: Optional[List[str]] = None) -> "ScrubberPlan":
+        """Record removing rows that duplicate an earlier row on key_columns, or on all current columns."""
+        keys = [self._source_key(column) for column in key_columns] if key_columns else self._current_keys()
+        self.steps.append(("dedupe", keys))
+        return self
+
+    def rename_columns(self, column_mapping: Dict[str, str]) -> "ScrubberPlan":
+        """Record renaming columns. Renames are folded into the final output."""
+        for old_name in column_mapping:
+            self._source_key(old_name)
+        self.columns = [(column_mapping.get(name, name), key) for name, key in self.columns]
+        return self
+
+    def reorder_columns(self, columns: List[str]) -> "ScrubberPlan":
+        """Record selecting the specified columns in the specified order."""
+        self.columns = [(column, self._source_key(column)) for column in columns]
+        return self
+
+    # How many arguments after each step's kind are column keys (a key or a list of keys).
+    # The rest are values, such as a fill value or a dtype name, even when they are strings.
+    STEP_KEY_ARGS: Dict[str, int] = {
+        "astype": 1, "filter": 1, "lower": 1, "upper": 1, "dropna": 1, "fillna": 1, "dedupe": 1, "to_datetime": 2,
+    }
+
+    def _keys_used(self, steps: List[Tuple[Any, ...]]) -> set:
+        """Return the keys read or written by the given steps plus the output columns."""
+        used = set(self._current_keys())
+        for step in steps:
+            for arg in step[1:1 + self.STEP_KEY_ARGS[step[0]]]:
+                used.update(arg if isinstance(arg, list) else [arg])
+        return used
+
+    def _scan_keys(self) -> List[str]:
+        """Return the source columns the plan reads, in their original order."""
+        used = self._keys_used(self.steps)
+        return [column for column in self.scrubber.df.columns if column in used]
+
+    def explain(self) -> str:
+        """
+        Describe the fused plan that execute() will run.
+        
+        Returns:
+            str: One line per fused operation.
+        """
+        def label(key: str) -> str:
+            return key.split("#")[0]
+
+        scan_keys = self._scan_keys()
+        lines = [f"Scan {len(scan_keys)} of {len(self.scrubber.df.columns)} columns: {', '.join(scan_keys)}"]
+        masks = []
+        for step in self.steps:
+            kind = step[0]
+            if kind == "filter":
+                masks.append(f"{label(step[1])} between {step[2]} and {step[3]}")
+                continue
+            if kind == "dropna":
+                masks.append(f"no missing values in {', '.join(map(label, step[1]))}")
+                continue
+            if kind == "dedupe":
+                masks.append(f"not duplicated on {', '.join(map(label, step[1]))}")
+                continue
+            if masks:
+                lines.append("Mask: " + " AND ".join(masks))
+                masks = []
+            if kind == "fillna":
+                lines.append(f"Transform: fill missing with {step[2]!r} in {', '.join(map(label, step[1]))}")
+            elif kind == "astype":
+                lines.append(f"Transform: {label(step[1])} as {step[2]}")
+            elif kind in ("lower", "upper"):
+                lines.append(f"Transform: {label(step[1])} to {kind}case and trim")
+            elif kind == "to_datetime":
+                lines.append(f"Transform: parse {label(step[1])} into StandardDateTime")
+        if masks:
+            lines.append("Mask: " + " AND ".join(masks))
+        renames = [f"{label(key)} -> {name}" for name, key in self.columns if name != label(key)]
+        lines.append(
+            f"Materialize once: {', '.join(name for name, _ in self.columns)}"
+            + (f" (renamed {', '.join(renames)})" if renames else "")
+        )
+        return "\n".join(lines)
+
+    def execute(self) -> pd.DataFrame:
+        """
+        Run the plan in one pass and store the result on the scrubber.
+        
+        Returns:
+            pd.DataFrame: The cleaned DataFrame.
+        """
+        df = self.scrubber.df
+        values: Dict[str, pd.Series] = {key: df[key] for key in self._scan_keys()}
+        mask = np.ones(len(df), dtype=bool)
+
+        index = df.index
+
+        def compact(remaining_steps: List[Tuple[Any, ...]]) -> np.ndarray:
+            # Drop masked rows, and columns no later step needs, before running a transform.
+            # All columns share one compacted index instead of each Series copying its own.
+            nonlocal index
+            index = index[mask]
+            used = self._keys_used(remaining_steps)
+            for key in list(values):
+                if key in used:
+                    values[key] = pd.Series(values[key].array[mask], index=index, copy=False)
+                else:
+                    del values[key]
+            return np.ones(len(index), dtype=bool)
+
+        for position, step in enumerate(self.steps):
+            kind = step[0]
+            if kind == "filter":
+                column = values[step[1]]
+                mask &= ((column >= step[2]) & (column <= step[3])).to_numpy()
+            elif kind == "dropna":
+                for key in step[1]:
+                    mask &= values[key].notna().to_numpy()
+            elif kind == "dedupe":
+                # Combine per-column factorized codes into one row code instead of building a sub-frame
+                alive = np.flatnonzero(mask)
+                row_codes = np.zeros(len(alive), dtype=np.int64)
+                code_space = 1
+                for key in step[1]:
+                    codes, uniques = pd.factorize(values[key], use_na_sentinel=False)
+                    if code_space * len(uniques) >= 2**62:
+                        # Re-number the combined codes densely so they still fit in int64
+                        row_codes, seen = pd.factorize(row_codes)
+                        code_space = len(seen)
+                    row_codes = row_codes * len(uniques) + codes[alive]
+                    code_space *= max(len(uniques), 1)
+                    del codes, uniques
+                mask[alive[pd.Series(row_codes).duplicated().to_numpy()]] = False
+                del alive, row_codes  # Free the per-row scratch arrays before the next step
+            else:
+                if not mask.all():
+                    mask = compact(self.steps[position:])
+                if kind == "fillna":
+                    for key in step[1]:
+                        if values[key].hasnans:  # Skip the copy for columns with nothing to fill
+                            values[key] = fillna_keeping_categories(values[key], step[2])
+                elif kind == "astype":
+                    values[step[1]] = values[step[1]].astype(step[2])
+                elif kind == "lower":
+                    values[step[1]] = values[step[1]].str.lower().str.strip()
+                elif kind == "upper":
+                    values[step[1]] = values[step[1]].str.upper().str.strip()
+                elif kind == "to_datetime":
+                    values[step[2]] = DataScrubber.parse_dates(values[step[1]])
+
+        if not mask.all():
+            mask = compact([])
+        self.scrubber.df = pd.DataFrame({name: values[key] for name, key in self.columns}, index=index, copy=False)
+        return self.scrubber.df
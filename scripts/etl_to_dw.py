@@ -1,34 +1,278 @@
+r"""
+Schema-driven warehouse loader
+File: scripts/etl_to_dw.py
+
+Loads the prepared CSV files of a deployment into its SQLite data warehouse.
+Each deployment (the main smart_sales warehouse and P7) is declared once in
+WAREHOUSE_MANIFESTS: its tables in load order, the prepared file behind each table,
+the CSV-to-warehouse column map, SQL types, keys, foreign keys and indexes.
+
+compile_load_plan() turns a manifest into the DDL, the prepared INSERT and upsert
+statements and the read_csv arguments. The plan is cached as JSON next to the
+database and compiled again only when the manifest changes. Every deployment
+then goes through the same bulk path: one transaction, batched executemany,
+indexes rebuilt after the load, or hash-based upserts with --incremental.
+The load connects in WAL mode (scripts/warehouse.py), so cube and goal jobs keep
+reading the last committed data while it writes, and each load is numbered in
+etl_load_log.
+
+To run it, open a terminal in the root project folder.
+Activate the local project virtual environment.
+Choose the correct command for your OS to run this script.
+
+py scripts\etl_to_dw.py
+py scripts\etl_to_dw.py --deployment all --incremental
+python3 scripts/etl_to_dw.py --deployment p7
+"""
+
+import argparse
+import hashlib
+import json
 import pandas as pd
 import sqlite3
 import pathlib
 import sys
+import time
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
 
 # For local imports, temporarily add project root to sys.path
 PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.append(str(PROJECT_ROOT))
 
+from utils.logger import logger  # noqa: E402
+from scripts.data_scrubber import fingerprint_rows  # noqa: E402
+from scripts.warehouse import connect_writer  # noqa: E402
+
 # Constants
 DW_DIR = pathlib.Path("data").joinpath("dw")
 DB_PATH = DW_DIR.joinpath("smart_sales.db")
 PREPARED_DATA_DIR = pathlib.Path("data").joinpath("prepared")
+P7_DIR = pathlib.Path("P7")
+BATCH_SIZE = 50_000  # Rows sent to executemany at a time
+LOAD_PLAN_VERSION = 1  # Bump when compile_load_plan() output changes, so cached plans are recompiled
+
+# read_csv dtypes per SQL type. INTEGER columns are left to inference, since missing values make them float.
+READ_DTYPES: Dict[str, str] = {"REAL": "float64", "TEXT": "str"}
+
+# SQLite settings for the load connection. They last only as long as the connection.
+# The journal stays in WAL mode (see scripts/warehouse.py), so readers are not blocked by a load.
+# In WAL mode synchronous=NORMAL syncs only at checkpoints: a power loss can lose the
+# last committed load, but never corrupts the database, as synchronous=OFF could.
+LOAD_PRAGMAS: Dict[str, str] = {
+    "synchronous": "NORMAL",
+    "cache_size": "-200000",  # Negative means KiB, so about 200 MB
+    "temp_store": "MEMORY",
+}
+
+# Secondary indexes on the fact table. sale_id is the rowid, so every index also carries it.
+# The two covering indexes let month/product rollups read sale_date, product_id and
+# sale_amount_usd from the index alone, and their leading columns serve plain lookups
+# on sale_date and on (product_id, sale_date).
+SALE_INDEXES: List[str] = [
+    "CREATE INDEX IF NOT EXISTS idx_sale_date_product_amount ON sale (sale_date, product_id, sale_amount_usd)",
+    "CREATE INDEX IF NOT EXISTS idx_sale_product_date_amount ON sale (product_id, sale_date, sale_amount_usd)",
+    "CREATE INDEX IF NOT EXISTS idx_sale_customer ON sale (customer_id)",
+    "CREATE INDEX IF NOT EXISTS idx_sale_store ON sale (store_id)",
+]
+
+# Denormalized copy of the fact table: each sale with its customer and product attributes,
+# so cubes can group by region or category without joining on every build.
+# Kept current by refresh_sale_wide() after each load.
+SALE_WIDE_SELECT: str = """
+    SELECT s.sale_id, s.sale_date, s.customer_id, s.product_id, s.store_id, s.campaign_id,
+           s.sale_amount_usd, s.discount_percent, s.payment_type,
+           c.name AS customer_name, c.region, c.join_date, c.loyalty_points, c.preferred_contact_method,
+           p.product_name, p.category, p.unit_price, p.stock_quantity, p.bin_number
+    FROM sale s
+    LEFT JOIN customer c ON c.customer_id = s.customer_id
+    LEFT JOIN product p ON p.product_id = s.product_id
+"""
+
+
+class ColumnSpec(NamedTuple):
+    """One warehouse column, and the prepared CSV column it is loaded from."""
+    source: str
+    name: str
+    sql_type: str  # INTEGER, REAL or TEXT
+
+
+class TableSpec(NamedTuple):
+    """One warehouse table, loaded from one prepared CSV file."""
+    name: str
+    prepared_file: str
+    key: str
+    columns: Tuple[ColumnSpec, ...]
+    foreign_keys: Optional[Dict[str, str]] = None  # Column -> referenced table, keyed on a column of the same name
+    indexes: Tuple[str, ...] = ()
+
+
+class WarehouseManifest(NamedTuple):
+    """One deployment: where its prepared files and database live, and its tables in load order."""
+    name: str
+    db_path: pathlib.Path
+    prepared_dir: pathlib.Path
+    tables: Tuple[TableSpec, ...]
+    sale_wide: bool = False  # Keep the denormalized sale_wide table current (main schema only)
+
+
+CUSTOMER_COLUMNS: Tuple[ColumnSpec, ...] = (
+    ColumnSpec("CustomerID", "customer_id", "INTEGER"),
+    ColumnSpec("Name", "name", "TEXT"),
+    ColumnSpec("Region", "region", "TEXT"),
+    ColumnSpec("JoinDate", "join_date", "TEXT"),
+)
+PRODUCT_COLUMNS: Tuple[ColumnSpec, ...] = (
+    ColumnSpec("ProductID", "product_id", "INTEGER"),
+    ColumnSpec("ProductName", "product_name", "TEXT"),
+    ColumnSpec("Category", "category", "TEXT"),
+    ColumnSpec("UnitPrice", "unit_price", "REAL"),
+)
+SALE_FOREIGN_KEYS: Dict[str, str] = {"customer_id": "customer", "product_id": "product"}
+
+WAREHOUSE_MANIFESTS: Dict[str, WarehouseManifest] = {
+    "smart_sales": WarehouseManifest("smart_sales", DB_PATH, PREPARED_DATA_DIR, (
+        TableSpec("customer", "customers_data_prepared.csv", "customer_id", CUSTOMER_COLUMNS + (
+            ColumnSpec("LoyaltyPoints", "loyalty_points", "INTEGER"),
+            ColumnSpec("PreferredContactMethod", "preferred_contact_method", "TEXT"),
+        )),
+        TableSpec("product", "products_data_prepared.csv", "product_id", PRODUCT_COLUMNS + (
+            ColumnSpec("StockQuantity", "stock_quantity", "INTEGER"),
+            ColumnSpec("BinNumber", "bin_number", "TEXT"),
+        )),
+        TableSpec("sale", "sales_data_prepared.csv", "sale_id", (
+            ColumnSpec("TransactionID", "sale_id", "INTEGER"),
+            ColumnSpec("SaleDate", "sale_date", "TEXT"),
+            ColumnSpec("CustomerID", "customer_id", "INTEGER"),
+            ColumnSpec("ProductID", "product_id", "INTEGER"),
+            ColumnSpec("StoreID", "store_id", "INTEGER"),
+            ColumnSpec("CampaignID", "campaign_id", "INTEGER"),
+            ColumnSpec("SaleAmount", "sale_amount_usd", "REAL"),
+            ColumnSpec("DiscountPercent", "discount_percent", "REAL"),
+            ColumnSpec("PaymentType", "payment_type", "TEXT"),
+        ), SALE_FOREIGN_KEYS, tuple(SALE_INDEXES)),
+    ), sale_wide=True),
+    "p7": WarehouseManifest("p7", P7_DIR.joinpath("dw").joinpath("smart_sales_P7.db"), P7_DIR.joinpath("data"), (
+        TableSpec("customer", "customers_data_P7_prepared.csv", "customer_id", CUSTOMER_COLUMNS),
+        TableSpec("product", "products_data_P7_prepared.csv", "product_id", PRODUCT_COLUMNS + (
+            ColumnSpec("UnitCost", "unit_cost", "REAL"),
+            ColumnSpec("UnitProfit", "unit_profit", "REAL"),
+        )),
+        TableSpec("sale", "sales_data_P7_prepared.csv", "sale_id", (
+            ColumnSpec("TransactionID", "sale_id", "INTEGER"),
+            ColumnSpec("SaleDate", "sale_date", "TEXT"),
+            ColumnSpec("SaleMonth", "sale_month", "TEXT"),
+            ColumnSpec("CustomerID", "customer_id", "INTEGER"),
+            ColumnSpec("ProductID", "product_id", "INTEGER"),
+            ColumnSpec("StoreID", "store_id", "INTEGER"),
+            ColumnSpec("CampaignID", "campaign_id", "INTEGER"),
+            ColumnSpec("SaleAmount", "sale_amount_usd", "REAL"),
+        ), SALE_FOREIGN_KEYS),
+    )),
+}
+
+def compile_table_plan(table: TableSpec) -> dict:
+    """Generate the DDL, the prepared INSERT and upsert statements, and the read_csv arguments for one table."""
+    names = [column.name for column in table.columns]
+    definitions = [
+        f"{column.name} {column.sql_type}" + (" PRIMARY KEY" if column.name == table.key else "")
+        for column in table.columns
+    ]
+    definitions += [
+        f"FOREIGN KEY ({column}) REFERENCES {referenced} ({column})"
+        for column, referenced in (table.foreign_keys or {}).items()
+    ]
+    insert = f"INSERT INTO {table.name} ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})"
+    updates = ", ".join(f"{name} = excluded.{name}" for name in names if name != table.key)
+    return {
+        "name": table.name,
+        "key": table.key,
+        "prepared_file": table.prepared_file,
+        "columns": names,
+        "rename": {column.source: column.name for column in table.columns},
+        "dtypes": {column.source: READ_DTYPES[column.sql_type] for column in table.columns if column.sql_type in READ_DTYPES},
+        "ddl": f"CREATE TABLE IF NOT EXISTS {table.name} (\n    " + ",\n    ".join(definitions) + "\n)",
+        "indexes": list(table.indexes),
+        "insert": insert,
+        "upsert": f"{insert} ON CONFLICT({table.key}) " + (f"DO UPDATE SET {updates}" if updates else "DO NOTHING"),
+    }
+
+def manifest_hash(manifest: WarehouseManifest) -> str:
+    """Return a short hash of the manifest and LOAD_PLAN_VERSION, the key of its cached load plan."""
+    spec = json.dumps({"version": LOAD_PLAN_VERSION, "manifest": manifest}, default=str, sort_keys=True)
+    return hashlib.sha256(spec.encode()).hexdigest()[:16]
+
+def compile_load_plan(manifest: WarehouseManifest) -> dict:
+    """Compile a manifest into the load plan that create_schema() and load_data_to_db() run."""
+    return {
+        "manifest_hash": manifest_hash(manifest),
+        "deployment": manifest.name,
+        "sale_wide": manifest.sale_wide,
+        "tables": [compile_table_plan(table) for table in manifest.tables],
+    }
+
+def get_load_plan(manifest: WarehouseManifest) -> dict:
+    """
+    Return the compiled load plan for a manifest, reusing the cached plan when the manifest is unchanged.
+
+    The plan is cached as JSON next to the database (smart_sales.db -> smart_sales.plan.json),
+    so it can also be read to see exactly which statements a load runs.
+    """
+    plan_path = manifest.db_path.with_suffix(".plan.json")
+    expected_hash = manifest_hash(manifest)
+    if plan_path.exists():
+        try:
+            plan = json.loads(plan_path.read_text())
+        except ValueError:
+            plan = {}  # A damaged cache is compiled again
+        if plan.get("manifest_hash") == expected_hash:
+            logger.info(f"Load plan for {manifest.name} read from {plan_path}")
+            return plan
+
+    plan = compile_load_plan(manifest)
+    plan_path.parent.mkdir(parents=True, exist_ok=True)
+    plan_path.write_text(json.dumps(plan, indent=2))
+    logger.info(f"Load plan for {manifest.name} compiled to {plan_path}")
+    return plan
+
+def create_schema(cursor: sqlite3.Cursor, plan: Optional[dict] = None) -> None:
+    """Create the tables and indexes of a load plan if they don't exist (by default, the smart_sales warehouse)."""
+    plan = plan or compile_load_plan(WAREHOUSE_MANIFESTS["smart_sales"])
+    for table_plan in plan["tables"]:
+        cursor.execute(table_plan["ddl"])
+        for statement in table_plan["indexes"]:
+            cursor.execute(statement)
+
+    if plan["sale_wide"]:
+        create_sale_wide_table(cursor)
+
+def create_sale_wide_table(cursor: sqlite3.Cursor) -> None:
+    """
+    Create the sale_wide table, and the triggers that queue changed rows for refresh_sale_wide().
 
-def create_schema(cursor: sqlite3.Cursor) -> None:
-    """Create tables in the data warehouse if they don't exist."""
+    Updates to customer, product or sale rows, and inserted customers and products, record
+    the changed key in sale_wide_pending. Sales inserted below the highest sale_id already
+    in sale_wide are queued too; higher ones are picked up by sale_id alone, so a bulk load
+    into an empty sale_wide adds no trigger work per sale.
+    """
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS customer (
-            customer_id INTEGER PRIMARY KEY,
-            name TEXT,
+        CREATE TABLE IF NOT EXISTS sale_wide (
+            sale_id INTEGER PRIMARY KEY,
+            sale_date TEXT,
+            customer_id INTEGER,
+            product_id INTEGER,
+            store_id INTEGER,
+            campaign_id INTEGER,
+            sale_amount_usd REAL,
+            discount_percent REAL,
+            payment_type TEXT,
+            customer_name TEXT,
             region TEXT,
             join_date TEXT,
             loyalty_points INTEGER,
-            preferred_contact_method TEXT
-        );
-    """)
-
-    cursor.execute("""   
-         CREATE TABLE IF NOT EXISTS product (
-            product_id INTEGER PRIMARY KEY,
+            preferred_contact_method TEXT,
             product_name TEXT,
             category TEXT,
             unit_price REAL,
@@ -37,106 +281,371 @@ def create_schema(cursor: sqlite3.Cursor) -> None:
         );
     """)
 
-    cursor.execute("""   
-        CREATE TABLE IF NOT EXISTS sale (
-            sale_id INTEGER PRIMARY KEY,
-            sale_date TEXT,
-            customer_id INTEGER,
-            product_id INTEGER,
-            store_id INTEGER,
-            campaign_id INTEGER,
-            sale_amount_usd REAL,
-            discount_percent REAL,
-            payment_type TEXT,
-            FOREIGN KEY (customer_id) REFERENCES customer (customer_id),
-            FOREIGN KEY (product_id) REFERENCES product (product_id)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sale_wide_pending (
+            table_name TEXT,
+            row_key INTEGER,
+            PRIMARY KEY (table_name, row_key)
+        ) WITHOUT ROWID;
+    """)
+
+    for table, key_column in (("customer", "customer_id"), ("product", "product_id")):
+        for event in ("INSERT", "UPDATE"):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS sale_wide_queue_{table}_{event.lower()} AFTER {event} ON {table}
+                BEGIN
+                    INSERT OR IGNORE INTO sale_wide_pending (table_name, row_key) VALUES ('{table}', NEW.{key_column});
+                END;
+            """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS sale_wide_queue_sale_update AFTER UPDATE ON sale
+        BEGIN
+            INSERT OR IGNORE INTO sale_wide_pending (table_name, row_key) VALUES ('sale', NEW.sale_id);
+        END;
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS sale_wide_queue_sale_insert AFTER INSERT ON sale
+        WHEN NEW.sale_id < (SELECT MAX(sale_id) FROM sale_wide)
+        BEGIN
+            INSERT OR IGNORE INTO sale_wide_pending (table_name, row_key) VALUES ('sale', NEW.sale_id);
+        END;
+    """)
+
+def refresh_sale_wide(cursor: sqlite3.Cursor) -> int:
+    """
+    Bring sale_wide up to date with the sale, customer and product tables.
+
+    Sales past the highest sale_id in sale_wide are joined and appended. Below it, only
+    the sales queued in sale_wide_pending are joined again: the changed sales themselves,
+    and every sale of a changed customer or product (found through the sale indexes).
+    Sales deleted from the sale table are not removed; a full reload clears both tables.
+    The caller owns the transaction.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor on the warehouse connection.
+
+    Returns:
+        int: Number of sale_wide rows written.
+    """
+    start = time.perf_counter()
+    (watermark,) = cursor.execute("SELECT IFNULL(MAX(sale_id), -1) FROM sale_wide").fetchone()
+
+    # UNION collects each queued sale once, however many of its rows changed
+    cursor.execute(f"""
+        INSERT OR REPLACE INTO sale_wide {SALE_WIDE_SELECT}
+        WHERE s.sale_id <= ? AND s.sale_id IN (
+            SELECT row_key FROM sale_wide_pending WHERE table_name = 'sale'
+            UNION
+            SELECT sale_id FROM sale WHERE customer_id IN (
+                SELECT row_key FROM sale_wide_pending WHERE table_name = 'customer')
+            UNION
+            SELECT sale_id FROM sale WHERE product_id IN (
+                SELECT row_key FROM sale_wide_pending WHERE table_name = 'product')
+        )
+    """, (watermark,))
+    written = cursor.rowcount
+    cursor.execute(f"INSERT INTO sale_wide {SALE_WIDE_SELECT} WHERE s.sale_id > ?", (watermark,))
+    written += cursor.rowcount
+    cursor.execute("DELETE FROM sale_wide_pending")
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Refreshed {written} rows of sale_wide in {elapsed:.3f}s")
+    return written
+
+def create_metadata_tables(cursor: sqlite3.Cursor) -> None:
+    """Create the tables that track every load, and what incremental loads have already written."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS etl_load_log (
+            generation INTEGER PRIMARY KEY,
+            loaded_at TEXT,
+            incremental INTEGER
         );
-   """)
-                   
-def delete_existing_records(cursor: sqlite3.Cursor) -> None:
-    """Delete all existing records from the customer, product, and sale tables."""
-    cursor.execute("DELETE FROM customer")
-    cursor.execute("DELETE FROM product")
-    cursor.execute("DELETE FROM sale")
-
-def insert_customers(customers_df: pd.DataFrame, cursor: sqlite3.Cursor) -> None:
-    """Insert customer data into the customer table."""
-      
-    try:
-        # Rename columns to match the database schema
-        customers_df = customers_df.rename(columns={
-            "CustomerID": "customer_id",
-            "Name": "name",
-            "Region": "region",
-            "JoinDate": "join_date",
-            "LoyaltyPoints": "loyalty_points",
-            "PreferredContactMethod": "preferred_contact_method"
-        })
-        customers_df.to_sql("customer", cursor.connection, if_exists="append", index=False)
-    except Exception as e:
-        print(f"Error while inserting customers: {e}")
-    
-def insert_products(products_df: pd.DataFrame, cursor: sqlite3.Cursor) -> None:
-    """Insert product data into the product table."""
-      
-    try:
-        # Rename columns to match the database schema
-        products_df = products_df.rename(columns={
-            "ProductID": "product_id",
-            "ProductName": "product_name",
-            "Category": "category",
-            "UnitPrice": "unit_price",
-            "StockQuantity": "stock_quantity",
-            "BinNumber": "bin_number"
-        })
-        products_df.to_sql("product", cursor.connection, if_exists="append", index=False)
-    except Exception as e:
-        print(f"Error while inserting products: {e}")
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS etl_watermark (
+            table_name TEXT PRIMARY KEY,
+            key_column TEXT,
+            max_key INTEGER,
+            rows_written INTEGER,
+            updated_at TEXT
+        );
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS etl_row_hash (
+            table_name TEXT,
+            row_key INTEGER,
+            row_hash INTEGER,
+            PRIMARY KEY (table_name, row_key)
+        ) WITHOUT ROWID;
+    """)
+
+def record_load(cursor: sqlite3.Cursor, incremental: bool) -> int:
+    """
+    Add this load to etl_load_log, inside the load transaction, and return its generation number.
+
+    Readers compare generations (scripts/warehouse.warehouse_generation()) to tell
+    whether a load committed between their reads.
+    """
+    cursor.execute(
+        "INSERT INTO etl_load_log (loaded_at, incremental) VALUES (?, ?)",
+        (datetime.now(timezone.utc).isoformat(), int(incremental)),
+    )
+    return cursor.lastrowid
+
+def delete_existing_records(cursor: sqlite3.Cursor, plan: Optional[dict] = None) -> None:
+    """Delete all existing records from the tables of a load plan (by default, the smart_sales warehouse)."""
+    plan = plan or compile_load_plan(WAREHOUSE_MANIFESTS["smart_sales"])
+    for table_plan in plan["tables"]:
+        cursor.execute(f"DELETE FROM {table_plan['name']}")
+    if plan["sale_wide"]:
+        cursor.execute("DELETE FROM sale_wide")
+        cursor.execute("DELETE FROM sale_wide_pending")
+
+    # Incremental load state no longer matches the tables
+    cursor.execute("DELETE FROM etl_row_hash")
+    cursor.execute("DELETE FROM etl_watermark")
+
+def set_pragmas(cursor: sqlite3.Cursor, pragmas: Dict[str, str]) -> None:
+    """Apply SQLite PRAGMA settings to a connection, e.g. LOAD_PRAGMAS before a load."""
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
 
-def insert_sales(sales_df: pd.DataFrame, cursor: sqlite3.Cursor) -> None:
-    """Insert sales data into the sale table."""
-      
+def drop_indexes(cursor: sqlite3.Cursor, tables: List[str]) -> List[str]:
+    """
+    Drop the secondary indexes on the given tables so the load does not maintain them row by row.
+
+    Returns:
+        list: The CREATE INDEX statements needed to rebuild the dropped indexes.
+    """
+    placeholders = ", ".join("?" for _ in tables)
+    rows = cursor.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({placeholders})",
+        tables,
+    ).fetchall()
+    for name, _ in rows:
+        cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+    return [sql for _, sql in rows]
+
+def create_indexes(cursor: sqlite3.Cursor, index_statements: List[str]) -> None:
+    """Rebuild indexes after the load, one sort per index instead of one update per row."""
+    for statement in index_statements:
+        cursor.execute(statement)
+
+def bulk_insert(cursor: sqlite3.Cursor, table_plan: dict, df: pd.DataFrame, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Insert a DataFrame into a table with the plan's prepared INSERT, in batches of batch_size rows.
+
+    The caller owns the transaction.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor on the warehouse connection.
+        table_plan (dict): The table's entry in the load plan (see compile_table_plan()).
+        df (pd.DataFrame): Rows to insert, with columns already named like the table.
+        batch_size (int): Rows per executemany call.
+
+    Returns:
+        int: Number of rows inserted.
+    """
+    table = table_plan["name"]
+    start = time.perf_counter()
+    rows = df[table_plan["columns"]].itertuples(index=False, name=None)
+    inserted = execute_in_batches(cursor, table_plan["insert"], rows, batch_size)
+    elapsed = time.perf_counter() - start
+    logger.info(f"Loaded {inserted} rows into {table} in {elapsed:.3f}s ({inserted / max(elapsed, 1e-9):,.0f} rows/sec)")
+    return inserted
+
+def execute_in_batches(cursor: sqlite3.Cursor, sql: str, rows: Iterable[Tuple], batch_size: int = BATCH_SIZE) -> int:
+    """Run executemany over rows in batches of batch_size and return the number of rows sent."""
+    rows = iter(rows)
+    sent = 0
+    while batch := list(islice(rows, batch_size)):
+        cursor.executemany(sql, batch)
+        sent += len(batch)
+    return sent
+
+def get_watermark(cursor: sqlite3.Cursor, table: str) -> int:
+    """Return the highest key already loaded into a table, or -1 if it was never loaded incrementally."""
+    row = cursor.execute("SELECT max_key FROM etl_watermark WHERE table_name = ?", (table,)).fetchone()
+    return row[0] if row and row[0] is not None else -1
+
+def upsert_rows(cursor: sqlite3.Cursor, table_plan: dict, df: pd.DataFrame, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Insert new rows and update changed rows of a table, leaving unchanged rows alone.
+
+    Rows with a key above the table's watermark are new. Rows at or below it are compared
+    with the content hash stored in etl_row_hash, and only rows whose hash differs are written.
+    Rows missing from df are not deleted, so df can be just the day's delta.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor on the warehouse connection.
+        table_plan (dict): The table's entry in the load plan (see compile_table_plan()).
+        df (pd.DataFrame): Rows to load, with columns already named like the table.
+        batch_size (int): Rows per executemany call.
+
+    Returns:
+        int: Number of rows inserted or updated.
+    """
+    table, key_column = table_plan["name"], table_plan["key"]
+    df = df[table_plan["columns"]].drop_duplicates(subset=[key_column], keep="last")
+
+    start = time.perf_counter()
+    keys = df[key_column].astype("int64")
+    row_hashes = pd.Series(fingerprint_rows(df), index=df.index).astype("int64")  # SQLite integers are signed 64-bit
+
+    watermark = get_watermark(cursor, table)
+    is_old = keys <= watermark
+    changed = ~is_old
+    if is_old.any():
+        stored = pd.read_sql_query(
+            "SELECT row_key, row_hash FROM etl_row_hash WHERE table_name = ? AND row_key BETWEEN ? AND ?",
+            cursor.connection,
+            params=(table, int(keys[is_old].min()), int(keys[is_old].max())),
+        ).set_index("row_key")["row_hash"]
+        changed |= is_old & (keys.map(stored) != row_hashes)
+
+    written = execute_in_batches(cursor, table_plan["upsert"], df[changed].itertuples(index=False, name=None), batch_size)
+    execute_in_batches(
+        cursor,
+        "INSERT INTO etl_row_hash (table_name, row_key, row_hash) VALUES (?, ?, ?) "
+        "ON CONFLICT(table_name, row_key) DO UPDATE SET row_hash = excluded.row_hash",
+        ((table, int(key), int(row_hash)) for key, row_hash in zip(keys[changed], row_hashes[changed])),
+        batch_size,
+    )
+
+    if written:
+        cursor.execute(
+            "INSERT INTO etl_watermark (table_name, key_column, max_key, rows_written, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(table_name) DO UPDATE SET max_key = max(max_key, excluded.max_key), "
+            "rows_written = excluded.rows_written, updated_at = excluded.updated_at",
+            (table, key_column, int(keys.max()), written, datetime.now(timezone.utc).isoformat()),
+        )
+    elapsed = time.perf_counter() - start
+    logger.info(f"Upserted {written} of {len(df)} rows into {table} in {elapsed:.3f}s")
+    return written
+
+def read_prepared_table(manifest: WarehouseManifest, table_plan: dict) -> pd.DataFrame:
+    """Read a table's prepared CSV file, only the mapped columns, renamed to the warehouse columns."""
+    file_path = manifest.prepared_dir.joinpath(table_plan["prepared_file"])
+    df = pd.read_csv(file_path, usecols=list(table_plan["rename"]), dtype=table_plan["dtypes"])
+    return df.rename(columns=table_plan["rename"])
+
+def frame_for_table(table_plan: dict, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Shape a prepared frame held in memory the way read_prepared_table() reads its CSV file.
+
+    Only the mapped columns are kept and renamed. Dates become the text to_csv() writes,
+    REAL and TEXT columns get their read dtypes, and numeric INTEGER columns become int64,
+    or float64 where values are missing. The rows loaded, and their etl_row_hash entries,
+    then match a load from the prepared file.
+    """
+    columns = {}
+    for source, name in table_plan["rename"].items():
+        values = df[source]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            present = values.dropna()
+            values = values.dt.strftime("%Y-%m-%d %H:%M:%S" if (present != present.dt.normalize()).any() else "%Y-%m-%d")
+        elif values.dtype == object:
+            try:
+                values = pd.to_numeric(values)  # read_csv reads a column of numbers back as numbers
+            except (ValueError, TypeError):
+                values = values.astype("str")
+        if source in table_plan["dtypes"]:
+            values = values.astype(table_plan["dtypes"][source])
+        elif pd.api.types.is_numeric_dtype(values):
+            values = values.astype("float64" if values.isna().any() else "int64")
+        columns[name] = values
+    return pd.DataFrame(columns).reset_index(drop=True)
+
+def load_table(cursor: sqlite3.Cursor, table_plan: dict, df: pd.DataFrame, incremental: bool = False) -> int:
+    """Insert (or, if incremental, upsert) prepared rows into one warehouse table."""
     try:
-        # Rename columns to match the database schema
-        sales_df = sales_df.rename(columns={
-            "TransactionID": "sale_id",
-            "SaleDate": "sale_date",
-            "CustomerID": "customer_id",
-            "ProductID": "product_id",
-            "StoreID": "store_id",
-            "CampaignID": "campaign_id",
-            "SaleAmount": "sale_amount_usd",
-            "DiscountPercent": "discount_percent",
-            "PaymentType": "payment_type"
-        })
-        sales_df.to_sql("sale", cursor.connection, if_exists="append", index=False)
+        if incremental:
+            return upsert_rows(cursor, table_plan, df)
+        return bulk_insert(cursor, table_plan, df)
     except Exception as e:
-        print(f"Error while inserting sales: {e}")
+        logger.error(f"Error while loading {table_plan['name']}: {e}")
+        raise
+
+def load_data_to_db(
+    incremental: bool = False,
+    manifest: Optional[WarehouseManifest] = None,
+    frames: Optional[Dict[str, pd.DataFrame]] = None,
+) -> None:
+    """
+    Load the prepared CSV files of a deployment into its data warehouse.
 
-def load_data_to_db() -> None:
+    By default every table is cleared and fully reloaded. With incremental=True, existing
+    rows are kept and only new or changed rows are upserted, tracked in etl_watermark
+    and etl_row_hash. If the manifest keeps sale_wide, it is then refreshed with
+    refresh_sale_wide().
+
+    Args:
+        incremental (bool): Upsert new and changed rows instead of reloading everything.
+        manifest (WarehouseManifest, optional): The deployment to load. Defaults to smart_sales.
+        frames (dict, optional): Table name -> prepared frame already in memory (see
+            scripts/pipeline.py). These tables are loaded from the frame instead of
+            re-reading the prepared file. The other tables are read from disk.
+    """
+    manifest = manifest or WAREHOUSE_MANIFESTS["smart_sales"]
+    frames = frames or {}
+    plan = get_load_plan(manifest)
+    conn = None
     try:
-        # Connect to SQLite – will create the file if it doesn't exist
-        conn = sqlite3.connect(DB_PATH)
+        # Connect to SQLite in WAL mode – will create the file if it doesn't exist.
+        # isolation_level=None lets us manage the single load transaction ourselves.
+        manifest.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = connect_writer(manifest.db_path, isolation_level=None)
         cursor = conn.cursor()
+        set_pragmas(cursor, LOAD_PRAGMAS)
+
+        # Create schema, then load everything in one transaction
+        create_schema(cursor, plan)
+        create_metadata_tables(cursor)
+        cursor.execute("BEGIN")
+        if incremental:
+            index_statements = []  # A small delta is cheaper to index row by row
+        else:
+            index_statements = drop_indexes(cursor, [table_plan["name"] for table_plan in plan["tables"]])
+            delete_existing_records(cursor, plan)
+
+        # Load each prepared file into its table, dimension tables first
+        for table_plan in plan["tables"]:
+            if table_plan["name"] in frames:
+                df = frame_for_table(table_plan, frames[table_plan["name"]])
+            else:
+                df = read_prepared_table(manifest, table_plan)
+            load_table(cursor, table_plan, df, incremental)
 
-        # Create schema and clear existing records
-        create_schema(cursor)
-        delete_existing_records(cursor)
-
-        # Load prepared data using pandas
-        customers_df = pd.read_csv(PREPARED_DATA_DIR.joinpath("customers_data_prepared.csv"))
-        products_df = pd.read_csv(PREPARED_DATA_DIR.joinpath("products_data_prepared.csv"))
-        sales_df = pd.read_csv(PREPARED_DATA_DIR.joinpath("sales_data_prepared.csv"))
-          
-        # Insert data into the database
-        insert_customers(customers_df, cursor)
-        insert_products(products_df, cursor)
-        insert_sales(sales_df,cursor)
-
-        conn.commit()
+        create_indexes(cursor, index_statements)
+        if plan["sale_wide"]:
+            refresh_sale_wide(cursor)
+        generation = record_load(cursor, incremental)
+        cursor.execute("COMMIT")
+        logger.info(f"Committed load {generation} of {manifest.name}")
+
+        # Refresh the query planner statistics for the new data
+        cursor.execute("ANALYZE")
+    except Exception:
+        if conn and conn.in_transaction:
+            conn.rollback()
+        raise
     finally:
         if conn:
             conn.close()
 
+def main() -> None:
+    """Load one or every deployment's warehouse."""
+    parser = argparse.ArgumentParser(description="Load prepared data into the data warehouse.")
+    parser.add_argument("--deployment", choices=[*WAREHOUSE_MANIFESTS, "all"], default="smart_sales")
+    parser.add_argument("--incremental", action="store_true", help="Upsert new and changed rows only.")
+    args = parser.parse_args()
+
+    deployments = list(WAREHOUSE_MANIFESTS) if args.deployment == "all" else [args.deployment]
+    for deployment in deployments:
+        load_data_to_db(incremental=args.incremental, manifest=WAREHOUSE_MANIFESTS[deployment])
+
 if __name__ == "__main__":
-    load_data_to_db()
\ No newline at end of file
+    main()
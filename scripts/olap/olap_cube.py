@@ -0,0 +1,270 @@
+"""
+Module 6: OLAP Cube Query Engine
+File: scripts/olap/olap_cube.py
+
+Loads a cube written by olap_cubing.py once and answers the questions the
+cubing docstring promises, without grouping the cells again in pandas:
+
+- Slice: the cells for one value of a dimension, e.g. product_id == 101.
+- Dice: the cells for chosen values of several dimensions, e.g. Month in (1, 2) and product_id == 101.
+- Roll up: totals over fewer dimensions, e.g. sales by Month.
+- Drill down: one level finer, e.g. sales by Month, then by Month and product_id.
+
+Each dimension is dictionary-encoded once, and for each of its values the
+positions of the cells holding it are kept as a sorted posting list. A slice
+or dice reads only those posting lists (intersecting them across dimensions),
+and a roll up aggregates the selected cells with NumPy bincount and ufunc.at
+over the encoded keys. Repeated queries are answered from a small LRU cache.
+
+Measures roll up by their suffix: _sum and _count are added, _min and _max
+compared, and _mean averaged with each cell weighted by its number of rows
+(the matching _count column if there is one, else the sale_ids range length,
+else the cube's row count such as sale_id_count).
+
+Example:
+
+    cube = Cube(load_olap_cube(CUBED_FILE))
+    cube.rollup(["Month"])
+    cube.drill_down(["Month"], "product_id", where={"Month": [1, 2]})
+    cube.dice({"MonthName": "March", "product_id": [101, 102]})
+"""
+
+import pathlib
+import sys
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from utils.logger import logger  # noqa: E402
+from scripts.olap.olap_cubing import MERGE_AGGREGATES  # noqa: E402
+
+# Constants
+QUERY_CACHE_SIZE: int = 256  # Query results kept per cube
+MEASURE_SUFFIXES = ("sum", "mean", "min", "max", "count")
+
+
+class Cube:
+    """
+    An OLAP cube held in memory with a posting-list index per dimension.
+
+    Query results are DataFrames. Each query returns its own copy, so callers may
+    change them (e.g. rename or sort in place) without touching the cache.
+    """
+
+    def __init__(self, cells: pd.DataFrame, dimensions: Optional[List[str]] = None, cache_size: int = QUERY_CACHE_SIZE):
+        """
+        Index the cells of a cube.
+
+        Parameters:
+            cells (pd.DataFrame): One row per cube cell, e.g. from load_olap_cube().
+            dimensions (list, optional): The dimension columns. Defaults to the columns before
+                the first measure (a column ending in _sum, _mean, _min, _max or _count),
+                which is how olap_cubing.py lays cubes out.
+            cache_size (int): Number of query results to keep.
+
+        Raises:
+            ValueError: If a dimension is not a column of the cube, or there are no measures.
+        """
+        if dimensions is None:
+            dimensions = []
+            for name in cells.columns:
+                if name.rsplit("_", 1)[-1] in MEASURE_SUFFIXES:
+                    break
+                dimensions.append(name)
+        missing = [dim for dim in dimensions if dim not in cells.columns]
+        if missing:
+            raise ValueError(f"Dimensions {missing} not found in the cube.")
+
+        self.cells = cells
+        self.dimensions = list(dimensions)
+        self.measures = [
+            name for name in cells.columns
+            if name not in self.dimensions and name.rsplit("_", 1)[-1] in MEASURE_SUFFIXES
+        ]
+        if not self.measures:
+            raise ValueError("The cube has no measure columns to query.")
+
+        # Per dimension: sorted distinct values, each cell's code, and the cell positions per code
+        self.values: Dict[str, pd.Index] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        self.lookup: Dict[str, Dict[Any, int]] = {}
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for dim in self.dimensions:
+            codes, uniques = pd.factorize(cells[dim], sort=True)  # Missing values get code -1
+            codes = codes.astype(np.int64)
+            order = np.argsort(codes, kind="stable")  # Positions grouped by code, ascending within each
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            offsets = np.concatenate([[0], np.cumsum(counts)]) + int((codes < 0).sum())
+            self.values[dim] = pd.Index(uniques)
+            self.codes[dim] = codes
+            self.lookup[dim] = {value: code for code, value in enumerate(pd.Index(uniques).tolist())}
+            self.postings[dim] = (order, offsets)
+
+        self.measure_values = {name: cells[name].to_numpy(dtype=np.float64) for name in self.measures}
+        self.mean_weights: Dict[str, np.ndarray] = {}
+        for name in self.measures:
+            if name.endswith("_mean"):
+                weights = self._mean_weights(name[:-len("_mean")])
+                if weights is None:
+                    raise ValueError(f"Cannot roll up {name} without a count of rows per cell.")
+                self.mean_weights[name] = weights
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[tuple, pd.DataFrame]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        logger.info(f"Cube indexed: {len(cells)} cells, dimensions {self.dimensions}, measures {self.measures}")
+
+    def _mean_weights(self, column: str) -> Optional[np.ndarray]:
+        """Return the number of rows averaged into each cell's {column}_mean, or None if unknown."""
+        if f"{column}_count" in self.cells.columns:
+            return self.cells[f"{column}_count"].to_numpy(dtype=np.float64)
+        if {"sale_ids_start", "sale_ids_stop"} <= set(self.cells.columns):
+            return (self.cells["sale_ids_stop"] - self.cells["sale_ids_start"]).to_numpy(dtype=np.float64)
+        counts = [name for name in self.measures if name.endswith("_count")]
+        return self.cells[counts[0]].to_numpy(dtype=np.float64) if counts else None
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    @staticmethod
+    def _where_key(where: Optional[Dict[str, Any]]) -> tuple:
+        """Return a hashable, order-independent form of a where dict."""
+        if not where:
+            return ()
+        key = []
+        for dim, wanted in sorted(where.items()):
+            if isinstance(wanted, (list, tuple, set, np.ndarray, pd.Index)):
+                key.append((dim, tuple(sorted(set(wanted), key=repr))))
+            else:
+                key.append((dim, (wanted,)))
+        return tuple(key)
+
+    def _cached(self, key: tuple, compute) -> pd.DataFrame:
+        """Return a copy of the cached result for key, computing and storing it first on a miss."""
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+        else:
+            self.misses += 1
+            self.cache[key] = compute()
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return self.cache[key].copy()
+
+    def cache_info(self) -> Dict[str, int]:
+        """Return the query cache hits, misses and current size."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.cache)}
+
+    def select(self, where: Optional[Dict[str, Any]] = None) -> np.ndarray:
+        """
+        Return the sorted positions of the cells matching where, read from the posting lists.
+
+        Parameters:
+            where (dict, optional): Dimension -> value or list of values. All cells if empty.
+
+        Raises:
+            ValueError: If a where key is not a dimension of the cube.
+        """
+        positions = None
+        for dim, wanted in self._where_key(where):
+            if dim not in self.postings:
+                raise ValueError(f"'{dim}' is not a dimension of the cube {self.dimensions}.")
+            order, offsets = self.postings[dim]
+            codes = [self.lookup[dim][value] for value in wanted if value in self.lookup[dim]]
+            lists = [order[offsets[code]:offsets[code + 1]] for code in codes]
+            matched = lists[0] if len(lists) == 1 else np.sort(np.concatenate(lists or [np.empty(0, np.int64)]))
+            positions = matched if positions is None else np.intersect1d(positions, matched, assume_unique=True)
+            if not len(positions):
+                break
+        return np.arange(len(self.cells)) if positions is None else positions
+
+    def slice(self, dimension: str, value: Any) -> pd.DataFrame:
+        """Return the cells where dimension equals value, e.g. slice("product_id", 101)."""
+        return self.dice({dimension: value})
+
+    def dice(self, where: Dict[str, Any]) -> pd.DataFrame:
+        """Return the cells matching every condition, e.g. dice({"Month": [1, 2], "product_id": 101})."""
+        key = ("dice", self._where_key(where))
+        return self._cached(key, lambda: self.cells.iloc[self.select(where)].reset_index(drop=True))
+
+    def rollup(self, by: List[str], where: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+        """
+        Aggregate the measures of the matching cells up to the dimensions in by.
+
+        Parameters:
+            by (list): Dimensions to keep, e.g. ["Month"]. An empty list gives the grand total.
+            where (dict, optional): Only roll up the cells matching these conditions.
+
+        Returns:
+            pd.DataFrame: One row per combination of the by values present, sorted by them,
+                with the cube's measure columns rolled up.
+
+        Raises:
+            ValueError: If a by or where key is not a dimension of the cube.
+        """
+        unknown = [dim for dim in by if dim not in self.postings]
+        if unknown:
+            raise ValueError(f"{unknown} are not dimensions of the cube {self.dimensions}.")
+        key = ("rollup", tuple(by), self._where_key(where))
+        return self._cached(key, lambda: self._rollup(list(by), self.select(where)))
+
+    def drill_down(self, by: List[str], dimension: str, where: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+        """Roll up one level finer than by, adding dimension, e.g. drill_down(["Month"], "product_id")."""
+        return self.rollup(list(by) + [dimension], where)
+
+    def _rollup(self, by: List[str], positions: np.ndarray) -> pd.DataFrame:
+        """Aggregate the cells at positions over the encoded keys of the by dimensions."""
+        everything = len(positions) == len(self.cells)  # Positions are unique, so this is every cell
+        codes = [self.codes[dim] if everything else self.codes[dim][positions] for dim in by]
+        if codes and min(dim_codes.min(initial=0) for dim_codes in codes) < 0:
+            present = np.all(np.stack(codes) >= 0, axis=0)  # Cells missing a by value are left out, as in groupby
+            positions = positions[present]
+            codes = [dim_codes[present] for dim_codes in codes]
+            everything = False
+        key = np.zeros(len(positions), dtype=np.int64)
+        key_space = 1
+        for dim, dim_codes in zip(by, codes):
+            key = key * len(self.values[dim]) + dim_codes  # Mixed radix, so keys sort like the by values
+            key_space *= len(self.values[dim])
+        if key_space <= 4 * len(positions) + 1024:
+            # Few possible keys: number the ones present with a bincount instead of sorting
+            present_keys = np.bincount(key, minlength=key_space) > 0
+            groups = np.flatnonzero(present_keys)
+            group_of_cell = (np.cumsum(present_keys) - 1)[key]
+        else:
+            groups, group_of_cell = np.unique(key, return_inverse=True)
+        if not by and not len(positions):
+            groups, group_of_cell = np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        result = {}
+        remaining = groups
+        for dim in reversed(by):  # Decode the mixed-radix keys back to dimension values (dtype kept)
+            radix = len(self.values[dim])
+            result[dim] = self.values[dim].take(remaining % radix)
+            remaining = remaining // radix
+
+        # Missing measure values are skipped, as pandas sum/min/max/mean do
+        for name in self.measures:
+            func = name.rsplit("_", 1)[1]
+            values = self.measure_values[name] if everything else self.measure_values[name][positions]
+            missing = np.isnan(values)
+            if func == "mean":
+                weights = np.where(missing, 0.0, self.mean_weights[name] if everything else self.mean_weights[name][positions])
+                weighted = np.bincount(group_of_cell, weights=np.where(missing, 0.0, values) * weights, minlength=len(groups))
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    rolled = weighted / np.bincount(group_of_cell, weights=weights, minlength=len(groups))
+            elif MERGE_AGGREGATES[func] == "sum":
+                rolled = np.bincount(group_of_cell, weights=np.where(missing, 0.0, values), minlength=len(groups))
+            else:
+                rolled = np.full(len(groups), np.nan)
+                (np.fmin if func == "min" else np.fmax).at(rolled, group_of_cell, values)
+            if func == "count" or pd.api.types.is_integer_dtype(self.cells[name]):
+                rolled = rolled.astype(self.cells[name].dtype)
+            result[name] = rolled
+        return pd.DataFrame(result)[by + self.measures]
@@ -77,16 +77,62 @@ sale table example
 THIS EXAMPLE OUTPUTS:
 
 This example assumes a cube data set with the following column names (yours will differ).
-DayOfWeek,product_id,customer_id,sale_amount_usd_sum,sale_id_count,sale_ids
-Friday,101,1001,6344.96,1,[582]
+DayOfWeek,product_id,customer_id,sale_amount_usd_sum,sale_id_count,sale_ids_start,sale_ids_stop
+Friday,101,1001,6344.96,1,0,1
 etc.
 
+For traceability, each cell's sale IDs are stored as the range
+[sale_ids_start, sale_ids_stop) of a flat int64 array holding every sale_id
+sorted by the cube dimensions (then sale_id). The array is saved next to the
+cube CSV as a .npy file, so a cell's sale IDs are found by slicing. The cube and
+the array are read in one warehouse snapshot, and both record the sale table
+fingerprint of that snapshot (the bundle's manifest and a .json next to the .npy),
+so a reader can tell that the ranges point into the right array.
+
+The cube is also saved in a binary columnar bundle (a .npcube folder with one
+.npy file per column and a manifest.json). Column dtypes are kept, string columns
+such as MonthName are dictionary-encoded, and reads are memory-mapped.
+
+A stored cube can be kept current with update_olap_cube_incremental(), which
+aggregates only the sales past a sale_id watermark and merges them into the
+existing cells (means are rebuilt from the merged sums and counts).
+
+For sale tables larger than memory, create_olap_cube_out_of_core() streams the
+facts from SQLite in chunks and keeps only partial aggregates per cell. When those
+grow past a memory budget they are spilled to disk in hash partitions, and each
+partition is merged on its own at the end (one still too big is partitioned again
+with a new hash seed). The merged partitions are sorted, merged back in dimension
+order and can be streamed straight into an .npcube bundle, so the finished cube never
+has to fit in memory either. The result matches create_olap_cube().
+
+create_olap_cube_parallel() uses every core instead: the sale table is split into
+sale_id ranges, each range is aggregated in a worker process, and the workers
+send their partial aggregates back as plain NumPy arrays (categorical dimensions
+as integer codes) for the parent to merge.
+
+Dimensions may also be customer or product attributes such as region or category.
+etl_to_dw.py keeps a denormalized sale_wide table (each sale joined with its customer
+and product once, refreshed incrementally on load), and the SQLite builders read from
+it whenever a dimension or metric is not a column of sale, so no join runs per cube.
+
 """
 
+import hashlib
+import inspect
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+import numpy as np
 import pandas as pd
 import sqlite3
 import pathlib
+import shutil
 import sys
+import tempfile
+from itertools import combinations
+from typing import Callable, ContextManager, Dict, Iterable, Iterator, List, Optional, Tuple
 
 # For local imports, temporarily add project root to Python sys.path
 PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent.parent
@@ -94,28 +140,239 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.append(str(PROJECT_ROOT))
 
 from utils.logger import logger  # noqa: E402
+from scripts.data_scrubber import DataScrubber  # noqa: E402
+from scripts.warehouse import read_snapshot, reader, table_columns, warehouse_generation  # noqa: E402
 
 # Constants
 DW_DIR: pathlib.Path = pathlib.Path("data").joinpath("dw")
 DB_PATH: pathlib.Path = DW_DIR.joinpath("smart_sales.db")
 OLAP_OUTPUT_DIR: pathlib.Path = pathlib.Path("data").joinpath("olap_cubing_outputs")
 
+CUBE_CACHE_DIR: pathlib.Path = OLAP_OUTPUT_DIR.joinpath("cache")
+CUBE_CACHE_MAX_BYTES: int = 512 * 2**20  # Least recently used cubes are evicted past this size
+
+# Out-of-core builds: facts read per chunk, and the partial aggregates held before spilling
+OUT_OF_CORE_CHUNK_ROWS: int = 500_000
+OUT_OF_CORE_MEMORY_BUDGET: int = 256 * 2**20
+SPILL_PARTITIONS: int = 16
+SPILL_MAX_LEVELS: int = 4  # How many times a partition too big for the budget is partitioned again
+
+# Parallel builds start over when a load commits while the workers are reading, at most this often
+SNAPSHOT_ATTEMPTS: int = 3
+
+# The cube that main() builds, and that olap_goal_sales_by_month.py answers its questions from
+MONTHLY_SALES_DIMENSIONS: List[str] = ["Month", "MonthName", "product_id"]
+MONTHLY_SALES_METRICS: dict = {"sale_amount_usd": ["sum", "mean", "min", "max"], "sale_id": "count"}
+
+# Cubes read the sale table, or the denormalized sale_wide table for customer and product attributes
+FACT_TABLE: str = "sale"
+WIDE_FACT_TABLE: str = "sale_wide"
+
 # Create output directory if it does not exist
 OLAP_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# SQLite expressions for the time-based dimensions that main() derives in pandas
+MONTH_NAMES = ["January", "February", "March", "April", "May", "June", "July",
+               "August", "September", "October", "November", "December"]
+DAY_NAMES = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+# Name dimensions are dictionary-encoded. The categories are sorted as strings, like
+# SQLite's ORDER BY, so both cube builders emit the cells in the same order.
+TIME_DIMENSION_DTYPES = {
+    "MonthName": pd.CategoricalDtype(sorted(MONTH_NAMES)),
+    "DayOfWeek": pd.CategoricalDtype(sorted(DAY_NAMES)),
+}
+SQL_TIME_DIMENSIONS = {
+    "Year": "CAST(strftime('%Y', sale_date) AS INTEGER)",
+    "Month": "CAST(strftime('%m', sale_date) AS INTEGER)",
+    "MonthName": "CASE CAST(strftime('%m', sale_date) AS INTEGER) "
+                 + " ".join(f"WHEN {number} THEN '{name}'" for number, name in enumerate(MONTH_NAMES, start=1))
+                 + " END",
+    "DayOfWeek": "CASE CAST(strftime('%w', sale_date) AS INTEGER) "
+                 + " ".join(f"WHEN {number} THEN '{name}'" for number, name in enumerate(DAY_NAMES))
+                 + " END",
+}
+# How each partial aggregate is merged when rolling a cube level up to a coarser one
+MERGE_AGGREGATES = {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+SQL_AGGREGATES = {"sum": "SUM", "mean": "AVG", "min": "MIN", "max": "MAX", "count": "COUNT", "nunique": "COUNT(DISTINCT"}
+
 
-def ingest_sales_data_from_dw() -> pd.DataFrame:
-    """Ingest sales data from SQLite data warehouse."""
+def ingest_sales_data_from_dw(table: str = FACT_TABLE) -> pd.DataFrame:
+    """Ingest sales data from SQLite data warehouse (WIDE_FACT_TABLE adds customer and product attributes)."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        sales_df = pd.read_sql_query("SELECT * FROM sale", conn)
-        conn.close()
+        with reader(DB_PATH) as conn:
+            sales_df = pd.read_sql_query(f"SELECT * FROM {table}", conn)
+        sales_df = DataScrubber(sales_df).optimize_dtypes()
         logger.info("Sales data successfully loaded from SQLite data warehouse.")
         return sales_df
     except Exception as e:
         logger.error(f"Error loading sale table data from data warehouse: {e}")
         raise
 
+def fact_table_for(columns: list, db_path: pathlib.Path = DB_PATH) -> str:
+    """
+    Return the table a cube over these columns reads: FACT_TABLE when it holds them all, else WIDE_FACT_TABLE.
+
+    Derived time dimensions only need sale_date, which both tables have.
+    """
+    needed = {column for column in columns if column not in SQL_TIME_DIMENSIONS}
+    with reader(db_path) as conn:
+        for table in (FACT_TABLE, WIDE_FACT_TABLE):
+            if needed <= set(table_columns(conn, table)):
+                return table
+    raise ValueError(f"Columns {sorted(needed)} are not all in the {FACT_TABLE} or {WIDE_FACT_TABLE} table.")
+
+def add_time_dimensions(sales_df: pd.DataFrame) -> pd.DataFrame:
+    """Add DayOfWeek, Month, MonthName and Year columns derived from sale_date."""
+    sales_df["sale_date"] = pd.to_datetime(sales_df["sale_date"])
+    sales_df["DayOfWeek"] = sales_df["sale_date"].dt.day_name().astype(TIME_DIMENSION_DTYPES["DayOfWeek"])
+    sales_df["Month"] = sales_df["sale_date"].dt.month
+    sales_df["MonthName"] = sales_df["sale_date"].dt.month_name().astype(TIME_DIMENSION_DTYPES["MonthName"])
+    sales_df["Year"] = sales_df["sale_date"].dt.year
+    return sales_df
+
+def sql_dimensions_not_null(dimensions: list) -> str:
+    """Return a WHERE condition that drops rows with a missing dimension value, as pandas groupby does."""
+    return " AND ".join(f"{SQL_TIME_DIMENSIONS.get(dim, dim)} IS NOT NULL" for dim in dimensions)
+
+def snapshot_or(conn: Optional[sqlite3.Connection], db_path: pathlib.Path) -> ContextManager[sqlite3.Connection]:
+    """Use conn, a caller's read_snapshot() connection, if given; otherwise open a read snapshot of db_path."""
+    return nullcontext(conn) if conn is not None else read_snapshot(db_path)
+
+def add_sale_id_ranges(cube: pd.DataFrame, cell_sizes: np.ndarray) -> pd.DataFrame:
+    """
+    Add sale_ids_start and sale_ids_stop columns to a cube sorted by its dimensions.
+
+    The cell in row i owns positions [sale_ids_start, sale_ids_stop) of the sale_id
+    array sorted the same way (see sort_sale_ids_by_cell() and query_sale_ids_by_cell()).
+    """
+    stops = np.cumsum(cell_sizes, dtype=np.int64)
+    cube["sale_ids_start"] = stops - cell_sizes
+    cube["sale_ids_stop"] = stops
+    return cube
+
+def sort_sale_ids_by_cell(sales_df: pd.DataFrame, dimensions: list) -> np.ndarray:
+    """Return every sale_id as int64, ordered by the cube dimensions and then by sale_id."""
+    grouped_rows = sales_df.loc[sales_df[dimensions].notna().all(axis=1), dimensions + ["sale_id"]]
+    return grouped_rows.sort_values(dimensions + ["sale_id"], kind="stable")["sale_id"].to_numpy(dtype=np.int64)
+
+def query_sale_ids_by_cell(
+    dimensions: list, db_path: pathlib.Path = DB_PATH, conn: Optional[sqlite3.Connection] = None
+) -> np.ndarray:
+    """
+    Return every sale_id as int64, ordered by the cube dimensions and then by sale_id, read from SQLite.
+
+    Pass the read_snapshot() connection the cube was built in as conn, so the cube's
+    sale_ids ranges and this array come from the same committed state.
+    """
+    order_by = ", ".join([SQL_TIME_DIMENSIONS.get(dim, dim) for dim in dimensions] + ["sale_id"])
+    table = fact_table_for(dimensions, db_path)
+    with snapshot_or(conn, db_path) as conn:
+        rows = conn.execute(f"SELECT sale_id FROM {table} WHERE {sql_dimensions_not_null(dimensions)} ORDER BY {order_by}")
+        return np.fromiter((row[0] for row in rows), dtype=np.int64)
+
+def sale_ids_fingerprint_path(sale_ids_path: pathlib.Path) -> pathlib.Path:
+    """Return the .json file next to a sale_id array that records the fingerprint it was read at."""
+    return sale_ids_path.with_suffix(".json")
+
+def write_sale_ids(sale_ids: np.ndarray, filename: str, fingerprint: Optional[str] = None) -> None:
+    """
+    Write the sorted sale_id array that the cube's sale_ids ranges point into.
+
+    fingerprint is the sale table fingerprint of the snapshot the array was read in
+    (the cube's, see build_monthly_sales_cube()). It is saved next to the array.
+    """
+    try:
+        output_path = OLAP_OUTPUT_DIR.joinpath(filename)
+        tmp_path = output_path.with_name(f"{output_path.stem}.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, sale_ids)
+        os.replace(tmp_path, output_path)
+        write_text_atomic(sale_ids_fingerprint_path(output_path), json.dumps({"fingerprint": fingerprint}))
+        logger.info(f"Sale IDs saved to {output_path}.")
+    except Exception as e:
+        logger.error(f"Error saving sale IDs: {e}")
+        raise
+
+def create_olap_cube_sql(
+    dimensions: list,
+    metrics: dict,
+    db_path: pathlib.Path = DB_PATH,
+    include_sale_ids: bool = True,
+    after_sale_id: Optional[int] = None,
+    up_to_sale_id: Optional[int] = None,
+    conn: Optional[sqlite3.Connection] = None,
+) -> pd.DataFrame:
+    """
+    Create an OLAP cube by pushing the aggregation down into SQLite.
+
+    Takes the same dimensions and metrics as create_olap_cube(), but runs one GROUP BY
+    query against the sale table (or sale_wide, see fact_table_for()), deriving Year, Month,
+    MonthName and DayOfWeek with strftime(). Only the aggregated rows are transferred to pandas.
+
+    Args:
+        dimensions (list): Columns of the sale or sale_wide table, or derived time dimensions, to group by.
+        metrics (dict): Dictionary of aggregation functions for metrics
+            (sum, mean, min, max, count or nunique).
+        db_path (pathlib.Path): Path to the SQLite data warehouse.
+        include_sale_ids (bool): Add the sale_ids_start and sale_ids_stop traceability columns,
+            ranges into the array returned by query_sale_ids_by_cell().
+        after_sale_id (int, optional): Only aggregate the sales with a higher sale_id.
+        up_to_sale_id (int, optional): Only aggregate the sales with this sale_id or lower.
+        conn (sqlite3.Connection, optional): A read_snapshot() connection to query in.
+
+    Returns:
+        pd.DataFrame: The multidimensional OLAP cube, matching create_olap_cube().
+    """
+    try:
+        dimension_sql = [f"{SQL_TIME_DIMENSIONS.get(dim, dim)} AS {dim}" for dim in dimensions]
+        metric_sql = []
+        for column, agg_funcs in metrics.items():
+            for func in agg_funcs if isinstance(agg_funcs, list) else [agg_funcs]:
+                if func not in SQL_AGGREGATES:
+                    raise ValueError(f"Aggregation '{func}' cannot be pushed down to SQLite.")
+                closing = "))" if func == "nunique" else ")"
+                metric_sql.append(f"{SQL_AGGREGATES[func]}({column}{closing}")
+        if include_sale_ids:
+            metric_sql.append("COUNT(*)")  # Cell size, for the sale_ids ranges
+
+        where = sql_dimensions_not_null(dimensions)
+        params: tuple = ()
+        if after_sale_id is not None:
+            where += " AND sale_id > ?"  # A primary key range, so only the new rows are read
+            params += (after_sale_id,)
+        if up_to_sale_id is not None:
+            where += " AND sale_id <= ?"
+            params += (up_to_sale_id,)
+
+        table = fact_table_for(dimensions + list(metrics), db_path)
+        group_by = ", ".join(str(position) for position in range(1, len(dimensions) + 1))
+        query = (
+            f"SELECT {', '.join(dimension_sql + metric_sql)} FROM {table} "
+            f"WHERE {where} GROUP BY {group_by} ORDER BY {group_by}"
+        )
+
+        with snapshot_or(conn, db_path) as conn:
+            cube = pd.read_sql_query(query, conn, params=params)
+
+        explicit_columns = generate_column_names(dimensions, metrics)
+        if include_sale_ids:
+            explicit_columns.append("cell_size")
+        cube.columns = explicit_columns
+
+        if include_sale_ids:
+            add_sale_id_ranges(cube, cube.pop("cell_size").to_numpy())
+        for dim in ("Year", "Month"):
+            if dim in dimensions:
+                cube[dim] = cube[dim].astype("int32")  # Same dtype as the pandas dt accessors
+        for dim, dtype in TIME_DIMENSION_DTYPES.items():
+            if dim in dimensions:
+                cube[dim] = cube[dim].astype(dtype)
+
+        logger.info(f"OLAP cube created in SQLite with dimensions: {dimensions}")
+        return cube
+    except Exception as e:
+        logger.error(f"Error creating OLAP cube in SQLite: {e}")
+        raise
+
 def create_olap_cube(
     sales_df: pd.DataFrame, dimensions: list, metrics: dict
 ) -> pd.DataFrame:
@@ -128,7 +385,8 @@ def create_olap_cube(
         metrics (dict): Dictionary of aggregation functions for metrics.
 
     Returns:
-        pd.DataFrame: The multidimensional OLAP cube.
+        pd.DataFrame: The multidimensional OLAP cube, with sale_ids_start and sale_ids_stop
+            ranges into the array returned by sort_sale_ids_by_cell().
     """
     try:
         # Group by the specified dimensions and aggregate metrics
@@ -145,18 +403,16 @@ def create_olap_cube(
         # the resulting column names will not include the suffix.
 
         # Group by the specified dimensions
-        grouped = sales_df.groupby(dimensions)
+        grouped = sales_df.groupby(dimensions, observed=True)
 
         # Perform the aggregations
         cube = grouped.agg(metrics).reset_index()
 
-        # Add a list of sale IDs for traceability
-        cube["sale_ids"] = grouped["sale_id"].apply(list).reset_index(drop=True)
-
         # Generate explicit column names
-        explicit_columns = generate_column_names(dimensions, metrics)
-        explicit_columns.append("sale_ids")  # Include the traceability column
-        cube.columns = explicit_columns
+        cube.columns = generate_column_names(dimensions, metrics)
+
+        # Add each cell's range of sale IDs for traceability
+        add_sale_id_ranges(cube, grouped.size().to_numpy())
 
         logger.info(f"OLAP cube created with dimensions: {dimensions}")
         return cube
@@ -192,6 +448,637 @@ def generate_column_names(dimensions: list, metrics: dict) -> list:
     return column_names
     
 
+def mergeable_metrics(metrics: dict) -> dict:
+    """
+    Decompose metrics into partial aggregates that can be merged across cells or batches.
+
+    sum, count, min and max are kept as they are. A mean becomes the sum and count it is
+    rebuilt from with rebuild_means().
+
+    Args:
+        metrics (dict): Dictionary of aggregation functions (sum, mean, min, max or count).
+
+    Returns:
+        dict: The partial metrics, in the same format.
+    """
+    partial_metrics: dict = {}
+    for column, agg_funcs in metrics.items():
+        for func in agg_funcs if isinstance(agg_funcs, list) else [agg_funcs]:
+            needed = ["sum", "count"] if func == "mean" else [func]
+            for partial in needed:
+                if partial not in MERGE_AGGREGATES:
+                    raise ValueError(f"Aggregation '{func}' cannot be merged from partial aggregates.")
+                if partial not in partial_metrics.setdefault(column, []):
+                    partial_metrics[column].append(partial)
+    return partial_metrics
+
+def rebuild_means(cube: pd.DataFrame, metrics: dict) -> pd.DataFrame:
+    """Set each requested {column}_mean to {column}_sum / {column}_count, in place."""
+    for column, agg_funcs in metrics.items():
+        if "mean" in (agg_funcs if isinstance(agg_funcs, list) else [agg_funcs]):
+            cube[f"{column}_mean"] = cube[f"{column}_sum"] / cube[f"{column}_count"]
+    return cube
+
+def grouping_id(dimensions: list, grouped_dimensions: list) -> int:
+    """
+    Return the grouping id of a grouping set, as in SQL GROUPING_ID().
+
+    Bit (n - 1 - i) is set when dimension i is rolled up, so the finest level is 0
+    and the grand total is 2**n - 1.
+    """
+    n = len(dimensions)
+    return sum(1 << (n - 1 - i) for i, dim in enumerate(dimensions) if dim not in grouped_dimensions)
+
+def create_grouping_sets_cube(
+    dimensions: list,
+    metrics: dict,
+    sales_df: Optional[pd.DataFrame] = None,
+    db_path: pathlib.Path = DB_PATH,
+    rollup: bool = False,
+) -> pd.DataFrame:
+    """
+    Create a CUBE (all 2**n grouping sets) or ROLLUP (the n + 1 prefixes) of the dimensions in one call.
+
+    The facts are aggregated once, at the finest level. Each coarser grouping set is then
+    merged from the smallest finer grouping set already computed, never from the facts.
+    Means are rebuilt from sums and counts at each level.
+
+    Args:
+        dimensions (list): Columns to group by, as for create_olap_cube().
+        metrics (dict): Dictionary of aggregation functions (sum, mean, min, max or count).
+        sales_df (pd.DataFrame, optional): The sales data. If None, the finest level is
+            aggregated inside SQLite with create_olap_cube_sql().
+        db_path (pathlib.Path): Path to the SQLite data warehouse when sales_df is None.
+        rollup (bool): Only compute the hierarchical prefixes of dimensions.
+
+    Returns:
+        pd.DataFrame: One row per cell of every grouping set, with a grouping_id column.
+            Rolled-up dimensions are missing (NA) in that set's rows. No sale_ids ranges.
+    """
+    try:
+        # Decompose the requested metrics into partial aggregates that can be merged
+        partial_metrics = mergeable_metrics(metrics)
+        partial_columns = generate_column_names([], partial_metrics)
+        merge = {name: MERGE_AGGREGATES[name.rsplit("_", 1)[1]] for name in partial_columns}
+
+        # The one pass over the facts
+        if sales_df is None:
+            finest = create_olap_cube_sql(dimensions, partial_metrics, db_path=db_path, include_sale_ids=False)
+        else:
+            finest = sales_df.groupby(dimensions, observed=True).agg(partial_metrics).reset_index()
+            finest.columns = generate_column_names(dimensions, partial_metrics)
+
+        if rollup:
+            grouping_sets = [tuple(dimensions[:size]) for size in range(len(dimensions), -1, -1)]
+        else:
+            grouping_sets = [combo for size in range(len(dimensions), -1, -1) for combo in combinations(dimensions, size)]
+
+        levels = {tuple(dimensions): finest}
+        for grouped in grouping_sets[1:]:
+            parents = [level for dims, level in levels.items() if set(grouped) < set(dims)]
+            parent = min(parents, key=len)
+            if grouped:
+                levels[grouped] = parent.groupby(list(grouped), observed=True).agg(merge).reset_index()
+            else:
+                levels[grouped] = pd.DataFrame({name: [parent[name].agg(func)] for name, func in merge.items()})
+
+        output_columns = generate_column_names(dimensions, metrics)
+        frames = []
+        for grouped in grouping_sets:
+            level = rebuild_means(levels[grouped].copy(), metrics)
+            for dim in dimensions:
+                if dim not in grouped:
+                    level[dim] = pd.NA
+            level = level[output_columns]
+            level.insert(len(dimensions), "grouping_id", grouping_id(dimensions, grouped))
+            frames.append(level)
+
+        # Keep integer dimensions as integers, and categorical ones categorical, even though rolled-up rows are NA
+        for dim in dimensions:
+            if pd.api.types.is_integer_dtype(finest[dim]):
+                for level in frames:
+                    level[dim] = level[dim].astype("Int64")
+            elif isinstance(finest[dim].dtype, pd.CategoricalDtype):
+                for level in frames:
+                    level[dim] = level[dim].astype(finest[dim].dtype)
+
+        cube = pd.concat(frames, ignore_index=True)
+        logger.info(f"OLAP cube created with {len(grouping_sets)} grouping sets of dimensions: {dimensions}")
+        return cube
+    except Exception as e:
+        logger.error(f"Error creating grouping sets cube: {e}")
+        raise
+
+def sale_watermark(db_path: pathlib.Path = DB_PATH) -> int:
+    """Return the highest sale_id in the sale table, or -1 if it is empty."""
+    with reader(db_path) as conn:
+        (max_sale_id,) = conn.execute("SELECT MAX(sale_id) FROM sale").fetchone()
+    return -1 if max_sale_id is None else int(max_sale_id)
+
+def merge_cube_delta(cube: pd.DataFrame, delta: pd.DataFrame, dimensions: list, metrics: dict) -> pd.DataFrame:
+    """
+    Merge the cube of newly loaded facts into an existing cube.
+
+    Both cubes must hold the partial aggregates of mergeable_metrics(metrics). Cells found
+    in both are combined (sums and counts added, minimums and maximums compared), new cells
+    are added, and means are rebuilt from the merged sums and counts.
+
+    Args:
+        cube (pd.DataFrame): The stored cube.
+        delta (pd.DataFrame): The cube of the new facts, with the same dimensions.
+        dimensions (list): The cube dimensions.
+        metrics (dict): Dictionary of aggregation functions for metrics.
+
+    Returns:
+        pd.DataFrame: The merged cube, sorted by the dimensions, with the requested metrics
+            followed by any extra partial aggregates. Without sale_ids ranges.
+    """
+    partial_columns = generate_column_names([], mergeable_metrics(metrics))
+    missing = [name for name in partial_columns if name not in cube.columns or name not in delta.columns]
+    if missing:
+        raise ValueError(f"Cannot merge cubes without the partial aggregates {missing}.")
+    merge = {name: MERGE_AGGREGATES[name.rsplit("_", 1)[1]] for name in partial_columns}
+
+    # Only cells are stacked and regrouped, never the facts behind them
+    stacked = pd.concat([cube[dimensions + partial_columns], delta[dimensions + partial_columns]], ignore_index=True)
+    merged = stacked.groupby(dimensions, sort=True, observed=True).agg(merge).reset_index()
+    merged = rebuild_means(merged, metrics)
+    output_columns = generate_column_names(dimensions, metrics)
+    return merged[output_columns + [name for name in partial_columns if name not in output_columns]]
+
+def update_olap_cube_incremental(
+    cube: pd.DataFrame,
+    dimensions: list,
+    metrics: dict,
+    watermark: int,
+    db_path: pathlib.Path = DB_PATH,
+) -> tuple:
+    """
+    Bring a stored cube up to date with the sale rows loaded after it was built.
+
+    Only rows with sale_id above the watermark are aggregated (inside SQLite), and the
+    result is merged into the cube with merge_cube_delta(), so the cost follows the size
+    of the new load, not of the fact table. Build the first cube with
+    create_olap_cube_sql(dimensions, mergeable_metrics(metrics)) and take
+    sale_watermark() as its watermark.
+
+    The delta is bounded to watermark < sale_id <= new watermark, so rows loaded after
+    the new watermark was read are left for the next update instead of being counted twice.
+
+    Rows changed in place at or below the watermark (e.g. by an incremental ETL upsert),
+    and changed customer or product attributes used as dimensions, are not seen; rebuild
+    the cube after such a load.
+
+    Args:
+        cube (pd.DataFrame): The stored cube, with the partial aggregates.
+        dimensions (list): The cube dimensions.
+        metrics (dict): Dictionary of aggregation functions for metrics.
+        watermark (int): The highest sale_id already included in the cube.
+        db_path (pathlib.Path): Path to the SQLite data warehouse.
+
+    Returns:
+        tuple: (updated cube, new watermark).
+    """
+    try:
+        new_watermark = sale_watermark(db_path)
+        if new_watermark <= watermark:
+            logger.info(f"OLAP cube is up to date at sale_id {watermark}.")
+            return cube, watermark
+
+        delta = create_olap_cube_sql(
+            dimensions, mergeable_metrics(metrics), db_path=db_path, include_sale_ids=False,
+            after_sale_id=watermark, up_to_sale_id=new_watermark,
+        )
+        updated = merge_cube_delta(cube, delta, dimensions, metrics)
+        logger.info(
+            f"OLAP cube updated with sale_id {watermark + 1}..{new_watermark}: "
+            f"{len(delta)} delta cells merged into {len(cube)} cells."
+        )
+        return updated, new_watermark
+    except Exception as e:
+        logger.error(f"Error updating OLAP cube incrementally: {e}")
+        raise
+
+def partial_cube_plan(dimensions: list, metrics: dict) -> Tuple[dict, dict, List[str]]:
+    """
+    Return what a partial-aggregate cube build needs for these dimensions and metrics.
+
+    Returns:
+        tuple: (partial metrics, merge aggregation per partial column including cell_size,
+            fact table columns to read).
+    """
+    partial_metrics = mergeable_metrics(metrics)
+    merge = {name: MERGE_AGGREGATES[name.rsplit("_", 1)[1]] for name in generate_column_names([], partial_metrics)}
+    merge["cell_size"] = "sum"
+
+    needed = ["sale_date"] if any(dim in SQL_TIME_DIMENSIONS for dim in dimensions) else []
+    for column in [dim for dim in dimensions if dim not in SQL_TIME_DIMENSIONS] + list(partial_metrics):
+        if column not in needed:
+            needed.append(column)
+    return partial_metrics, merge, needed
+
+def aggregate_partial_cells(sales_chunk: pd.DataFrame, dimensions: list, partial_metrics: dict) -> pd.DataFrame:
+    """Reduce a chunk of sale rows to one row of partial aggregates, plus its cell_size, per cell."""
+    if "sale_date" in sales_chunk.columns and any(dim in SQL_TIME_DIMENSIONS for dim in dimensions):
+        sales_chunk = add_time_dimensions(sales_chunk)
+    grouped = sales_chunk.groupby(dimensions, sort=False, observed=True)
+    partial = grouped.agg(partial_metrics)
+    partial.columns = generate_column_names([], partial_metrics)
+    partial["cell_size"] = grouped.size()
+    return partial.reset_index()
+
+def finish_partial_cube(cells: pd.DataFrame, dimensions: list, metrics: dict) -> pd.DataFrame:
+    """Sort merged partial cells by the dimensions, rebuild means and add the sale_ids ranges."""
+    cells = cells.sort_values(dimensions, kind="stable", ignore_index=True)
+    cells = rebuild_means(cells, metrics)
+    cube = cells[generate_column_names(dimensions, metrics)].copy()
+    return add_sale_id_ranges(cube, cells["cell_size"].to_numpy())
+
+def merge_partial_cells(partials: list, dimensions: list, merge: dict) -> pd.DataFrame:
+    """Combine frames of partial aggregates into one row per cell (in no particular order)."""
+    stacked = partials[0] if len(partials) == 1 else pd.concat(partials, ignore_index=True)
+    return stacked.groupby(dimensions, sort=False, observed=True).agg(merge).reset_index()
+
+def spill_partial_cells(
+    cells: pd.DataFrame, dimensions: list, spill_dir: pathlib.Path, spill_number: int, level: int = 0
+) -> None:
+    """
+    Write partial aggregates to SPILL_PARTITIONS pickle files, by a hash of each cell's dimensions.
+
+    Partition n goes to spill_dir/partition_nn. Each level re-hashes with its own seed,
+    so spilling one partition's cells again one level deeper spreads them over new partitions.
+    """
+    hashes = pd.util.hash_pandas_object(cells[dimensions], index=False).to_numpy()
+    if level:
+        hashes = pd.util.hash_array(hashes ^ np.uint64(level))
+    partition = hashes % SPILL_PARTITIONS
+    for number in range(SPILL_PARTITIONS):
+        part = cells[partition == number]
+        if len(part):
+            part_dir = spill_dir.joinpath(f"partition_{number:02d}")
+            part_dir.mkdir(exist_ok=True)
+            part.to_pickle(part_dir.joinpath(f"spill_{spill_number:05d}.pkl"))
+
+def finish_spilled_partitions(
+    spill_dir: pathlib.Path,
+    dimensions: list,
+    metrics: dict,
+    merge: dict,
+    memory_budget: int,
+    runs_dir: pathlib.Path,
+    level: int = 0,
+) -> List[List[pathlib.Path]]:
+    """
+    Merge each spilled partition under spill_dir into a sorted run of block files in runs_dir.
+
+    A partition's spill files are read and merged one after another, as the facts are.
+    If its merged cells alone pass memory_budget bytes, the cells merged so far and the
+    files not read yet are spilled again into sub-partitions one level deeper (with a
+    new hash seed), and those are finished the same way, up to SPILL_MAX_LEVELS deep.
+    Each finished partition is sorted by the dimensions, gets its means rebuilt and
+    keeps its cell_size, and is written for merge_sorted_runs() in blocks of about
+    memory_budget / (2 * SPILL_PARTITIONS ** (level + 1)) bytes, so one block of every
+    run takes at most half the budget however deep the runs are. runs_dir must be a
+    folder directly in the top spill folder.
+
+    Returns:
+        list: One list of block files per run, in order. No cell is in two runs.
+    """
+    runs = []
+    for partition_dir in sorted(spill_dir.glob("partition_*")):
+        spill_files = sorted(partition_dir.glob("spill_*.pkl"))
+        pending: list = []
+        pending_bytes = 0
+        oversized = False
+        for number, path in enumerate(spill_files):
+            part = pd.read_pickle(path)
+            pending.append(part)
+            pending_bytes += int(part.memory_usage(deep=True).sum())
+            if pending_bytes > memory_budget:
+                pending = [merge_partial_cells(pending, dimensions, merge)]
+                pending_bytes = int(pending[0].memory_usage(deep=True).sum())
+                if pending_bytes > memory_budget and level < SPILL_MAX_LEVELS:
+                    spill_partial_cells(pending[0], dimensions, partition_dir, number, level + 1)
+                    for later, later_path in enumerate(spill_files[number + 1:], number + 1):
+                        spill_partial_cells(pd.read_pickle(later_path), dimensions, partition_dir, later, level + 1)
+                    oversized = True
+                    break
+        for path in spill_files:
+            path.unlink()
+        if oversized:
+            runs.extend(finish_spilled_partitions(partition_dir, dimensions, metrics, merge, memory_budget, runs_dir, level + 1))
+            continue
+
+        cells = merge_partial_cells(pending, dimensions, merge)
+        cells = cells.sort_values(dimensions, kind="stable", ignore_index=True)
+        cells = rebuild_means(cells, metrics)[generate_column_names(dimensions, metrics) + ["cell_size"]]
+        cells_bytes = int(cells.memory_usage(deep=True).sum())
+        block_bytes = memory_budget // (2 * SPILL_PARTITIONS ** (level + 1))
+        block_rows = max(1, len(cells) * block_bytes // max(cells_bytes, 1))
+        run = []
+        run_name = "_".join(partition_dir.relative_to(runs_dir.parent).parts)  # e.g. partition_03_partition_11
+        for first in range(0, len(cells), block_rows):
+            block_path = runs_dir.joinpath(f"{run_name}_block_{len(run):05d}.pkl")
+            cells.iloc[first:first + block_rows].to_pickle(block_path)
+            run.append(block_path)
+        runs.append(run)
+    return runs
+
+def merge_sorted_runs(runs: List[List[pathlib.Path]], dimensions: list) -> Iterator[pd.DataFrame]:
+    """
+    Yield the cells of runs (from finish_spilled_partitions()) in dimension order, a block at a time.
+
+    One block of each run is held at a time. The rows up to the smallest last-loaded
+    row of the runs that have blocks left are final, so they are yielded and that run's
+    next block is loaded. This works because no cell is in two runs.
+    """
+    next_block = [0] * len(runs)
+
+    def load(run: int) -> pd.DataFrame:
+        block = pd.read_pickle(runs[run][next_block[run]])
+        next_block[run] += 1
+        block["merge_run"] = run
+        block["merge_frontier"] = False
+        if next_block[run] < len(runs[run]):  # Rows past this block's last one are still on disk
+            block.loc[block.index[-1], "merge_frontier"] = True
+        return block
+
+    loaded = [load(run) for run in range(len(runs)) if runs[run]]
+    pending = pd.concat(loaded, ignore_index=True) if loaded else pd.DataFrame()
+    while len(pending):
+        pending = pending.sort_values(dimensions, kind="stable", ignore_index=True)
+        frontier = np.flatnonzero(pending["merge_frontier"].to_numpy())
+        stop = frontier[0] + 1 if len(frontier) else len(pending)
+        yield pending.iloc[:stop].drop(columns=["merge_run", "merge_frontier"])
+        if not len(frontier):
+            return
+        pending = pd.concat([pending.iloc[stop:], load(int(pending["merge_run"].iat[frontier[0]]))], ignore_index=True)
+
+def create_olap_cube_out_of_core(
+    dimensions: list,
+    metrics: dict,
+    db_path: pathlib.Path = DB_PATH,
+    chunk_rows: int = OUT_OF_CORE_CHUNK_ROWS,
+    memory_budget: int = OUT_OF_CORE_MEMORY_BUDGET,
+    spill_dir: Optional[pathlib.Path] = None,
+    conn: Optional[sqlite3.Connection] = None,
+    output_path: Optional[pathlib.Path] = None,
+) -> pd.DataFrame:
+    """
+    Create an OLAP cube from a sale table that does not fit in memory.
+
+    The sale table is read chunk_rows rows at a time. Each chunk gets its time dimensions
+    and is reduced to the partial aggregates of mergeable_metrics(metrics) per cell.
+    Partial cells are collected until they pass memory_budget bytes, then merged; if the
+    merged cells still take more than half the budget, they are spilled to disk in
+    SPILL_PARTITIONS hash partitions. At the end each partition is merged on its own,
+    so only one partition's cells are regrouped at a time; a partition too big for the
+    budget is partitioned again (see finish_spilled_partitions()).
+
+    The merged partitions are written as sorted runs and merged back in dimension order
+    (see merge_sorted_runs()). With output_path, the blocks go straight into an .npcube
+    bundle there and the cube returned is memory-mapped from it, so peak memory is about
+    one chunk plus memory_budget. Without it the blocks are joined into the returned
+    frame, which then also holds the whole cube.
+
+    Args:
+        dimensions (list): Columns of the sale or sale_wide table, or derived time dimensions, to group by.
+        metrics (dict): Dictionary of aggregation functions (sum, mean, min, max or count).
+        db_path (pathlib.Path): Path to the SQLite data warehouse.
+        chunk_rows (int): Number of sale rows read at a time.
+        memory_budget (int): Bytes of partial aggregates held in memory before spilling.
+        spill_dir (pathlib.Path, optional): Folder for the spill files. Defaults to the system temp folder.
+        conn (sqlite3.Connection, optional): A read_snapshot() connection to read the facts in.
+        output_path (pathlib.Path, optional): .npcube bundle folder to stream the cube into
+            (see write_cube_blocks_to_npy_bundle()).
+
+    Returns:
+        pd.DataFrame: The multidimensional OLAP cube, matching create_olap_cube() on the
+            same facts, with sale_ids ranges into the array returned by query_sale_ids_by_cell().
+            String dimensions come back as categoricals when read from output_path.
+    """
+    try:
+        partial_metrics, merge, needed = partial_cube_plan(dimensions, metrics)
+        table = fact_table_for(needed, db_path)
+
+        pending: list = []
+        pending_bytes = 0
+        spills = 0
+        rows_read = 0
+        with tempfile.TemporaryDirectory(dir=spill_dir) as tmp:
+            tmp_dir = pathlib.Path(tmp)
+            # One read transaction, so every chunk comes from the same committed state
+            with snapshot_or(conn, db_path) as conn:
+                no_sales = pd.read_sql_query(f"SELECT {', '.join(needed)} FROM {table} LIMIT 0", conn)
+                # read_sql_query with chunksize pulls the rows through cursor.fetchmany()
+                for chunk in pd.read_sql_query(f"SELECT {', '.join(needed)} FROM {table}", conn, chunksize=chunk_rows):
+                    rows_read += len(chunk)
+                    partial = aggregate_partial_cells(chunk, dimensions, partial_metrics)
+                    pending.append(partial)
+                    pending_bytes += int(partial.memory_usage(deep=True).sum())
+
+                    if pending_bytes > memory_budget:
+                        merged = merge_partial_cells(pending, dimensions, merge)
+                        merged_bytes = int(merged.memory_usage(deep=True).sum())
+                        if merged_bytes > memory_budget // 2:
+                            spill_partial_cells(merged, dimensions, tmp_dir, spills)
+                            spills += 1
+                            pending, pending_bytes = [], 0
+                        else:
+                            pending, pending_bytes = [merged], merged_bytes
+
+            if not spills and not pending:  # No sales at all; let pandas build the empty cube with the right columns
+                cube = create_olap_cube(add_time_dimensions(no_sales) if "sale_date" in needed else no_sales, dimensions, metrics)
+                if output_path is not None:
+                    write_cube_to_npy_bundle(cube, str(pathlib.Path(output_path).resolve()))
+                    cube = read_cube_from_npy_bundle(output_path)
+                return cube
+
+            if not spills:
+                cube = finish_partial_cube(merge_partial_cells(pending, dimensions, merge), dimensions, metrics)
+                blocks: Iterator[pd.DataFrame] = iter([cube])
+                runs = []
+            else:
+                if pending:
+                    spill_partial_cells(merge_partial_cells(pending, dimensions, merge), dimensions, tmp_dir, spills)
+                    spills += 1
+                pending = []
+                runs_dir = tmp_dir.joinpath("runs")
+                runs_dir.mkdir()
+                runs = finish_spilled_partitions(tmp_dir, dimensions, metrics, merge, memory_budget, runs_dir)
+                blocks = with_sale_id_ranges(merge_sorted_runs(runs, dimensions))
+
+            if output_path is not None:
+                write_cube_blocks_to_npy_bundle(blocks, output_path)
+                cube = read_cube_from_npy_bundle(output_path)
+            else:
+                cube = pd.concat(list(blocks), ignore_index=True)
+
+        logger.info(
+            f"OLAP cube created out of core with dimensions: {dimensions} "
+            f"({rows_read} sales in chunks of {chunk_rows}, {spills} spills, {len(runs)} sorted runs)"
+        )
+        return cube
+    except Exception as e:
+        logger.error(f"Error creating OLAP cube out of core: {e}")
+        raise
+
+def with_sale_id_ranges(blocks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """Replace the cell_size column of cube blocks in dimension order with sale_ids ranges that run on across blocks."""
+    offset = 0
+    for block in blocks:
+        cell_sizes = block.pop("cell_size").to_numpy()
+        block = add_sale_id_ranges(block.reset_index(drop=True), cell_sizes)
+        block["sale_ids_start"] += offset
+        block["sale_ids_stop"] += offset
+        offset += int(cell_sizes.sum())
+        yield block
+
+def encode_partial_cells(cells: pd.DataFrame) -> Dict[str, tuple]:
+    """
+    Turn a frame of partial cells into plain NumPy arrays for sending between processes.
+
+    Numeric columns are sent as they are. Categorical and string columns are sent as
+    integer codes plus their categories, like the columns of an .npcube bundle.
+    """
+    encoded: Dict[str, tuple] = {}
+    for name in cells.columns:
+        column = cells[name]
+        if isinstance(column.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(column):
+            categorical = column.astype("category")
+            encoded[name] = (categorical.cat.codes.to_numpy(), categorical.cat.categories.tolist(), column.dtype)
+        else:
+            encoded[name] = (column.to_numpy(),)
+    return encoded
+
+def decode_partial_cells(encoded: Dict[str, tuple]) -> pd.DataFrame:
+    """Rebuild the frame of partial cells sent by encode_partial_cells()."""
+    columns = {}
+    for name, parts in encoded.items():
+        if len(parts) == 1:
+            columns[name] = parts[0]
+        else:
+            codes, categories, dtype = parts
+            columns[name] = pd.Series(pd.Categorical.from_codes(codes, categories)).astype(dtype)
+    return pd.DataFrame(columns)
+
+def aggregate_sale_id_range(
+    dimensions: list,
+    partial_metrics: dict,
+    needed: List[str],
+    db_path: pathlib.Path,
+    first: int,
+    last: int,
+    table: str = FACT_TABLE,
+) -> Tuple[Optional[int], Dict[str, tuple]]:
+    """
+    Worker task: aggregate the sales with first <= sale_id <= last into encoded partial cells.
+
+    Returns:
+        tuple: (warehouse generation the range was read at, encoded partial cells).
+    """
+    with read_snapshot(db_path) as conn:
+        generation = warehouse_generation(conn)
+        sales_range = pd.read_sql_query(
+            f"SELECT {', '.join(needed)} FROM {table} WHERE sale_id BETWEEN ? AND ?", conn, params=(first, last)
+        )
+    return generation, encode_partial_cells(aggregate_partial_cells(sales_range, dimensions, partial_metrics))
+
+def sale_id_ranges(conn: sqlite3.Connection, partitions: int, table: str = FACT_TABLE) -> List[Tuple[int, int]]:
+    """Split a fact table's sale_id span into up to partitions equal-width [first, last] ranges."""
+    low, high = conn.execute(f"SELECT MIN(sale_id), MAX(sale_id) FROM {table}").fetchone()
+    if low is None:
+        return []
+    bounds = np.unique(np.linspace(int(low), int(high) + 1, partitions + 1).astype(np.int64))
+    return [(int(first), int(stop) - 1) for first, stop in zip(bounds, bounds[1:])]
+
+def create_olap_cube_parallel(
+    dimensions: list,
+    metrics: dict,
+    db_path: pathlib.Path = DB_PATH,
+    max_workers: Optional[int] = None,
+    partitions: Optional[int] = None,
+    conn: Optional[sqlite3.Connection] = None,
+) -> pd.DataFrame:
+    """
+    Create an OLAP cube on several cores, map-reduce style.
+
+    The sale table is split into sale_id ranges (a primary key range read each). Every
+    range is aggregated to the partial aggregates of mergeable_metrics(metrics) in a
+    worker process and returned as NumPy arrays (see encode_partial_cells()). The parent
+    merges the cells of all ranges, rebuilds means and adds the sale_ids ranges.
+
+    Every worker reads its range in its own read transaction, and reports the warehouse
+    generation it saw (see scripts/warehouse.py). If a load committed after the ranges
+    were planned, the ranges came from different snapshots, so the build starts over,
+    up to SNAPSHOT_ATTEMPTS times. Given conn, the ranges are planned in that snapshot,
+    which cannot move, so a mismatch is an error at once.
+
+    Args:
+        dimensions (list): Columns of the sale or sale_wide table, or derived time dimensions, to group by.
+        metrics (dict): Dictionary of aggregation functions (sum, mean, min, max or count).
+        db_path (pathlib.Path): Path to the SQLite data warehouse.
+        max_workers (int, optional): Number of worker processes. Defaults to the CPU count.
+        partitions (int, optional): Number of sale_id ranges. Defaults to twice the workers,
+            so a slow range does not leave the other workers idle.
+        conn (sqlite3.Connection, optional): A read_snapshot() connection to plan the ranges in.
+
+    Returns:
+        pd.DataFrame: The multidimensional OLAP cube, matching create_olap_cube() on the
+            same facts, with sale_ids ranges into the array returned by query_sale_ids_by_cell().
+    """
+    try:
+        started = time.perf_counter()
+        max_workers = max_workers or os.cpu_count() or 1
+        partial_metrics, merge, needed = partial_cube_plan(dimensions, metrics)
+        table = fact_table_for(needed, db_path)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            attempts = 1 if conn is not None else SNAPSHOT_ATTEMPTS
+            for attempt in range(1, attempts + 1):
+                with snapshot_or(conn, db_path) as planning_conn:
+                    generation = warehouse_generation(planning_conn)
+                    ranges = sale_id_ranges(planning_conn, partitions or 2 * max_workers, table)
+                if not ranges:  # No sales at all; let pandas build the empty cube with the right columns
+                    return create_olap_cube_out_of_core(dimensions, metrics, db_path=db_path, conn=conn)
+
+                futures = [
+                    executor.submit(aggregate_sale_id_range, dimensions, partial_metrics, needed, db_path, first, last, table)
+                    for first, last in ranges
+                ]
+                results = [future.result() for future in futures]
+                if all(seen == generation for seen, _ in results):
+                    break
+                logger.warning(f"A load committed during the parallel cube build; starting over (attempt {attempt}).")
+            else:
+                raise RuntimeError(f"No consistent warehouse snapshot after {attempts} attempts.")
+            partials = [decode_partial_cells(encoded) for _, encoded in results]
+
+        cube = finish_partial_cube(merge_partial_cells(partials, dimensions, merge), dimensions, metrics)
+        logger.info(
+            f"OLAP cube created in {len(ranges)} sale_id ranges on {max_workers} workers "
+            f"with dimensions: {dimensions} ({time.perf_counter() - started:.2f} s)"
+        )
+        return cube
+    except Exception as e:
+        logger.error(f"Error creating OLAP cube in parallel: {e}")
+        raise
+
+def select_grouping(cube: pd.DataFrame, dimensions: list, grouped_dimensions: list) -> pd.DataFrame:
+    """
+    Return the cells of one grouping set from a create_grouping_sets_cube() result.
+
+    Args:
+        cube (pd.DataFrame): Output of create_grouping_sets_cube().
+        dimensions (list): The dimensions the cube was built with.
+        grouped_dimensions (list): The dimensions of the wanted grouping set, e.g. ["Month"].
+
+    Returns:
+        pd.DataFrame: The grouping set's rows, without the rolled-up dimension columns.
+    """
+    level = cube[cube["grouping_id"] == grouping_id(dimensions, grouped_dimensions)]
+    dropped = [dim for dim in dimensions if dim not in grouped_dimensions] + ["grouping_id"]
+    return level.drop(columns=dropped).reset_index(drop=True)
+
 def write_cube_to_csv(cube: pd.DataFrame, filename: str) -> None:
     """Write the OLAP cube to a CSV file."""
     try:
@@ -202,32 +1089,392 @@ def write_cube_to_csv(cube: pd.DataFrame, filename: str) -> None:
         logger.error(f"Error saving OLAP cube to CSV file: {e}")
         raise
 
-def main():
-    """Main function for OLAP cubing."""
-    logger.info("Starting OLAP Cubing process...")
+def write_cube_to_npy_bundle(cube: pd.DataFrame, dirname: str) -> pathlib.Path:
+    """
+    Write the OLAP cube as a columnar bundle: one .npy file per column plus a manifest.json.
 
-    # Step 1: Ingest sales data
-    sales_df = ingest_sales_data_from_dw()
-  
-    # Step 2: Add additional columns for time-based dimensions
-    sales_df["sale_date"] = pd.to_datetime(sales_df["sale_date"])
-    sales_df["DayOfWeek"] = sales_df["sale_date"].dt.day_name()
-    sales_df["Month"] = sales_df["sale_date"].dt.month
-    sales_df["MonthName"] = sales_df["sale_date"].dt.month_name()
-    sales_df["Year"] = sales_df["sale_date"].dt.year
+    Numeric columns are saved with their own dtype. String and categorical columns are
+    dictionary-encoded as integer codes plus a list of categories in the manifest.
+    Missing values in nullable columns are saved as a separate boolean mask.
+    cube.attrs (e.g. the fingerprint the cube was built at) is kept in the manifest.
+
+    Returns:
+        pathlib.Path: The bundle folder.
+    """
+    try:
+        output_path = OLAP_OUTPUT_DIR.joinpath(dirname)
+        if output_path.exists():
+            shutil.rmtree(output_path)
+        output_path.mkdir(parents=True)
+
+        manifest = {"rows": len(cube), "attrs": cube.attrs, "columns": []}
+        for position, name in enumerate(cube.columns):
+            column = cube[name]
+            entry = {"name": name, "file": f"{position}.npy"}
+            if isinstance(column.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(column):
+                categorical = column.astype("category")
+                entry["categories"] = categorical.cat.categories.tolist()
+                values = categorical.cat.codes.to_numpy()  # -1 marks a missing value
+            elif column.hasnans and pd.api.types.is_extension_array_dtype(column):
+                entry["mask"] = f"{position}.mask.npy"
+                np.save(output_path.joinpath(entry["mask"]), column.isna().to_numpy())
+                entry["dtype"] = str(column.dtype)
+                values = column.to_numpy(dtype=column.dtype.numpy_dtype, na_value=0)
+            else:
+                entry["dtype"] = str(column.dtype)
+                values = column.to_numpy()
+            np.save(output_path.joinpath(entry["file"]), values)
+            manifest["columns"].append(entry)
+
+        output_path.joinpath("manifest.json").write_text(json.dumps(manifest, indent=2))
+        logger.info(f"OLAP cube saved to {output_path}.")
+        return output_path
+    except Exception as e:
+        logger.error(f"Error saving OLAP cube to npy bundle: {e}")
+        raise
+
+def write_cube_blocks_to_npy_bundle(blocks: Iterable[pd.DataFrame], output_path: pathlib.Path) -> pathlib.Path:
+    """
+    Write a cube that arrives as blocks of rows, in order, as a bundle like write_cube_to_npy_bundle().
+
+    Only one block is held at a time. Each block's columns are saved as numbered pieces,
+    string and categorical columns as codes into a dictionary that grows as new values
+    arrive. The pieces are then copied into one memory-mapped .npy file per column, with
+    a dtype common to all blocks and the codes renumbered to the categories
+    write_cube_to_npy_bundle() would store (sorted, or the categorical's own). The
+    manifest is written last, so a bundle without one is incomplete.
+
+    Returns:
+        pathlib.Path: The bundle folder.
+    """
+    try:
+        output_path = pathlib.Path(output_path)
+        if output_path.exists():
+            shutil.rmtree(output_path)
+        pieces_dir = output_path.joinpath("pieces")
+        pieces_dir.mkdir(parents=True)
+
+        columns: Dict[str, dict] = {}
+        block_rows = []
+        for number, block in enumerate(blocks):
+            block_rows.append(len(block))
+            for name in block.columns:
+                column = block[name]
+                state = columns.setdefault(name, {"file": f"{len(columns)}.npy", "dtypes": [], "masks": set()})
+                piece = pieces_dir.joinpath(f"{state['file'][:-4]}_{number:05d}")
+                if isinstance(column.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(column):
+                    dictionary = state.setdefault("dictionary", {})
+                    if isinstance(column.dtype, pd.CategoricalDtype):
+                        state["categories"] = column.cat.categories.tolist()
+                    for value in pd.unique(column.dropna()):
+                        dictionary.setdefault(value, len(dictionary))
+                    values = pd.Index(list(dictionary)).get_indexer(column).astype(np.int32)  # -1 marks a missing value
+                elif pd.api.types.is_extension_array_dtype(column):
+                    state["masked_dtype"] = str(column.dtype)
+                    state["masks"].add(number)
+                    np.save(piece.with_suffix(".mask.npy"), column.isna().to_numpy())
+                    values = column.to_numpy(dtype=column.dtype.numpy_dtype, na_value=0)
+                else:
+                    values = column.to_numpy()
+                state["dtypes"].append(values.dtype)
+                np.save(piece.with_suffix(".npy"), values)
+
+        manifest = {"rows": sum(block_rows), "attrs": {}, "columns": []}
+        for name, state in columns.items():
+            entry = {"name": name, "file": state["file"]}
+            remap = None
+            if "dictionary" in state:
+                categories = pd.Index(state.get("categories", list(state["dictionary"])))
+                if "categories" not in state:
+                    categories = categories.sort_values()
+                entry["categories"] = categories.tolist()
+                remap = np.append(categories.get_indexer(list(state["dictionary"])), -1).astype(np.int32)  # -1 stays -1
+                dtype = np.dtype(np.int32)
+            else:
+                dtype = np.result_type(*state["dtypes"])
+                entry["dtype"] = state.get("masked_dtype", str(dtype))
+            values_out = np.lib.format.open_memmap(output_path.joinpath(entry["file"]), mode="w+", dtype=dtype, shape=(manifest["rows"],))
+            if "masked_dtype" in state:
+                entry["mask"] = state["file"].replace(".npy", ".mask.npy")
+                mask_out = np.lib.format.open_memmap(output_path.joinpath(entry["mask"]), mode="w+", dtype=bool, shape=(manifest["rows"],))
+            offset = 0
+            for number, rows in enumerate(block_rows):
+                piece = pieces_dir.joinpath(f"{state['file'][:-4]}_{number:05d}")
+                values = np.load(piece.with_suffix(".npy"))
+                values_out[offset:offset + rows] = values if remap is None else remap[values]
+                if "masked_dtype" in state:
+                    mask_out[offset:offset + rows] = np.load(piece.with_suffix(".mask.npy")) if number in state["masks"] else False
+                offset += rows
+            values_out.flush()
+            del values_out
+            if "masked_dtype" in state:
+                mask_out.flush()
+                del mask_out
+            manifest["columns"].append(entry)
+
+        shutil.rmtree(pieces_dir)
+        output_path.joinpath("manifest.json").write_text(json.dumps(manifest, indent=2))
+        logger.info(f"OLAP cube streamed to {output_path}.")
+        return output_path
+    except Exception as e:
+        logger.error(f"Error streaming OLAP cube to npy bundle: {e}")
+        raise
+
+def read_cube_from_npy_bundle(bundle_path: pathlib.Path) -> pd.DataFrame:
+    """
+    Open a cube written by write_cube_to_npy_bundle().
+
+    Every column becomes its own block: plain numeric columns wrap their memory map,
+    and nullable columns wrap the memory-mapped values and mask, so neither is copied
+    or read until used (the frame is read-only). Only dictionary-encoded columns are
+    materialized, as pandas categoricals. The cube's attrs are restored from the manifest.
+    """
+    manifest = json.loads(bundle_path.joinpath("manifest.json").read_text())
+    columns = []
+    for entry in manifest["columns"]:
+        values = np.load(bundle_path.joinpath(entry["file"]), mmap_mode="r").view(np.ndarray)  # Still file-backed
+        if "categories" in entry:
+            column = pd.Categorical.from_codes(values, entry["categories"])
+        elif "mask" in entry:
+            mask = np.load(bundle_path.joinpath(entry["mask"]), mmap_mode="r").view(np.ndarray)
+            column = pd.api.types.pandas_dtype(entry["dtype"]).construct_array_type()(values, mask)
+        else:
+            column = values
+        columns.append(pd.DataFrame({entry["name"]: column}, copy=False))
+    # Joining one-column frames keeps their blocks as they are, where a dict of
+    # same-dtype arrays may be consolidated into one 2D block, which copies them
+    cube = pd.concat(columns, axis=1) if columns else pd.DataFrame()
+    cube.attrs = manifest.get("attrs", {})
+    return cube
+
+def write_text_atomic(path: pathlib.Path, text: str) -> None:
+    """Write text to a temporary file next to path and move it into place, so readers never see half a file."""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(text)
+    os.replace(tmp_path, path)
+
+def table_content_hash(conn: sqlite3.Connection, table: str, chunk_rows: int = OUT_OF_CORE_CHUNK_ROWS) -> str:
+    """Hash every column of every row of table, reading it in chunks in primary key order."""
+    digest = hashlib.sha256(repr(table_columns(conn, table)).encode())
+    for chunk in pd.read_sql_query(f"SELECT * FROM {table} ORDER BY 1", conn, chunksize=chunk_rows):
+        digest.update(pd.util.hash_pandas_object(chunk, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def file_header(path: pathlib.Path) -> str:
+    """
+    Return the first 32 bytes of a SQLite database or WAL file as hex.
+
+    They hold the database's change counter, bumped by every commit, and the WAL's
+    salts, changed each time the log restarts. File timestamps can be too coarse to
+    tell two quick commits of the same size apart; these bytes are not.
+    """
+    with open(path, "rb") as file:
+        return file.read(32).hex()
+
+def warehouse_file_state(db_path: pathlib.Path) -> str:
+    """Return the size, modification time and header of the database and WAL files."""
+    # Writes in WAL mode land in the -wal file before they reach the database file
+    wal_path = db_path.with_name(db_path.name + "-wal")
+    return ";".join(
+        f"{path.stat().st_size}:{path.stat().st_mtime_ns}:{file_header(path)}" for path in (db_path, wal_path) if path.exists()
+    )
+
+@contextmanager
+def fingerprinted_snapshot(db_path: pathlib.Path = DB_PATH, table: str = FACT_TABLE) -> Iterator[Tuple[sqlite3.Connection, str]]:
+    """
+    Open a read_snapshot() and fingerprint the sale table as that snapshot sees it.
 
-    # Step 3: Define dimensions and metrics for the cube
-    dimensions = ["Month","MonthName","product_id"]
-    metrics = {
-        "sale_amount_usd": ["sum", "mean", "min","max"],
-        "sale_id": "count"
+    The fingerprint is a hash of every column of every sale row, NULLs included, so
+    any insert, delete or update changes it. The result is remembered next to the
+    database and WAL files' size, modification time and header, so an untouched
+    warehouse is fingerprinted from those alone, without scanning. The memo is only
+    trusted when the files did not change while the snapshot was opened; otherwise
+    the snapshot itself is hashed.
+
+    For WIDE_FACT_TABLE the customer and product tables are hashed in as well, since
+    sale_wide is refreshed from them in the same transaction as each load.
+
+    Yields:
+        tuple: (the snapshot connection, the fingerprint of what it sees).
+    """
+    file_state = warehouse_file_state(db_path)
+    with read_snapshot(db_path) as conn:
+        steady = warehouse_file_state(db_path) == file_state  # No commit between the two looks
+        memo_path = CUBE_CACHE_DIR.joinpath("fingerprint.json" if table == FACT_TABLE else f"fingerprint_{table}.json")
+        memo = json.loads(memo_path.read_text()) if steady and memo_path.exists() else {}
+        if memo.get("db_path") == str(db_path.resolve()) and memo.get("file_state") == file_state:
+            fingerprint = memo["fingerprint"]
+        else:
+            hashed_tables = [FACT_TABLE] + (["customer", "product"] if table == WIDE_FACT_TABLE else [])
+            hashes = [table_content_hash(conn, hashed_table) for hashed_table in hashed_tables]
+            fingerprint = hashlib.sha256(repr(hashes).encode()).hexdigest()[:16]
+            if steady:
+                CUBE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                write_text_atomic(memo_path, json.dumps({"db_path": str(db_path.resolve()), "file_state": file_state, "fingerprint": fingerprint}))
+        yield conn, fingerprint
+
+def sale_table_fingerprint(db_path: pathlib.Path = DB_PATH, table: str = FACT_TABLE) -> str:
+    """Return a fingerprint of the sale table's contents (see fingerprinted_snapshot())."""
+    with fingerprinted_snapshot(db_path, table) as (_, fingerprint):
+        return fingerprint
+
+def evict_cached_cubes(max_bytes: int = CUBE_CACHE_MAX_BYTES) -> None:
+    """Delete the least recently used cached cubes until the cache fits in max_bytes."""
+    entries = []
+    for meta_path in CUBE_CACHE_DIR.glob("*.json"):
+        if meta_path.name.startswith("fingerprint"):
+            continue
+        meta = json.loads(meta_path.read_text())
+        bundle_path = CUBE_CACHE_DIR.joinpath(meta.get("bundle", meta_path.with_suffix(".npcube").name))
+        entries.append((meta["last_used"], meta["bytes"], meta_path, bundle_path))
+    total = sum(entry[1] for entry in entries)
+    for _, size, meta_path, bundle_path in sorted(entries):
+        if total <= max_bytes:
+            break
+        meta_path.unlink()
+        shutil.rmtree(bundle_path, ignore_errors=True)
+        total -= size
+        logger.info(f"Evicted cached cube {meta_path.stem}.")
+
+def get_or_build_cube(
+    dimensions: list,
+    metrics: dict,
+    db_path: pathlib.Path = DB_PATH,
+    builder: Callable[..., pd.DataFrame] = create_olap_cube_sql,
+    max_bytes: int = CUBE_CACHE_MAX_BYTES,
+    snapshot: Optional[Tuple[sqlite3.Connection, str]] = None,
+) -> pd.DataFrame:
+    """
+    Return the cube for these dimensions and metrics, building it only if the sale table changed.
+
+    Cached cubes are keyed on the cube spec (builder, dimensions, metrics) and stored as
+    .npcube bundles in CUBE_CACHE_DIR with the sale table fingerprint they were built from.
+    A hit is a memory-mapped read. Each spec keeps only its latest cube, and the cache
+    is trimmed to max_bytes by evicting the least recently used specs.
+
+    A bundle is written under a temporary name and renamed to one carrying its
+    fingerprint, then the spec's meta file is replaced in one step to point at it.
+    Readers and concurrent builders therefore see either the old cube or the new
+    one, never a partly written bundle.
+
+    The fingerprint and the build come from one read snapshot, so a cube is never
+    stored under the fingerprint of a different state of the warehouse.
+
+    Args:
+        dimensions (list): Columns to group by.
+        metrics (dict): Dictionary of aggregation functions for metrics.
+        db_path (pathlib.Path): Path to the SQLite data warehouse.
+        builder (callable): Cube builder called as builder(dimensions, metrics, db_path=db_path, conn=conn).
+            A builder with an output_path parameter (create_olap_cube_out_of_core()) is given the
+            new bundle's folder to stream the cube into, instead of returning it in memory.
+        max_bytes (int): Size limit for the whole cache.
+        snapshot (tuple, optional): (conn, fingerprint) from fingerprinted_snapshot(), to build
+            in a snapshot the caller reads more from. One is opened otherwise.
+
+    Returns:
+        pd.DataFrame: The OLAP cube, with its fingerprint in cube.attrs["fingerprint"].
+            String dimensions come back as categoricals on a cache hit or from a streaming builder.
+    """
+    if snapshot is None:
+        with fingerprinted_snapshot(db_path, fact_table_for(dimensions + list(metrics), db_path)) as snapshot:
+            return get_or_build_cube(dimensions, metrics, db_path, builder, max_bytes, snapshot)
+    conn, fingerprint = snapshot
+
+    spec = json.dumps({"builder": builder.__name__, "dimensions": dimensions, "metrics": metrics}, sort_keys=True)
+    spec_key = hashlib.sha256(spec.encode()).hexdigest()[:16]
+    meta_path = CUBE_CACHE_DIR.joinpath(f"{spec_key}.json")
+
+    old_bundle = None
+    if meta_path.exists():
+        meta = json.loads(meta_path.read_text())
+        old_bundle = CUBE_CACHE_DIR.joinpath(meta.get("bundle", meta_path.with_suffix(".npcube").name))
+        if meta["fingerprint"] == fingerprint:
+            try:
+                cube = read_cube_from_npy_bundle(old_bundle)
+            except FileNotFoundError:
+                pass  # Evicted or replaced by another process meanwhile, so build it again
+            else:
+                cube.attrs["fingerprint"] = fingerprint  # Bundles cached before attrs were saved lack it
+                meta["last_used"] = time.time()
+                write_text_atomic(meta_path, json.dumps(meta))
+                logger.info(f"OLAP cube loaded from cache {old_bundle}.")
+                return cube
+
+    bundle_path = CUBE_CACHE_DIR.joinpath(f"{spec_key}-{fingerprint}.npcube")
+    tmp_bundle = pathlib.Path(tempfile.mkdtemp(prefix=f"{spec_key}.", suffix=".tmp", dir=CUBE_CACHE_DIR))
+    try:
+        if "output_path" in inspect.signature(builder).parameters:
+            # The builder streams the cube into the bundle; it is reopened from its final place below
+            builder(dimensions, metrics, db_path=db_path, conn=conn, output_path=tmp_bundle)
+            manifest_path = tmp_bundle.joinpath("manifest.json")
+            manifest = json.loads(manifest_path.read_text())
+            manifest["attrs"] = {"fingerprint": fingerprint}
+            manifest_path.write_text(json.dumps(manifest, indent=2))
+            cube = None
+        else:
+            cube = builder(dimensions, metrics, db_path=db_path, conn=conn)
+            cube.attrs["fingerprint"] = fingerprint
+            write_cube_to_npy_bundle(cube, str(tmp_bundle.resolve()))  # An absolute path overrides OLAP_OUTPUT_DIR
+    except Exception:
+        shutil.rmtree(tmp_bundle, ignore_errors=True)
+        raise
+    try:
+        os.replace(tmp_bundle, bundle_path)
+    except OSError:
+        shutil.rmtree(tmp_bundle)  # Another builder already wrote this fingerprint's bundle
+    if cube is None:
+        cube = read_cube_from_npy_bundle(bundle_path)
+    meta = {
+        "spec": spec,
+        "fingerprint": fingerprint,
+        "bundle": bundle_path.name,
+        "last_used": time.time(),
+        "bytes": sum(path.stat().st_size for path in bundle_path.iterdir()),
     }
+    write_text_atomic(meta_path, json.dumps(meta))
+    if old_bundle is not None and old_bundle != bundle_path:
+        shutil.rmtree(old_bundle, ignore_errors=True)
+    evict_cached_cubes(max_bytes)
+    return cube
+
+def build_monthly_sales_cube(db_path: pathlib.Path = DB_PATH) -> pd.DataFrame:
+    """
+    Build (or reuse from the cache) the Month x MonthName x product_id cube and save it,
+    with the sale IDs its sale_ids ranges point into.
 
-    # Step 4: Create the cube
-    olap_cube = create_olap_cube(sales_df, dimensions, metrics)
+    The time-based dimensions are derived and aggregated inside SQLite, so only the cube
+    cells are read into pandas. (The pandas path is ingest_sales_data_from_dw() ->
+    add_time_dimensions() -> create_olap_cube().) The cube is reused from the cache
+    when the sale table has not changed.
 
-    # Step 5: Save the cube to a CSV file
+    The cube and the sale IDs are read in one snapshot, and both are saved with its
+    fingerprint, so a load committed meanwhile cannot leave the ranges pointing at
+    another warehouse's sale IDs.
+    """
+    table = fact_table_for(MONTHLY_SALES_DIMENSIONS + list(MONTHLY_SALES_METRICS), db_path)
+    with fingerprinted_snapshot(db_path, table) as (conn, fingerprint):
+        olap_cube = get_or_build_cube(MONTHLY_SALES_DIMENSIONS, MONTHLY_SALES_METRICS, db_path, snapshot=(conn, fingerprint))
+        sale_ids = query_sale_ids_by_cell(MONTHLY_SALES_DIMENSIONS, db_path, conn)
     write_cube_to_csv(olap_cube, "monthlysales_olap_cube.csv")
+    write_cube_to_npy_bundle(olap_cube, "monthlysales_olap_cube.npcube")
+    write_sale_ids(sale_ids, "monthlysales_olap_cube_sale_ids.npy", fingerprint)
+    return olap_cube
+
+def build_monthly_sales_grouping_sets() -> pd.DataFrame:
+    """Save every grouping set of the monthly sales cube (month only, product only, grand total, ...) in one file."""
+    grouping_sets_cube = create_grouping_sets_cube(MONTHLY_SALES_DIMENSIONS, MONTHLY_SALES_METRICS)
+    write_cube_to_csv(grouping_sets_cube, "monthlysales_olap_cube_grouping_sets.csv")
+    return grouping_sets_cube
+
+def main():
+    """Main function for OLAP cubing."""
+    logger.info("Starting OLAP Cubing process...")
+
+    # Steps 1-5: Build the cube and save it, with the sale IDs its ranges point into
+    build_monthly_sales_cube()
+
+    # Step 6: Save every grouping set in one file
+    build_monthly_sales_grouping_sets()
 
     logger.info("OLAP Cubing process completed successfully.")
     logger.info(f"Please see outputs in {OLAP_OUTPUT_DIR}")
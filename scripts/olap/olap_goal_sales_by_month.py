@@ -1,4 +1,4 @@
-"""
+r"""
 Module 6: OLAP Goal Script (uses cubed results)
 File: scripts/olap_goals_sales_by_month.py
 
@@ -15,11 +15,37 @@ Sum SaleAmount for each month.
 Identify the lowest month, highest month, and monthly average.
 
 This script assumes a cube data set with the following column names.
-Month, MonthName, sale_amount_usd_sum,sale_amount_usd_mean,sale_amount_usd_min, sale_amount_usd_max,sale_id_count, sale_ids
+Month, MonthName, sale_amount_usd_sum,sale_amount_usd_mean,sale_amount_usd_min, sale_amount_usd_max,sale_id_count, sale_ids_start, sale_ids_stop
+
+The sale IDs of the cube row i are SALE_IDS_FILE[sale_ids_start:sale_ids_stop] (see get_cell_sale_ids()).
+load_sale_ids() only accepts a sale IDs file saved with the same warehouse fingerprint as the cube.
+
+The cube is loaded once into a Cube (scripts/olap/olap_cube.py), and every question
+below is a rollup query against its indexes instead of a pandas groupby over the cells.
+
+Charts are rendered headlessly on the Agg backend, each in its own worker process,
+and written to data/results. A chart whose input aggregates hash the same as when
+it was last drawn is not drawn again. Nothing is shown on screen, so the script
+can run on a schedule.
+
+To run it, open a terminal in the root project folder:
+
+py scripts\olap\olap_goal_sales_by_month.py
+python3 scripts/olap/olap_goal_sales_by_month.py --workers 2 --force
 """
 
+import argparse
+import hashlib
+import json
+import os
+import time
+import types
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, NamedTuple, Optional
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+import matplotlib
+from matplotlib.figure import Figure
 import pathlib
 import sys
 
@@ -29,19 +55,43 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.append(str(PROJECT_ROOT))
 
 from utils.logger import logger  # noqa: E402
+from scripts.olap.olap_cubing import read_cube_from_npy_bundle, sale_ids_fingerprint_path, write_text_atomic  # noqa: E402
+from scripts.olap.olap_cube import Cube  # noqa: E402
 
 # Constants
 OLAP_OUTPUT_DIR: pathlib.Path = pathlib.Path("data").joinpath("olap_cubing_outputs")
 CUBED_FILE: pathlib.Path = OLAP_OUTPUT_DIR.joinpath("monthlysales_olap_cube.csv")
+SALE_IDS_FILE: pathlib.Path = OLAP_OUTPUT_DIR.joinpath("monthlysales_olap_cube_sale_ids.npy")
 RESULTS_OUTPUT_DIR: pathlib.Path = pathlib.Path("data").joinpath("results")
+CHART_HASHES_FILE: str = "chart_hashes.json"  # Content hash of each chart's inputs when it was last drawn
+
+# Charts are only ever written to files, so never open a window (pandas plotting imports pyplot)
+matplotlib.use("Agg")
 
 # Create output directory for results if it doesn't exist
 RESULTS_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 
+class Chart(NamedTuple):
+    """One chart to render: its PNG file name, a module-level render function, and its input data."""
+    file_name: str
+    render: Callable[[pd.DataFrame, pathlib.Path], None]
+    data: pd.DataFrame
+
+
 def load_olap_cube(file_path: pathlib.Path) -> pd.DataFrame:
-    """Load the precomputed OLAP cube data."""
+    """
+    Load the precomputed OLAP cube data.
+
+    If file_path is a .npcube bundle, or a CSV with a .npcube bundle next to it,
+    the bundle is memory-mapped instead of parsing the CSV.
+    """
     try:
+        bundle_path = file_path if file_path.suffix == ".npcube" else file_path.with_suffix(".npcube")
+        if bundle_path.joinpath("manifest.json").exists():
+            cube_df = read_cube_from_npy_bundle(bundle_path)
+            logger.info(f"OLAP cube data successfully loaded from {bundle_path}.")
+            return cube_df
         cube_df = pd.read_csv(file_path)
         logger.info(f"OLAP cube data successfully loaded from {file_path}.")
         return cube_df
@@ -49,13 +99,38 @@ def load_olap_cube(file_path: pathlib.Path) -> pd.DataFrame:
         logger.error(f"Error loading OLAP cube data: {e}")
         raise
 
-def analyze_sales_by_month(cube_df: pd.DataFrame) -> pd.DataFrame:
+def load_sale_ids(file_path: pathlib.Path, cube_df: pd.DataFrame) -> np.ndarray:
+    """
+    Memory-map the sorted sale_id array that the cube's sale_ids ranges point into.
+
+    The array must have been saved with the fingerprint the cube was built at
+    (cube_df.attrs["fingerprint"], kept in its .npcube bundle). Otherwise the two come
+    from different states of the warehouse and the ranges would point at the wrong
+    sale IDs, so a ValueError is raised.
+    """
+    try:
+        fingerprint_path = sale_ids_fingerprint_path(file_path)
+        saved = json.loads(fingerprint_path.read_text())["fingerprint"] if fingerprint_path.exists() else None
+        expected = cube_df.attrs.get("fingerprint")
+        if saved is None or saved != expected:
+            raise ValueError(f"{file_path} was saved at warehouse fingerprint {saved}, but the cube at {expected}.")
+        sale_ids = np.load(file_path, mmap_mode="r")
+        logger.info(f"Sale IDs successfully loaded from {file_path}.")
+        return sale_ids
+    except Exception as e:
+        logger.error(f"Error loading sale IDs: {e}")
+        raise
+
+def get_cell_sale_ids(cube_df: pd.DataFrame, sale_ids: np.ndarray, row: int) -> np.ndarray:
+    """Return the sale IDs behind one cube row by slicing, with no parsing."""
+    start, stop = cube_df.iloc[row][["sale_ids_start", "sale_ids_stop"]]
+    return sale_ids[int(start):int(stop)]
+
+def analyze_sales_by_month(cube: Cube) -> pd.DataFrame:
     """Aggregate total sales by Month."""
     try:
-        # Group by Month (numeric) and sum the sales
-        sales_by_month = (
-            cube_df.groupby("Month")["sale_amount_usd_sum"].sum().reset_index()
-        )
+        # Roll up to Month (numeric) to sum the sales
+        sales_by_month = cube.rollup(["Month"])[["Month", "sale_amount_usd_sum"]]
         sales_by_month.rename(columns={"sale_amount_usd_sum": "TotalSales"}, inplace=True)
         sales_by_month.sort_values(by="TotalSales", inplace=True)
         logger.info("Sales aggregated by Month successfully.")
@@ -64,13 +139,11 @@ def analyze_sales_by_month(cube_df: pd.DataFrame) -> pd.DataFrame:
         logger.error(f"Error analyzing sales by Month: {e}")
         raise
 
-def analyze_sales_by_month_name(cube_df: pd.DataFrame) -> pd.DataFrame:
+def analyze_sales_by_month_name(cube: Cube) -> pd.DataFrame:
     """Aggregate total sales by Month."""
     try:
-        # Group by Month (name) and sum the sales
-        sales_by_month_name = (
-            cube_df.groupby("MonthName")["sale_amount_usd_sum"].sum().reset_index()
-        )
+        # Roll up to Month (name) to sum the sales
+        sales_by_month_name = cube.rollup(["MonthName"])[["MonthName", "sale_amount_usd_sum"]]
         sales_by_month_name.rename(columns={"sale_amount_usd_sum": "TotalSales"}, inplace=True)
         sales_by_month_name.sort_values(by="TotalSales", inplace=True)
         logger.info("Sales aggregated by Month successfully.")
@@ -79,12 +152,11 @@ def analyze_sales_by_month_name(cube_df: pd.DataFrame) -> pd.DataFrame:
         logger.error(f"Error analyzing sales by Month: {e}")
         raise
 
-def analyze_sales_by_product_month(cube_df: pd.DataFrame) -> pd.DataFrame:
+def analyze_sales_by_product_month(cube: Cube) -> pd.DataFrame:
     """Identify the product with the highest revenue for each month."""
     try:
-        # Group by Month and product_id, sum the sales
-        top_products = (cube_df.groupby(["Month", "product_id"])["sale_amount_usd_sum"].sum().reset_index()
-        )
+        # Drill down from Month to Month and product_id, sum the sales
+        top_products = cube.drill_down(["Month"], "product_id")[["Month", "product_id", "sale_amount_usd_sum"]]
         top_products.rename(columns={"sale_amount_usd_sum": "TotalSales"}, inplace=True)
         top_products.sort_values(["Month", "TotalSales"], ascending=[True, False]).groupby("Month").head(1)
         logger.info("Top products identified for each month.")
@@ -115,101 +187,216 @@ def identify_most_profitable_month(sales_by_month: pd.DataFrame) -> str:
         logger.error(f"Error identifying most profitable month: {e}")
         raise
 
-def visualize_sales_by_month(sales_by_month: pd.DataFrame) -> None:
+def visualize_sales_by_month(sales_by_month: pd.DataFrame, output_path: pathlib.Path) -> None:
     """Visualize total sales by month."""
     try:
-        plt.figure(figsize=(10, 6))
-        plt.bar(
+        fig = Figure(figsize=(10, 6))
+        ax = fig.subplots()
+        ax.bar(
             sales_by_month["Month"],
             sales_by_month["TotalSales"],
             color="skyblue",
         )
-        plt.title("Total Sales by Month", fontsize=16)
-        plt.xlabel("Month", fontsize=12)
-        plt.ylabel("Total Sales (USD)", fontsize=12)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
+        ax.set_title("Total Sales by Month", fontsize=16)
+        ax.set_xlabel("Month", fontsize=12)
+        ax.set_ylabel("Total Sales (USD)", fontsize=12)
+        ax.tick_params(axis="x", labelrotation=45)
+        fig.tight_layout()
 
         # Save the visualization
-        output_path = RESULTS_OUTPUT_DIR.joinpath("sales_by_month.png")
-        plt.savefig(output_path)
+        fig.savefig(output_path)
         logger.info(f"Visualization saved to {output_path}.")
 
     except Exception as e:
         logger.error(f"Error visualizing sales by month: {e}")
         raise
 
-def visualize_sales_by_product_month(cube_df: pd.DataFrame) -> None:
+def pivot_sales_by_product_month(cube: Cube) -> pd.DataFrame:
+    """Pivot total sales to one row per Month and one column per product_id."""
+    # Pivot the data to organize sales by Month and ProductID
+    return cube.drill_down(["Month"], "product_id").pivot_table(
+        index="Month",
+        columns="product_id",
+        values="sale_amount_usd_sum",
+        aggfunc="sum",
+        fill_value=0
+    )
+
+def visualize_sales_by_product_month(sales_pivot: pd.DataFrame, output_path: pathlib.Path) -> None:
     """Visualize total sales by month, broken down by product."""
     try:
-        # Pivot the data to organize sales by Month and ProductID
-        sales_pivot = cube_df.pivot_table(
-            index="Month",
-            columns="product_id",
-            values="sale_amount_usd_sum",
-            aggfunc="sum",
-            fill_value=0
-        )
-
         # Plot the stacked bar chart
+        fig = Figure(figsize=(12, 8))
+        ax = fig.subplots()
         sales_pivot.plot(
             kind="bar",
             stacked=True,
-            figsize=(12, 8),
+            ax=ax,
             colormap="tab10"
         )
 
-        plt.title("Total Sales by Month and Product", fontsize=16)
-        plt.xlabel("Month", fontsize=12)
-        plt.ylabel("Total Sales (USD)", fontsize=12)
-        plt.xticks(rotation=45)
-        plt.legend(title="Product ID", bbox_to_anchor=(1.05, 1), loc="upper left")
-        plt.tight_layout()
+        ax.set_title("Total Sales by Month and Product", fontsize=16)
+        ax.set_xlabel("Month", fontsize=12)
+        ax.set_ylabel("Total Sales (USD)", fontsize=12)
+        ax.tick_params(axis="x", labelrotation=45)
+        ax.legend(title="Product ID", bbox_to_anchor=(1.05, 1), loc="upper left")
+        fig.tight_layout()
 
         # Save the visualization
-        output_path = RESULTS_OUTPUT_DIR.joinpath("sales_by_month_and_product.png")
-        plt.savefig(output_path)
+        fig.savefig(output_path)
         logger.info(f"Stacked bar chart saved to {output_path}.")
   
     except Exception as e:
         logger.error(f"Error visualizing sales by day and product: {e}")
         raise
 
+def code_fingerprint(code: types.CodeType) -> bytes:
+    """
+    Return the bytecode, names and constants of a function's code object, nested functions included.
+
+    Nothing in it depends on the file or module the code was loaded from, or on the
+    process: nested code objects are expanded instead of repr()'d with their address,
+    and frozensets (which iterate in hash order) are sorted.
+    """
+    parts = [code.co_code, repr(code.co_names).encode()]
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            parts.append(code_fingerprint(const))
+        elif isinstance(const, frozenset):
+            parts.append(repr(sorted(const, key=repr)).encode())
+        else:
+            parts.append(repr(const).encode())
+    return b"\0".join(parts)
+
+def chart_content_hash(chart: Chart) -> str:
+    """
+    Hash everything a chart is drawn from: its render function, columns, index and values.
+
+    The function is identified by its name and its code (see code_fingerprint()), not
+    its module, since that is __main__ when this script runs on its own and
+    scripts.olap.olap_goal_sales_by_month when imported. Editing a render function
+    therefore redraws its charts. Helpers it calls are not hashed.
+    """
+    digest = hashlib.sha256(chart.render.__qualname__.encode())
+    digest.update(code_fingerprint(chart.render.__code__))
+    digest.update(repr((list(chart.data.columns), list(chart.data.index.names), str(chart.data.dtypes.tolist()))).encode())
+    digest.update(pd.util.hash_pandas_object(chart.data, index=True).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+def render_chart(chart: Chart, output_path: pathlib.Path) -> float:
+    """Worker task: draw one chart to output_path on the Agg canvas. Returns seconds taken."""
+    start = time.perf_counter()
+    chart.render(chart.data, output_path)
+    return time.perf_counter() - start
+
+def render_charts(
+    charts: List[Chart],
+    output_dir: pathlib.Path = RESULTS_OUTPUT_DIR,
+    max_workers: Optional[int] = None,
+    force: bool = False,
+) -> List[str]:
+    """
+    Render a batch of charts headlessly, each in its own worker process.
+
+    A chart is skipped when its PNG exists and the content hash of its input
+    aggregates matches the one recorded in output_dir/CHART_HASHES_FILE when it was
+    last drawn. The record is replaced atomically, so an interrupted run leaves the
+    previous one intact. Charts are drawn on standalone Agg figures, never registered with
+    pyplot, so nothing is left open and nothing waits for a window.
+
+    Args:
+        charts (list): The charts to render.
+        output_dir (pathlib.Path): Folder for the PNG files and the hash record.
+        max_workers (int, optional): Worker processes. 1 renders in this process.
+            Defaults to one per chart, up to the CPU count.
+        force (bool): Render every chart even if its inputs are unchanged.
+
+    Returns:
+        list: File names of the charts rendered (not skipped).
+    """
+    try:
+        hashes_path = output_dir.joinpath(CHART_HASHES_FILE)
+        recorded = json.loads(hashes_path.read_text()) if hashes_path.exists() else {}
+        content_hashes = {chart.file_name: chart_content_hash(chart) for chart in charts}
+        stale = [
+            chart for chart in charts
+            if force or recorded.get(chart.file_name) != content_hashes[chart.file_name]
+            or not output_dir.joinpath(chart.file_name).exists()
+        ]
+        for chart in charts:
+            if chart not in stale:
+                logger.info(f"Chart {chart.file_name} is up to date; skipped.")
+        if not stale:
+            return []
+
+        max_workers = max_workers or min(len(stale), os.cpu_count() or 1)
+        if max_workers == 1:
+            seconds = [render_chart(chart, output_dir.joinpath(chart.file_name)) for chart in stale]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(render_chart, chart, output_dir.joinpath(chart.file_name)) for chart in stale]
+                seconds = [future.result() for future in futures]
+
+        for chart, chart_seconds in zip(stale, seconds):
+            recorded[chart.file_name] = content_hashes[chart.file_name]
+            logger.info(f"Chart {chart.file_name} rendered in {chart_seconds:.2f} s")
+        write_text_atomic(hashes_path, json.dumps(recorded, indent=2, sort_keys=True))
+        return [chart.file_name for chart in stale]
+    except Exception as e:
+        logger.error(f"Error rendering charts: {e}")
+        raise
+
 
+def analyze_monthly_sales(cube_df: pd.DataFrame, max_workers: Optional[int] = None, force: bool = False) -> List[str]:
+    """
+    Answer the monthly sales questions from the cube cells and render the charts.
 
-def main():
-    """Main function for analyzing and visualizing sales data."""
+    Args:
+        cube_df (pd.DataFrame): The monthly sales cube, loaded from disk or passed in
+            memory from the cubing step (see scripts/pipeline.py).
+        max_workers (int, optional): Chart rendering processes, as in render_charts().
+        force (bool): Render every chart even if its data is unchanged.
+
+    Returns:
+        list: File names of the charts rendered (not skipped).
+    """
     logger.info("Starting SALES_LOW_REVENUE_MONTH analysis...")
 
-    # Step 1: Load the precomputed OLAP cube
-    cube_df = load_olap_cube(CUBED_FILE)
+    # Step 1: Index the OLAP cube once for queries
+    cube = Cube(cube_df)
 
     # Step 2: Analyze total sales by MonthName
-    sales_by_month = analyze_sales_by_month_name(cube_df)
+    sales_by_month = analyze_sales_by_month_name(cube)
 
     # Step 3: Identify the least & most profitable month by name
     least_profitable_month = identify_least_profitable_month(sales_by_month)
     most_profitable_month = identify_most_profitable_month(sales_by_month)
-    logger.info("Close the Figure to complete this script.")
 
     # Step 4: Analyze total sales by Month
-    sales_by_month = analyze_sales_by_month(cube_df)
+    sales_by_month = analyze_sales_by_month(cube)
 
-    # Step 5: Visualize total sales by Month
-    visualize_sales_by_month(sales_by_month)
-    logger.info("Analysis and visualization completed successfully.")
-   
-    # Step 6: Analyze total sales by Product & Month
-    top_products = analyze_sales_by_product_month(cube_df)
+    # Step 5: Analyze total sales by Product & Month
+    top_products = analyze_sales_by_product_month(cube)
     logger.info("Analysis completed successfully.")
     print(top_products)
 
-    # Step 7: Visualize total sales by Product & Month
-    visualize_sales_by_product_month(cube_df)
+    # Step 6: Visualize total sales by Month, and by Product & Month, in parallel
+    charts = [
+        Chart("sales_by_month.png", visualize_sales_by_month, sales_by_month),
+        Chart("sales_by_month_and_product.png", visualize_sales_by_product_month, pivot_sales_by_product_month(cube)),
+    ]
+    rendered = render_charts(charts, max_workers=max_workers, force=force)
     logger.info("Analysis and visualization completed successfully.")
+    return rendered
 
-   # Step 8: Show Visualizes on screen
-    plt.show()
+def main(max_workers: Optional[int] = None, force: bool = False):
+    """Main function for analyzing and visualizing sales data."""
+    # Load the precomputed OLAP cube once, then answer every question from it
+    analyze_monthly_sales(load_olap_cube(CUBED_FILE), max_workers, force)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Analyze monthly sales from the OLAP cube and render the charts.")
+    parser.add_argument("--workers", type=int, default=None, help="Chart rendering processes (1 renders in this process).")
+    parser.add_argument("--force", action="store_true", help="Render every chart even if its data is unchanged.")
+    args = parser.parse_args()
+    main(args.workers, args.force)
\ No newline at end of file
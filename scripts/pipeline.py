@@ -0,0 +1,377 @@
+r"""
+Pipeline Runner
+File: scripts/pipeline.py
+
+Runs the whole chain, data prep -> warehouse load -> OLAP cubing -> monthly sales goal,
+as one asyncio DAG of stages instead of running the four scripts by hand, one after another.
+
+- Each stage runs in a worker thread as soon as the stages it depends on have finished,
+  so independent branches overlap: customers and products prep with the cleaning of
+  sales, and the two monthly sales cubes (cells with their sale IDs, grouping sets) with each other.
+- Results are passed between stages in memory. The warehouse load takes the prepared
+  frames from the prep stages (see etl_to_dw.frame_for_table()), and the goal stage
+  takes the cube from the cubing stage, instead of re-reading the files just written.
+  The files are still written, for the standalone scripts and for later runs.
+- A stage whose inputs have not changed since it last succeeded is skipped. Its key
+  hashes the contents of its input files (remembered next to their size and modification
+  time, so an untouched file is not read again), any other fingerprint it declares
+  (the sale table for the cube stages), and the keys of the stages it depends on.
+  Keys are kept in data/pipeline_state.json. A stage whose output files are missing always runs.
+- When the run ends, the critical path is logged: the chain of stages that set the
+  total time, next to the time the stages would have taken one after another.
+
+Stages share one process, so charts are rendered in the goal stage's thread by default
+rather than forking chart workers from a process that is running other stages.
+
+To run it, open a terminal in the root project folder.
+Activate the local project virtual environment.
+Choose the correct command for your OS to run this script.
+
+py scripts\pipeline.py
+py scripts\pipeline.py --history
+python3 scripts/pipeline.py --force --workers 4
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import pathlib
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+# Now we can import local modules
+from utils.logger import logger  # noqa: E402
+from scripts.data_prep import (  # noqa: E402
+    PREPARED_DATA_DIR,
+    RAW_DATA_DIR,
+    clean_sales_data,
+    finish_sales_data,
+    prepare_customers_data,
+    prepare_products_data,
+)
+from scripts.etl_to_dw import WAREHOUSE_MANIFESTS, load_data_to_db, manifest_hash  # noqa: E402
+from scripts.olap.olap_cubing import (  # noqa: E402
+    DB_PATH,
+    OLAP_OUTPUT_DIR,
+    build_monthly_sales_cube,
+    build_monthly_sales_grouping_sets,
+    sale_ids_fingerprint_path,
+    sale_table_fingerprint,
+)
+from scripts.olap.olap_goal_sales_by_month import (  # noqa: E402
+    CUBED_FILE,
+    RESULTS_OUTPUT_DIR,
+    SALE_IDS_FILE,
+    analyze_monthly_sales,
+    load_olap_cube,
+)
+
+# Constants
+PIPELINE_STATE_PATH: pathlib.Path = PROJECT_ROOT.joinpath("data").joinpath("pipeline_state.json")
+DIGEST_BLOCK_BYTES: int = 2**20  # Input files are hashed in blocks of this size
+
+
+class Stage(NamedTuple):
+    """One step of the pipeline, and what decides whether it has to run again."""
+    name: str
+    run: Callable[[Dict[str, Any]], Any]  # Called with the results of the stages in after, by name (None if skipped)
+    after: Tuple[str, ...] = ()
+    inputs: Tuple[pathlib.Path, ...] = ()  # Files whose contents are part of the stage's key
+    outputs: Tuple[pathlib.Path, ...] = ()  # Files the stage writes; if one is missing, the stage runs
+    fingerprint: Optional[Callable[[], str]] = None  # Any other input, e.g. the warehouse's sale table
+
+
+class StageTiming(NamedTuple):
+    """When a stage started and ended, in seconds since the pipeline started."""
+    name: str
+    start: float
+    end: float
+    skipped: bool
+
+
+class PipelineRun(NamedTuple):
+    """The result of every stage, and how long the run took."""
+    results: Dict[str, Any]
+    timings: Dict[str, StageTiming]
+    critical_path: List[StageTiming]
+    seconds: float
+
+
+def order_stages(stages: List[Stage]) -> List[Stage]:
+    """
+    Return the stages in an order where each stage comes after the stages it depends on.
+
+    Raises:
+        ValueError: If a stage depends on an unknown stage, or the dependencies form a cycle.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    ordered: List[Stage] = []
+    visiting: set = set()
+    placed: set = set()
+
+    def visit(stage: Stage) -> None:
+        if stage.name in placed:
+            return
+        if stage.name in visiting:
+            raise ValueError(f"Pipeline stages form a cycle through '{stage.name}'.")
+        visiting.add(stage.name)
+        for name in stage.after:
+            if name not in by_name:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{name}'.")
+            visit(by_name[name])
+        visiting.discard(stage.name)
+        placed.add(stage.name)
+        ordered.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return ordered
+
+def read_state(state_path: pathlib.Path) -> dict:
+    """Read the stage keys and file digests of earlier runs. A missing or damaged file starts afresh."""
+    try:
+        state = json.loads(state_path.read_text())
+    except (OSError, ValueError):
+        state = {}
+    return {"stages": state.get("stages", {}), "files": state.get("files", {})}
+
+def write_state(state_path: pathlib.Path, state: dict) -> None:
+    """Save the stage keys and file digests for the next run."""
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    state_path.write_text(json.dumps(state, indent=2, sort_keys=True))
+
+def file_digest(path: pathlib.Path, memo: Dict[str, list]) -> str:
+    """
+    Return a hash of a file's contents, or "missing" if it does not exist.
+
+    memo maps each file to [size, mtime_ns, digest] from earlier calls, so a file whose
+    size and modification time are unchanged is not read again.
+    """
+    if not path.exists():
+        return "missing"
+    stat = path.stat()
+    key = str(path.resolve())
+    remembered = memo.get(key)
+    if remembered and remembered[:2] == [stat.st_size, stat.st_mtime_ns]:
+        return remembered[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(DIGEST_BLOCK_BYTES):
+            digest.update(block)
+    memo[key] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()[:16]]
+    return memo[key][2]
+
+def stage_key(stage: Stage, upstream_keys: List[str], memo: Dict[str, list]) -> str:
+    """Hash everything a stage depends on: its input files, its fingerprint, and its upstream stages' keys."""
+    spec = {
+        "stage": stage.name,
+        "inputs": {str(path): file_digest(path, memo) for path in stage.inputs},
+        "fingerprint": stage.fingerprint() if stage.fingerprint else None,
+        "upstream": upstream_keys,
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+def find_critical_path(stages: List[Stage], timings: Dict[str, StageTiming]) -> List[StageTiming]:
+    """
+    Return the chain of stages that set the pipeline's total time.
+
+    Starts from the stage that ended last, and steps back each time to the upstream
+    stage that ended last, the one its start waited for.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    current = max(timings.values(), key=lambda timing: timing.end)
+    path = [current]
+    while by_name[current.name].after:
+        current = max((timings[name] for name in by_name[current.name].after), key=lambda timing: timing.end)
+        path.append(current)
+    return path[::-1]
+
+def report_timings(run: PipelineRun) -> None:
+    """Log each stage's time, the critical path, and the time saved by running stages concurrently."""
+    for timing in sorted(run.timings.values(), key=lambda timing: timing.start):
+        status = "skipped" if timing.skipped else f"{timing.end - timing.start:.2f} s"
+        logger.info(f"Stage {timing.name}: {timing.start:.2f} s -> {timing.end:.2f} s ({status})")
+    serial = sum(timing.end - timing.start for timing in run.timings.values())
+    path = " -> ".join(f"{timing.name} ({timing.end - timing.start:.2f} s)" for timing in run.critical_path)
+    logger.info(f"Critical path: {path}")
+    logger.info(f"Pipeline finished in {run.seconds:.2f} s; its stages took {serial:.2f} s in total")
+
+async def run_pipeline(
+    stages: List[Stage],
+    force: bool = False,
+    state_path: pathlib.Path = PIPELINE_STATE_PATH,
+    max_workers: Optional[int] = None,
+) -> PipelineRun:
+    """
+    Run a DAG of stages, each in a worker thread as soon as its upstream stages have finished.
+
+    A stage is skipped, and its result is None, when its key matches the key recorded
+    when it last succeeded and all its output files exist. If a stage fails, the stages
+    not yet started are cancelled and the error is raised once the running ones finish.
+    The keys of the stages that succeeded are saved either way.
+
+    Args:
+        stages (list): The stages to run.
+        force (bool): Run every stage even if its inputs are unchanged.
+        state_path (pathlib.Path): Where the stage keys are kept between runs.
+        max_workers (int, optional): Stages running at the same time. Defaults to ThreadPoolExecutor's default.
+
+    Returns:
+        PipelineRun: The result of every stage, the timings and the critical path.
+    """
+    ordered = order_stages(stages)
+    state = read_state(state_path)
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stage")
+    started = time.perf_counter()
+    keys: Dict[str, str] = {}
+    timings: Dict[str, StageTiming] = {}
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run_stage(stage: Stage) -> Any:
+        upstream = {name: await tasks[name] for name in stage.after}
+        begin = time.perf_counter() - started
+        key = await loop.run_in_executor(
+            executor, stage_key, stage, [keys[name] for name in stage.after], state["files"]
+        )
+        keys[stage.name] = key
+        skip = not force and state["stages"].get(stage.name) == key and all(path.exists() for path in stage.outputs)
+        if skip:
+            logger.info(f"Stage {stage.name}: inputs unchanged; skipped.")
+            result = None
+        else:
+            logger.info(f"Stage {stage.name}: started.")
+            result = await loop.run_in_executor(executor, stage.run, upstream)
+            state["stages"][stage.name] = key
+        timings[stage.name] = StageTiming(stage.name, begin, time.perf_counter() - started, skip)
+        return result
+
+    for stage in ordered:
+        tasks[stage.name] = asyncio.create_task(run_stage(stage))
+    try:
+        results = dict(zip(tasks, await asyncio.gather(*tasks.values())))
+    except Exception as e:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        logger.error(f"Pipeline stopped: {e}")
+        raise
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        write_state(state_path, state)
+
+    run = PipelineRun(results, timings, find_critical_path(ordered, timings), time.perf_counter() - started)
+    report_timings(run)
+    return run
+
+def run_once(function: Callable[[], str]) -> Callable[[], str]:
+    """Wrap a fingerprint so that stages asking for it at the same time compute it only once."""
+    lock = threading.Lock()
+    memo: List[str] = []
+
+    def wrapper() -> str:
+        with lock:
+            if not memo:
+                memo.append(function())
+            return memo[0]
+    return wrapper
+
+def build_stages(incremental: bool = False, history: bool = False, chart_workers: int = 1, force: bool = False) -> List[Stage]:
+    """
+    Return the stages of the smart_sales pipeline: prep, warehouse load, cubes and the monthly sales goal.
+
+    Args:
+        incremental (bool): Upsert new and changed rows instead of reloading the warehouse.
+        history (bool): Drop sales already prepared in an earlier run (see data_prep.py --history).
+            Implies incremental, as only the new sales are handed to the load in memory.
+        chart_workers (int): Chart rendering processes in the goal stage (1 renders in its thread).
+        force (bool): Render every chart even if its data is unchanged.
+    """
+    incremental = incremental or history
+    manifest = WAREHOUSE_MANIFESTS["smart_sales"]
+    customers_file = PREPARED_DATA_DIR.joinpath("customers_data_prepared.csv")
+    products_file = PREPARED_DATA_DIR.joinpath("products_data_prepared.csv")
+    sales_file = PREPARED_DATA_DIR.joinpath("sales_data_prepared.csv")
+    # Every cube stage starts after the load, so they can share one fingerprint of the sale table
+    warehouse_fingerprint = run_once(lambda: sale_table_fingerprint(DB_PATH))
+
+    def finish_sales(upstream: Dict[str, Any]) -> pd.DataFrame:
+        # A skipped stage hands over nothing, so fall back to its file, or clean the sales again
+        df_customers = upstream["prep_customers"]
+        df_products = upstream["prep_products"]
+        df_sales = upstream["clean_sales"]
+        return finish_sales_data(
+            clean_sales_data() if df_sales is None else df_sales,
+            pd.read_csv(customers_file, usecols=["CustomerID"]) if df_customers is None else df_customers,
+            pd.read_csv(products_file, usecols=["ProductID"]) if df_products is None else df_products,
+            history,
+        )
+
+    def load_warehouse(upstream: Dict[str, Any]) -> None:
+        frames = {
+            "customer": upstream["prep_customers"],
+            "product": upstream["prep_products"],
+            "sale": upstream["finish_sales"],
+        }
+        load_data_to_db(incremental, manifest, {table: df for table, df in frames.items() if df is not None})
+
+    def goal_sales_by_month(upstream: Dict[str, Any]) -> List[str]:
+        cube_df = upstream["cube_monthly"]
+        return analyze_monthly_sales(load_olap_cube(CUBED_FILE) if cube_df is None else cube_df, chart_workers, force)
+
+    return [
+        Stage("prep_customers", lambda upstream: prepare_customers_data(),
+              inputs=(RAW_DATA_DIR.joinpath("customers_data.csv"),), outputs=(customers_file,)),
+        Stage("prep_products", lambda upstream: prepare_products_data(),
+              inputs=(RAW_DATA_DIR.joinpath("products_data.csv"),), outputs=(products_file,)),
+        Stage("clean_sales", lambda upstream: clean_sales_data(),
+              inputs=(RAW_DATA_DIR.joinpath("sales_data.csv"),)),
+        Stage("finish_sales", finish_sales, after=("clean_sales", "prep_customers", "prep_products"),
+              outputs=(sales_file,)),
+        Stage("load_warehouse", load_warehouse, after=("prep_customers", "prep_products", "finish_sales"),
+              inputs=(customers_file, products_file, sales_file), outputs=(manifest.db_path,),
+              fingerprint=lambda: manifest_hash(manifest)),
+        Stage("cube_monthly", lambda upstream: build_monthly_sales_cube(), after=("load_warehouse",),
+              outputs=(CUBED_FILE, CUBED_FILE.with_suffix(".npcube"), SALE_IDS_FILE, sale_ids_fingerprint_path(SALE_IDS_FILE)),
+              fingerprint=warehouse_fingerprint),
+        Stage("cube_grouping_sets", lambda upstream: build_monthly_sales_grouping_sets(), after=("load_warehouse",),
+              outputs=(OLAP_OUTPUT_DIR.joinpath("monthlysales_olap_cube_grouping_sets.csv"),),
+              fingerprint=warehouse_fingerprint),
+        Stage("goal_sales_by_month", goal_sales_by_month, after=("cube_monthly",),
+              outputs=(RESULTS_OUTPUT_DIR.joinpath("sales_by_month.png"),
+                       RESULTS_OUTPUT_DIR.joinpath("sales_by_month_and_product.png"))),
+    ]
+
+def main() -> None:
+    """Run the smart_sales pipeline from raw files to goal charts."""
+    parser = argparse.ArgumentParser(description="Run prep, warehouse load, cubing and the monthly sales goal as one pipeline.")
+    parser.add_argument("--force", action="store_true", help="Run every stage even if its inputs are unchanged.")
+    parser.add_argument("--incremental", action="store_true", help="Upsert new and changed rows into the warehouse.")
+    parser.add_argument("--history", action="store_true", help="Drop sales already prepared in an earlier run (implies --incremental).")
+    parser.add_argument("--workers", type=int, default=None, help="Stages running at the same time.")
+    parser.add_argument("--chart-workers", type=int, default=1, help="Chart rendering processes (1 renders in the stage's thread).")
+    args = parser.parse_args()
+
+    logger.info("======================")
+    logger.info("STARTING pipeline.py")
+    logger.info("======================")
+
+    stages = build_stages(args.incremental, args.history, args.chart_workers, args.force)
+    asyncio.run(run_pipeline(stages, force=args.force, max_workers=args.workers))
+
+    logger.info("======================")
+    logger.info("FINISHED pipeline.py")
+    logger.info("======================")
+
+if __name__ == "__main__":
+    main()
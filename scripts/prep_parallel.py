@@ -0,0 +1,354 @@
+r"""
+Parallel Data Preparation Driver
+File: scripts/prep_parallel.py
+
+Runs the per-table prep jobs of scripts/data_prep.py (and of the P7 deployment,
+P7/scripts/prepare_*_data_P7.py) concurrently in a process pool, instead of one
+table after another or one process per script.
+
+Large raw files (sales) are also split into byte-range shards on line boundaries.
+Each shard is cleaned in its own worker and written as a part file, along with the
+sorted 64-bit hashes of its cleaned rows. The parent merges those sorted runs once to
+find the rows an earlier shard already holds, the workers drop them from their parts,
+and the parts are concatenated in file order, so the output matches cleaning the
+whole file at once (prepare_whole_file()).
+
+Raw values are read as text, except the categoricals in RAW_DTYPES, so a column is
+parsed the same way in every shard whatever values happen to fall in it, and numbers
+are written back exactly as they were read. Unlike scripts/data_prep.py, the jobs do
+not run DataScrubber.optimize_dtypes(), which only changes how columns are held in
+memory, or the before-cleaning profile, which only reports counts. The checks after
+cleaning run as in data_prep.py's streaming mode.
+
+Jobs with foreign keys (sales) always run in shards, even a single one. Their shards
+are cleaned alongside the other jobs; once those have written the customers and
+products files, each shard worker loads their key columns and checks its own rows,
+as in scripts/data_prep.py, writing sales with unknown keys to a shard-local
+quarantine part. The parts are concatenated into the quarantine file.
+
+NOTE: Shards are cut at newlines, so raw files must not hold quoted multi-line values.
+
+Per-job timings are logged through utils.logger.
+
+To run it, open a terminal in the root project folder.
+Activate the local project virtual environment.
+Choose the correct command for your OS to run this script.
+
+py scripts\prep_parallel.py
+py scripts\prep_parallel.py --deployment all --workers 8 --shard-mb 64
+python3 scripts/prep_parallel.py --deployment p7
+"""
+
+import argparse
+import io
+from collections import defaultdict
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+# Now we can import local modules
+from utils.logger import logger  # noqa: E402
+from scripts.data_scrubber import DataScrubber  # noqa: E402
+from scripts.data_prep import (  # noqa: E402
+    PREPARED_DATA_DIR,
+    RAW_DATA_DIR,
+    RAW_DTYPES,
+    SALES_FOREIGN_KEYS,
+    SALES_ORPHANS_PATH,
+    clean_customers_chunk,
+    clean_products_chunk,
+    clean_sales_chunk,
+    hash_rows,
+    load_key_indexes,
+)
+from P7.scripts.prepare_customers_data_P7 import clean_customers_data as clean_customers_data_p7  # noqa: E402
+from P7.scripts.prepare_products_data_P7 import clean_products_data as clean_products_data_p7  # noqa: E402
+from P7.scripts.prepare_sales_data_P7 import FOREIGN_KEYS as SALES_FOREIGN_KEYS_P7  # noqa: E402
+from P7.scripts.prepare_sales_data_P7 import ORPHANS_PATH as SALES_ORPHANS_PATH_P7  # noqa: E402
+from P7.scripts.prepare_sales_data_P7 import clean_sales_data as clean_sales_data_p7  # noqa: E402
+
+# Constants
+P7_DATA_DIR: pathlib.Path = PROJECT_ROOT.joinpath("P7").joinpath("data")
+SHARD_BYTES: int = 64 * 2**20  # Files larger than this are cleaned in byte-range shards
+
+
+class PrepJob(NamedTuple):
+    """One raw file to clean, and where to write it."""
+    name: str
+    raw_path: pathlib.Path
+    prepared_path: pathlib.Path
+    clean: Callable[[pd.DataFrame], pd.DataFrame]
+    foreign_keys: Optional[Dict[str, Tuple[pathlib.Path, str]]] = None  # Checked once the other jobs have finished
+    quarantine_path: Optional[pathlib.Path] = None
+
+
+# Workers receive the cleaning function by reference, so it must be a module-level function
+def clean_customers(df: pd.DataFrame) -> pd.DataFrame:
+    return clean_customers_chunk(df, set())
+
+def clean_products(df: pd.DataFrame) -> pd.DataFrame:
+    return clean_products_chunk(df, set())
+
+def clean_sales(df: pd.DataFrame) -> pd.DataFrame:
+    return clean_sales_chunk(df, set())
+
+
+PREP_JOBS: Dict[str, List[PrepJob]] = {
+    "smart_sales": [
+        PrepJob("customers", RAW_DATA_DIR.joinpath("customers_data.csv"),
+                PREPARED_DATA_DIR.joinpath("customers_data_prepared.csv"), clean_customers),
+        PrepJob("products", RAW_DATA_DIR.joinpath("products_data.csv"),
+                PREPARED_DATA_DIR.joinpath("products_data_prepared.csv"), clean_products),
+        PrepJob("sales", RAW_DATA_DIR.joinpath("sales_data.csv"),
+                PREPARED_DATA_DIR.joinpath("sales_data_prepared.csv"), clean_sales,
+                SALES_FOREIGN_KEYS, SALES_ORPHANS_PATH),
+    ],
+    "p7": [
+        PrepJob("customers_P7", P7_DATA_DIR.joinpath("customers_data_P7.csv"),
+                P7_DATA_DIR.joinpath("customers_data_P7_prepared.csv"), clean_customers_data_p7),
+        PrepJob("products_P7", P7_DATA_DIR.joinpath("products_data_P7.csv"),
+                P7_DATA_DIR.joinpath("products_data_P7_prepared.csv"), clean_products_data_p7),
+        PrepJob("sales_P7", P7_DATA_DIR.joinpath("sales_data_P7.csv"),
+                P7_DATA_DIR.joinpath("sales_data_P7_prepared.csv"), clean_sales_data_p7,
+                SALES_FOREIGN_KEYS_P7, SALES_ORPHANS_PATH_P7),
+    ],
+}
+
+def split_into_shards(file_path: pathlib.Path, shard_bytes: int) -> Tuple[bytes, List[Tuple[int, int]]]:
+    """
+    Split a CSV file into byte ranges of about shard_bytes that start and end on line boundaries.
+
+    Parameters:
+        file_path (pathlib.Path): The CSV file, with a header line.
+        shard_bytes (int): Target size of each shard.
+
+    Returns:
+        tuple: (header line, list of (start, stop) byte offsets covering every data line once).
+    """
+    size = file_path.stat().st_size
+    with open(file_path, "rb") as f:
+        header = f.readline()
+        boundaries = [f.tell()]
+        for offset in range(boundaries[0] + shard_bytes, size, shard_bytes):
+            f.seek(max(offset, boundaries[-1]))
+            f.readline()  # Move to the start of the next line
+            if f.tell() >= size:
+                break
+            if f.tell() > boundaries[-1]:
+                boundaries.append(f.tell())
+        boundaries.append(size)
+    return header, [(start, stop) for start, stop in zip(boundaries, boundaries[1:]) if stop > start]
+
+def read_raw_text(job: PrepJob, source: Union[pathlib.Path, io.BytesIO]) -> pd.DataFrame:
+    """Read raw rows of a job's file with every column as text, except the categoricals in RAW_DTYPES."""
+    return pd.read_csv(source, dtype=defaultdict(lambda: "str", RAW_DTYPES.get(job.raw_path.name, {})))
+
+def clean_and_hash(job: PrepJob, df: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Clean raw rows, drop rows that are duplicates once cleaned, and return them with their row hashes."""
+    cleaned = job.clean(df)
+    row_hashes = hash_rows(cleaned)
+    keep = ~row_hashes.duplicated()
+    return cleaned[keep], row_hashes[keep].to_numpy()
+
+def prepare_whole_file(job: PrepJob) -> Tuple[int, float]:
+    """Clean one raw file in a worker and write the prepared file. Returns (rows, seconds)."""
+    start = time.perf_counter()
+    cleaned, _ = clean_and_hash(job, read_raw_text(job, job.raw_path))
+    cleaned.to_csv(job.prepared_path, index=False)
+    return len(cleaned), time.perf_counter() - start
+
+def prepare_shard(
+    job: PrepJob, header: bytes, start: int, stop: int, part_path: pathlib.Path
+) -> Tuple[np.ndarray, np.ndarray, List[str], float]:
+    """
+    Clean the lines in [start, stop) of the raw file and write them, without a header, to part_path.
+
+    Returns:
+        tuple: (sorted hashes of the cleaned rows written, the row number of each sorted hash,
+            output column names, seconds).
+    """
+    began = time.perf_counter()
+    with open(job.raw_path, "rb") as f:
+        f.seek(start)
+        data = f.read(stop - start)
+    cleaned, row_hashes = clean_and_hash(job, read_raw_text(job, io.BytesIO(header + data)))
+    cleaned.to_csv(part_path, header=False, index=False)
+    order = np.argsort(row_hashes, kind="stable")
+    return row_hashes[order], order, list(cleaned.columns), time.perf_counter() - began
+
+def find_cross_shard_duplicates(sorted_hashes: List[np.ndarray], row_numbers: List[np.ndarray]) -> List[np.ndarray]:
+    """
+    Find the rows of each shard that an earlier shard already holds.
+
+    Each shard's hashes arrive sorted and unique, so one stable sort of their
+    concatenation is a k-way merge of the runs (timsort merges presorted runs), done
+    once for the whole file. Equal hashes keep shard order, so the first of each
+    group is the row to keep.
+
+    Parameters:
+        sorted_hashes (list): Per shard, in file order, the sorted hashes of its rows.
+        row_numbers (list): Per shard, the row number in the part file of each sorted hash.
+
+    Returns:
+        list: Per shard, a boolean array in row order, True where the row is a duplicate.
+    """
+    merged_order = np.argsort(np.concatenate(sorted_hashes), kind="stable")
+    merged = np.concatenate(sorted_hashes)[merged_order]
+    repeated = np.zeros(len(merged), dtype=bool)
+    repeated[merged_order[1:]] = merged[1:] == merged[:-1]
+
+    duplicates = []
+    for repeated_in_shard, rows in zip(np.split(repeated, np.cumsum([len(run) for run in sorted_hashes])[:-1]), row_numbers):
+        duplicate = np.zeros(len(rows), dtype=bool)
+        duplicate[rows] = repeated_in_shard
+        duplicates.append(duplicate)
+    return duplicates
+
+def finish_shard(job: PrepJob, part_path: pathlib.Path, columns: List[str], duplicate: np.ndarray) -> Tuple[int, int]:
+    """
+    Rewrite a part file without its duplicate rows and, for a job with foreign keys, its orphans.
+
+    Values are read as text, so the rows kept are written back as they were, except
+    foreign keys, which are written as integers. The orphans go to a quarantine part
+    next to part_path, without a header (see quarantine_part_path()).
+
+    Returns:
+        tuple: (rows kept, orphan rows).
+    """
+    if not len(duplicate):  # Every row of the shard was dropped while cleaning
+        quarantine_part_path(part_path).write_bytes(b"")
+        return 0, 0
+    part = pd.read_csv(part_path, header=None, names=columns, dtype=str, keep_default_na=False, na_values=[""])
+    part = part[~duplicate]
+    orphans = part.iloc[:0]
+    if job.foreign_keys:
+        # Loaded in the worker, from the dimension files the other jobs have just written
+        part, orphans = DataScrubber(part).split_foreign_key_orphans(load_key_indexes(job.foreign_keys))
+        orphans.to_csv(quarantine_part_path(part_path), header=False, index=False)
+    part.to_csv(part_path, header=False, index=False)
+    return len(part), len(orphans)
+
+def quarantine_part_path(part_path: pathlib.Path) -> pathlib.Path:
+    return part_path.with_suffix(".orphans.csv")
+
+def merge_quarantine_parts(job: PrepJob, columns: List[str], part_paths: List[pathlib.Path], orphans: int) -> None:
+    """
+    Concatenate the shards' quarantine parts into the job's quarantine file.
+
+    As in scripts/data_prep.py, the file only ever holds the current run's orphans,
+    so a run without any removes the previous run's file.
+    """
+    if job.quarantine_path.exists():
+        job.quarantine_path.unlink()
+    if orphans:
+        job.quarantine_path.parent.mkdir(parents=True, exist_ok=True)
+        merge_shards(job.quarantine_path, columns + ["OrphanKeys"], [quarantine_part_path(path) for path in part_paths])
+        logger.warning(f"{orphans} rows with unknown foreign keys moved to {job.quarantine_path}")
+
+def merge_shards(file_path: pathlib.Path, columns: List[str], part_paths: List[pathlib.Path]) -> None:
+    """Concatenate the finished part files in file order, byte for byte, under one header line."""
+    with open(file_path, "wb") as out:
+        out.write((",".join(columns) + "\n").encode())
+        for part_path in part_paths:
+            with open(part_path, "rb") as part_file:
+                shutil.copyfileobj(part_file, out)
+
+def run_prep_jobs(jobs: List[PrepJob], max_workers: Optional[int] = None, shard_bytes: int = SHARD_BYTES) -> Dict[str, int]:
+    """
+    Run prep jobs concurrently in a process pool. Files larger than shard_bytes are sharded.
+
+    Parameters:
+        jobs (list): The prep jobs to run.
+        max_workers (int, optional): Number of worker processes. Defaults to the CPU count.
+        shard_bytes (int): Shard size for large files.
+
+    Returns:
+        dict: Rows written per job name.
+    """
+    started = time.perf_counter()
+    rows_by_job: Dict[str, int] = {}
+    with tempfile.TemporaryDirectory() as tmp, ProcessPoolExecutor(max_workers=max_workers) as executor:
+        whole_files: Dict[str, Future] = {}
+        sharded: Dict[str, Tuple[PrepJob, List[pathlib.Path], List[Future]]] = {}
+
+        # Submit every whole-file job and every shard first, so they all share the pool
+        for job in jobs:
+            if job.raw_path.stat().st_size <= shard_bytes and not job.foreign_keys:
+                whole_files[job.name] = executor.submit(prepare_whole_file, job)
+                continue
+            header, ranges = split_into_shards(job.raw_path, shard_bytes)
+            part_paths = [pathlib.Path(tmp).joinpath(f"{job.name}_{i:05d}.csv") for i in range(len(ranges))]
+            futures = [
+                executor.submit(prepare_shard, job, header, start, stop, part_path)
+                for (start, stop), part_path in zip(ranges, part_paths)
+            ]
+            sharded[job.name] = (job, part_paths, futures)
+            logger.info(f"Prep job {job.name}: {job.raw_path} split into {len(ranges)} shards.")
+
+        for name, future in whole_files.items():
+            rows, seconds = future.result()
+            rows_by_job[name] = rows
+            logger.info(f"Prep job {name}: {rows} rows in {seconds:.2f} s")
+
+        # Dimension jobs first: facts are checked against the files they write
+        for name, (job, part_paths, futures) in sorted(sharded.items(), key=lambda item: bool(item[1][0].foreign_keys)):
+            results = [future.result() for future in futures]
+            merge_start = time.perf_counter()
+            columns = results[0][2]
+            duplicates = find_cross_shard_duplicates([hashes for hashes, _, _, _ in results], [rows for _, rows, _, _ in results])
+            # Parts holding duplicates or foreign keys are finished by the workers; the rest are already final
+            finishing = {
+                i: executor.submit(finish_shard, job, part_path, columns, duplicate)
+                for i, (part_path, duplicate) in enumerate(zip(part_paths, duplicates))
+                if duplicate.any() or job.foreign_keys
+            }
+            counts = [finishing[i].result() if i in finishing else (len(duplicate), 0) for i, duplicate in enumerate(duplicates)]
+            merge_shards(job.prepared_path, columns, part_paths)
+            if job.foreign_keys:
+                merge_quarantine_parts(job, columns, part_paths, sum(orphans for _, orphans in counts))
+            rows = sum(kept for kept, _ in counts)
+            rows_by_job[name] = rows
+            shard_seconds = [seconds for _, _, _, seconds in results]
+            logger.info(
+                f"Prep job {name}: {rows} rows from {len(results)} shards "
+                f"(slowest shard {max(shard_seconds):.2f} s, total {sum(shard_seconds):.2f} s), "
+                f"{len(finishing)} parts finished and merged in {time.perf_counter() - merge_start:.2f} s"
+            )
+
+    logger.info(f"Ran {len(jobs)} prep jobs in {time.perf_counter() - started:.2f} s")
+    return rows_by_job
+
+def main() -> None:
+    """Prepare the raw files of one or both deployments in parallel."""
+    parser = argparse.ArgumentParser(description="Prepare raw data files in parallel.")
+    parser.add_argument("--deployment", choices=[*PREP_JOBS, "all"], default="smart_sales")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes.")
+    parser.add_argument("--shard-mb", type=float, default=SHARD_BYTES / 2**20, help="Shard size for large files, in MiB.")
+    args = parser.parse_args()
+
+    logger.info("======================")
+    logger.info("STARTING prep_parallel.py")
+    logger.info("======================")
+
+    deployments = list(PREP_JOBS) if args.deployment == "all" else [args.deployment]
+    jobs = [job for deployment in deployments for job in PREP_JOBS[deployment]]
+    run_prep_jobs(jobs, max_workers=args.workers, shard_bytes=int(args.shard_mb * 2**20))
+
+    logger.info("======================")
+    logger.info("FINISHED prep_parallel.py")
+    logger.info("======================")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Warehouse access layer
+File: scripts/warehouse.py
+
+Shared SQLite connections for the data warehouse, so cube and goal jobs can read
+while a load is writing without "database is locked" errors.
+
+- The warehouse runs in WAL mode. Readers see the last committed state and never
+  wait on the writer, and the writer never waits on readers.
+- Readers use read-only URI connections (mode=ro), taken from a per-database pool
+  and handed back after use instead of being opened and closed on every call.
+- Every connection has a busy timeout, for the moments SQLite still needs a lock
+  (a checkpoint, or two writers).
+- read_snapshot() holds one read transaction, so several queries see the same
+  committed state even if a load commits in between.
+
+Each load records a new row in etl_load_log (see scripts/etl_to_dw.py), and
+warehouse_generation() reads it. Readers in different processes cannot share
+one SQLite snapshot. They can compare generations to tell that they saw the same one.
+"""
+
+import atexit
+import os
+import pathlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Constants
+BUSY_TIMEOUT_SECONDS: float = 30.0  # How long a connection waits for a lock before "database is locked"
+POOL_MAX_IDLE: int = 4  # Idle connections kept per database; extra ones are closed on release
+
+
+def connect_reader(db_path: pathlib.Path) -> sqlite3.Connection:
+    """
+    Open a read-only connection to a warehouse through a mode=ro URI.
+
+    isolation_level=None leaves transactions to the caller (see read_snapshot()), and
+    check_same_thread=False lets a pooled connection be reused by another thread.
+    """
+    uri = f"file:{pathlib.Path(db_path).resolve().as_posix()}?mode=ro"
+    return sqlite3.connect(
+        uri, uri=True, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None, check_same_thread=False
+    )
+
+def connect_writer(db_path: pathlib.Path, isolation_level: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Open a writable connection to a warehouse and switch the database to WAL mode.
+
+    WAL mode is stored in the database file, so it stays on for every later connection.
+    """
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=isolation_level)
+    conn.execute("PRAGMA journal_mode = WAL")
+    return conn
+
+
+class ConnectionPool:
+    """
+    A pool of read-only connections to one warehouse database.
+
+    Connections are taken with connection() and returned when the with block ends,
+    with any open transaction rolled back. Connections never cross a fork: a child
+    process starts with an empty pool.
+    """
+
+    def __init__(self, db_path: pathlib.Path, max_idle: int = POOL_MAX_IDLE):
+        self.db_path = pathlib.Path(db_path).resolve()
+        self.max_idle = max_idle
+        self._idle: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._idle, self._pid = [], os.getpid()  # The parent's connections are not ours to use
+            if self._idle:
+                return self._idle.pop()
+        return connect_reader(self.db_path)
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if self._pid == os.getpid() and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Lend a read-only connection for the duration of a with block."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def close(self) -> None:
+        """Close every idle connection (connections lent out are closed when returned)."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_POOLS: Dict[str, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+def get_pool(db_path: pathlib.Path) -> ConnectionPool:
+    """Return the shared read-only connection pool for a warehouse database."""
+    key = str(pathlib.Path(db_path).resolve())
+    with _POOLS_LOCK:
+        if key not in _POOLS:
+            _POOLS[key] = ConnectionPool(pathlib.Path(key))
+        return _POOLS[key]
+
+def close_pools() -> None:
+    """Close the idle connections of every pool, e.g. before deleting or replacing a database file."""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.close()
+
+atexit.register(close_pools)
+
+@contextmanager
+def reader(db_path: pathlib.Path) -> Iterator[sqlite3.Connection]:
+    """Lend a pooled read-only connection to a warehouse. Each statement sees the latest commit."""
+    with get_pool(db_path).connection() as conn:
+        yield conn
+
+@contextmanager
+def read_snapshot(db_path: pathlib.Path) -> Iterator[sqlite3.Connection]:
+    """
+    Lend a pooled read-only connection inside one read transaction.
+
+    Every query in the with block sees the warehouse as it was at the first read,
+    whatever a concurrent load commits meanwhile.
+    """
+    with reader(db_path) as conn:
+        conn.execute("BEGIN")
+        try:
+            conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()  # The first read fixes the snapshot
+            yield conn
+        finally:
+            conn.rollback()
+
+def warehouse_generation(conn: sqlite3.Connection) -> Optional[int]:
+    """Return the number of the last load recorded in etl_load_log, or None if the warehouse has no load log."""
+    try:
+        (generation,) = conn.execute("SELECT MAX(generation) FROM etl_load_log").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return generation
+
+def table_columns(conn: sqlite3.Connection, table: str) -> Tuple[str, ...]:
+    """Return the column names of a table, or an empty tuple if it does not exist."""
+    return tuple(row[1] for row in conn.execute(f"PRAGMA table_info({table})"))
@@ -0,0 +1,216 @@
+r"""
+tests/test_data_prep.py
+
+To run, open a terminal in the root project folder.
+Activate your virtual environment if needed, and run one of the following commands:
+
+    py tests\test_data_prep.py
+    python3 tests\test_data_prep.py
+
+This test suite verifies the streaming helpers in scripts/data_prep.py, that streaming
+prep writes the same prepared files as the in-memory prep, and that sales prepared
+over several --history runs all reach the warehouse.
+"""
+
+import unittest
+import pathlib
+import shutil
+import sqlite3
+import sys
+import tempfile
+from unittest import mock
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+import scripts.data_prep as data_prep  # noqa: E402
+from scripts.data_prep import drop_duplicates_across_chunks, enforce_foreign_keys, finish_sales_data  # noqa: E402
+from scripts.data_scrubber import KeyIndex  # noqa: E402
+from scripts.etl_to_dw import WAREHOUSE_MANIFESTS, load_data_to_db  # noqa: E402
+from scripts.warehouse import close_pools  # noqa: E402
+
+
+class TestStreamingDataPrep(unittest.TestCase):
+
+    def test_drop_duplicates_across_chunks(self):
+        """Duplicates are removed within a chunk and against earlier chunks."""
+        seen_hashes = set()
+        chunk_1 = pd.DataFrame({"ID": [1, 2, 2], "Name": ["a", "b", "b"]})
+        chunk_2 = pd.DataFrame({"ID": [2, 3], "Name": ["b", "c"]})
+        kept_1 = drop_duplicates_across_chunks(chunk_1, seen_hashes)
+        kept_2 = drop_duplicates_across_chunks(chunk_2, seen_hashes)
+        self.assertEqual(kept_1["ID"].tolist(), [1, 2])
+        self.assertEqual(kept_2["ID"].tolist(), [3])
+
+    def test_drop_duplicates_across_chunks_int_and_float(self):
+        """A row parsed as int in one chunk and float in another is still a duplicate."""
+        seen_hashes = set()
+        drop_duplicates_across_chunks(pd.DataFrame({"ID": [1008], "Amount": [5]}), seen_hashes)
+        kept = drop_duplicates_across_chunks(pd.DataFrame({"ID": [1008.0, None], "Amount": [5, 6]}), seen_hashes)
+        self.assertEqual(len(kept), 1)
+
+    def test_enforce_foreign_keys_quarantines_orphans(self):
+        """Orphans of every chunk of a run are appended to one quarantine file, replaced by the next run."""
+        references = {"CustomerID": KeyIndex(pd.Series([1001, 1002]))}
+        with tempfile.TemporaryDirectory() as tmp:
+            quarantine_path = pathlib.Path(tmp).joinpath("quarantine").joinpath("orphans.csv")
+            chunk_1 = pd.DataFrame({"TransactionID": [1, 2], "CustomerID": [1001.0, 1999.0]})
+            chunk_2 = pd.DataFrame({"TransactionID": [3, 4], "CustomerID": ["1002.0", "Unknown"]})
+            kept_1 = enforce_foreign_keys(chunk_1, references, quarantine_path)
+            kept_2 = enforce_foreign_keys(chunk_2, references, quarantine_path, append=True)
+            self.assertEqual(kept_1["CustomerID"].tolist() + kept_2["CustomerID"].tolist(), [1001, 1002])
+            self.assertEqual(pd.read_csv(quarantine_path)["TransactionID"].tolist(), [2, 4])
+
+            enforce_foreign_keys(chunk_1.iloc[:1], references, quarantine_path)
+            self.assertFalse(quarantine_path.exists(), "A clean run should remove the old quarantine file")
+
+    def test_history_runs_keep_every_sale_for_a_full_reload(self):
+        """Two --history runs with overlapping sales, then one full reload, load each sale once."""
+        manifest = WAREHOUSE_MANIFESTS["smart_sales"]
+        source_dir = PROJECT_ROOT.joinpath(manifest.prepared_dir)
+        sales = pd.read_csv(source_dir.joinpath("sales_data_prepared.csv"))
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = pathlib.Path(tmp)
+            prepared_dir = tmp_path.joinpath("prepared")
+            prepared_dir.mkdir()
+            for file_name in ("customers_data_prepared.csv", "products_data_prepared.csv"):
+                shutil.copy(source_dir.joinpath(file_name), prepared_dir)
+            customers = pd.read_csv(prepared_dir.joinpath("customers_data_prepared.csv"))
+            products = pd.read_csv(prepared_dir.joinpath("products_data_prepared.csv"))
+
+            with mock.patch.object(data_prep, "PREPARED_DATA_DIR", prepared_dir), \
+                    mock.patch.object(data_prep, "SALES_FINGERPRINTS_DIR", tmp_path.joinpath("fingerprints")), \
+                    mock.patch.object(data_prep, "SALES_ORPHANS_PATH", tmp_path.joinpath("orphans.csv")):
+                first = finish_sales_data(sales.iloc[:20], customers, products, history=True)
+                second = finish_sales_data(sales.iloc[10:30], customers, products, history=True)
+            self.assertEqual(len(first), 20)
+            self.assertEqual(second["TransactionID"].tolist(), sales["TransactionID"].iloc[20:30].tolist())
+            prepared = pd.read_csv(prepared_dir.joinpath("sales_data_prepared.csv"))
+            self.assertEqual(prepared["TransactionID"].tolist(), sales["TransactionID"].iloc[:30].tolist())
+
+            db_path = tmp_path.joinpath("smart_sales.db")
+            load_data_to_db(manifest=manifest._replace(db_path=db_path, prepared_dir=prepared_dir))
+            conn = sqlite3.connect(db_path)
+            loaded = pd.read_sql_query("SELECT sale_id FROM sale ORDER BY sale_id", conn)["sale_id"].tolist()
+            conn.close()
+            close_pools()
+        self.assertEqual(loaded, sorted(sales["TransactionID"].iloc[:30]))
+
+    def test_history_store_is_seeded_once_and_written_after_the_append(self):
+        """The prepared file is read once to seed the store, and a failed append marks nothing as seen."""
+        sales = pd.DataFrame({"TransactionID": range(1, 11), "CustomerID": 1001, "ProductID": 101, "SaleAmount": 9.5})
+        customers, products = pd.DataFrame({"CustomerID": [1001]}), pd.DataFrame({"ProductID": [101]})
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = pathlib.Path(tmp)
+            sales.iloc[:4].to_csv(tmp_path.joinpath("sales_data_prepared.csv"), index=False)  # From a run without --history
+            with mock.patch.object(data_prep, "PREPARED_DATA_DIR", tmp_path), \
+                    mock.patch.object(data_prep, "SALES_FINGERPRINTS_DIR", tmp_path.joinpath("fingerprints")), \
+                    mock.patch.object(data_prep, "SALES_ORPHANS_PATH", tmp_path.joinpath("orphans.csv")):
+                first = finish_sales_data(sales.iloc[:6], customers, products, history=True)
+                with mock.patch.object(data_prep, "append_prepared_data", side_effect=ValueError("columns differ")):
+                    with self.assertRaises(ValueError):
+                        finish_sales_data(sales.iloc[6:8], customers, products, history=True)
+                with mock.patch.object(data_prep.pd, "read_csv", wraps=pd.read_csv) as read_csv:
+                    second = finish_sales_data(sales, customers, products, history=True)
+            self.assertFalse([call for call in read_csv.call_args_list if "usecols" in call.kwargs],
+                             "A seeded store should not rescan the prepared file")
+            prepared = pd.read_csv(tmp_path.joinpath("sales_data_prepared.csv"))
+        self.assertEqual(first["TransactionID"].tolist(), [5, 6])
+        self.assertEqual(second["TransactionID"].tolist(), [7, 8, 9, 10], "Sales of the failed run are prepared again")
+        self.assertEqual(prepared["TransactionID"].tolist(), list(range(1, 11)))
+
+
+RAW_FILES = {
+    "customers_data.csv": (
+        "CustomerID,Name,Region,JoinDate,LoyaltyPoints,PreferredContact Method\n"
+        "1001,  Ann Lee ,East,11/11/2021,237,Email\n"
+        "1002,Bo Diaz,West,2/14/2023,74,Text\n"
+        "1003,Cy Oh,North,3/1/2022,,Email\n"
+        "1002,Bo Diaz,West,2/14/2023,74,Text\n"
+        "1004,Di Wu,South,7/4/2020,12,Text\n"
+        "1005,,South,7/4/2020,12,Text\n"
+    ),
+    "products_data.csv": (
+        "ProductID,ProductName,Category,UnitPrice,StockQuantity,BinNumber\n"
+        "101, laptop,Electronics,793.12,84,A1\n"
+        "102,hoodie ,Clothing,39.1,90,A3\n"
+        "103,cable,Electronics,19.78,40,A2\n"
+        "101, laptop,Electronics,793.12,84,A1\n"
+        "104,desk,Furniture,235.5,6,A4\n"
+    ),
+    "sales_data.csv": (
+        "TransactionID,SaleDate,CustomerID,ProductID,StoreID,CampaignID,SaleAmount,DiscountPercent,PaymentType\n"
+        "550,1/6/2024,1001,102,404,0,39.1,0.1,Debit\n"
+        "551,1/6/2024,1002,101,403,0,793.12,0,Cash\n"
+        "552,1/16/2024,1003,103,404,1,19.78,,Credit\n"
+        "550,1/6/2024,1001,102,404,0,39.1,0.1,Debit\n"
+        "553,2/1/2024,1999,104,406,0,235.5,0,Cash\n"
+        "554,not a date,1004,104,405,0,235.5,0,Cash\n"
+        "555,2/29/2024,1004,101,405,2,793.12,0.2,Debit\n"
+        "551,1/6/2024,1002,101,403,0,793.12,0,Cash\n"
+        "556,3/3/2024,1005,103,401,0,19.78,0,Credit\n"
+    ),
+}
+
+
+class TestStreamingMatchesInMemoryPrep(unittest.TestCase):
+
+    def prepare(self, tmp_path, streaming, raw_files=RAW_FILES):
+        """Prepare raw_files in tmp_path, with 3-row chunks if streaming, and return the prepared frames."""
+        raw_dir, prepared_dir = tmp_path.joinpath("raw"), tmp_path.joinpath("prepared")
+        raw_dir.mkdir()
+        prepared_dir.mkdir()
+        for file_name, text in raw_files.items():
+            raw_dir.joinpath(file_name).write_text(text)
+        foreign_keys = {
+            "CustomerID": (prepared_dir.joinpath("customers_data_prepared.csv"), "CustomerID"),
+            "ProductID": (prepared_dir.joinpath("products_data_prepared.csv"), "ProductID"),
+        }
+        with mock.patch.object(data_prep, "RAW_DATA_DIR", raw_dir), \
+                mock.patch.object(data_prep, "PREPARED_DATA_DIR", prepared_dir), \
+                mock.patch.object(data_prep, "SALES_FOREIGN_KEYS", foreign_keys), \
+                mock.patch.object(data_prep, "SALES_ORPHANS_PATH", tmp_path.joinpath("orphans.csv")), \
+                mock.patch.object(data_prep, "SALES_FINGERPRINTS_DIR", tmp_path.joinpath("fingerprints")):
+            if streaming:
+                data_prep.main_streaming(chunksize=3)
+            else:
+                data_prep.main()
+        prepared = {file_name: pd.read_csv(prepared_dir.joinpath(file_name.replace(".csv", "_prepared.csv")))
+                    for file_name in RAW_FILES}
+        prepared["orphans"] = pd.read_csv(tmp_path.joinpath("orphans.csv"))
+        return prepared
+
+    def test_stream_prepare_data_matches_in_memory_prep(self):
+        with tempfile.TemporaryDirectory() as streamed_tmp, tempfile.TemporaryDirectory() as in_memory_tmp:
+            streamed = self.prepare(pathlib.Path(streamed_tmp), streaming=True)
+            in_memory = self.prepare(pathlib.Path(in_memory_tmp), streaming=False)
+        self.assertEqual(streamed["sales_data.csv"]["TransactionID"].tolist(), [550, 551, 552, 555])
+        self.assertEqual(streamed["orphans"]["TransactionID"].tolist(), [553, 556], "Customer 1005 has no name, so is dropped")
+        for name, df in in_memory.items():
+            pd.testing.assert_frame_equal(streamed[name], df, obj=name)
+
+    def test_prepared_files_load_through_the_manifest(self):
+        """Freshly prepared files have the columns the smart_sales manifest reads."""
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = pathlib.Path(tmp)
+            # Without the missing discount, which prep fills with "Unknown", not a REAL
+            raw_files = {**RAW_FILES, "sales_data.csv": RAW_FILES["sales_data.csv"].replace("19.78,,Credit", "19.78,0,Credit")}
+            self.prepare(tmp_path, streaming=False, raw_files=raw_files)
+            manifest = WAREHOUSE_MANIFESTS["smart_sales"]._replace(
+                db_path=tmp_path.joinpath("smart_sales.db"), prepared_dir=tmp_path.joinpath("prepared"))
+            load_data_to_db(manifest=manifest)
+            conn = sqlite3.connect(manifest.db_path)
+            customers = pd.read_sql_query("SELECT customer_id, preferred_contact_method FROM customer ORDER BY 1", conn)
+            (sales,) = conn.execute("SELECT COUNT(*) FROM sale").fetchone()
+            conn.close()
+            close_pools()
+        self.assertEqual(customers["preferred_contact_method"].tolist(), ["Email", "Text", "Email", "Text"])
+        self.assertEqual(sales, 4)
+
+
+# Run the tests with verbosity=2 for detailed output
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -13,7 +13,9 @@ This test suite verifies that each function in the DataScrubber class works as e
 import unittest
 import pathlib
 import sys
+import tempfile
 from io import StringIO
+import numpy as np
 import pandas as pd
 
 # For local imports, temporarily add project root to Python sys.path
@@ -22,7 +24,14 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.append(str(PROJECT_ROOT))
 
 # Import DataScrubber from the scripts module
-from scripts.data_scrubber import DataScrubber  # noqa: E402
+from scripts.data_scrubber import (  # noqa: E402
+    DataScrubber,
+    FingerprintStore,
+    KeyIndex,
+    fingerprint_rows,
+    hyperloglog_estimate,
+    hyperloglog_registers,
+)
 
 # Create a fake CSV file using StringIO
 csv_data = StringIO("""
@@ -99,10 +108,155 @@ class TestDataScrubber(unittest.TestCase):
         self.assertIn('StandardDateTime', df_parsed.columns, "StandardDateTime column not added correctly")
         self.assertTrue(pd.api.types.is_datetime64_any_dtype(df_parsed['StandardDateTime']), "StandardDateTime column not parsed correctly")
 
+    def test_infer_date_format(self):
+        self.assertEqual(DataScrubber.infer_date_format(pd.Series(["1/6/2024", "2/14/2024", None])), "%m/%d/%Y")
+        self.assertEqual(DataScrubber.infer_date_format(df['Date']), "%Y-%m-%d")
+        self.assertIsNone(DataScrubber.infer_date_format(pd.Series(["not a date"])))
+
+    def test_parse_dates_outliers(self):
+        """Strings off the inferred format use a fallback format, but day and month are never swapped."""
+        dates = pd.Series(["1/6/2024", "2/14/2024", "2024-03-07", None, "13/6/2024", "1/6/2024"], index=range(10, 16))
+        parsed = DataScrubber.parse_dates(dates, errors='coerce')
+        expected = pd.to_datetime(pd.Series(["2024-01-06", "2024-02-14", "2024-03-07", None, None, "2024-01-06"], index=range(10, 16)))
+        pd.testing.assert_series_equal(parsed, expected)
+        with self.assertRaises(ValueError):
+            DataScrubber.parse_dates(dates)
+
+    def test_optimize_dtypes(self):
+        original = pd.DataFrame({
+            "ID": [1001, 1002, 1003, 1004],
+            "Region": ["East", "East", "West", "East"],
+            "Price": [1.5, 2.25, None, 4.0],
+            "Amount": [39.1, 19.78, 335.1, 195.5],
+        })
+        optimized = DataScrubber(original).optimize_dtypes()
+        self.assertEqual(optimized["ID"].dtype, "int16")
+        self.assertIsInstance(optimized["Region"].dtype, pd.CategoricalDtype)
+        self.assertEqual(optimized["Price"].dtype, "float32", "Exactly representable floats should be downcast")
+        self.assertEqual(optimized["Amount"].dtype, "float64", "Floats that would change should be kept")
+        pd.testing.assert_frame_equal(optimized.astype(object), original.astype(object))
+
+    def test_handle_missing_data_categorical(self):
+        scrubber = DataScrubber(pd.DataFrame({"Region": pd.Categorical(["East", None]), "Score": [1.0, None]}))
+        df_filled = scrubber.handle_missing_data(fill_value="N/A")
+        self.assertEqual(df_filled["Region"].tolist(), ["East", "N/A"])
+        plan_filled = DataScrubber(pd.DataFrame({"Region": pd.Categorical(["East", None])})).plan().handle_missing_data(fill_value="N/A").execute()
+        self.assertEqual(plan_filled["Region"].tolist(), ["East", "N/A"])
+
+    def test_profile(self):
+        profile = self.scrubber.profile()
+        self.assertEqual(profile['rows'], 6)
+        self.assertEqual(profile['duplicate_count'], df.duplicated().sum())
+        self.assertEqual(profile['null_counts'].tolist(), df.isnull().sum().tolist())
+        self.assertEqual(profile['stats'].loc['Name', 'distinct'], 4)
+        self.assertEqual(profile['stats'].loc['Score', 'max'], 30)
+        self.assertAlmostEqual(profile['stats'].loc['Score', 'mean'], df['Score'].mean())
+
+    def test_profile_cache_invalidation(self):
+        profile = self.scrubber.profile()
+        self.assertIs(self.scrubber.profile(), profile, "Profile should be cached")
+        self.scrubber.format_column_strings_to_upper_and_trim('Name')
+        self.assertIsNot(self.scrubber.profile(), profile, "An in-place change should invalidate the profile")
+        profile = self.scrubber.profile()
+        self.scrubber.filter_column_outliers('Score', 10, 20)
+        self.assertEqual(self.scrubber.profile()['rows'], 3, "A new DataFrame should invalidate the profile")
+
+    def test_profile_sampled(self):
+        big = pd.DataFrame({'ID': range(10_000), 'Group': [i % 7 for i in range(10_000)]})
+        profile = DataScrubber(big).profile(sample_rows=1_000)
+        self.assertTrue(profile['sampled'])
+        self.assertEqual(profile['rows'], 10_000)
+        self.assertEqual(profile['stats'].loc['Group', 'distinct'], 7)
+
+        # Every row appears twice, but a sample only sees a duplicate when it draws both copies
+        doubled = pd.concat([big, big], ignore_index=True)
+        profile = DataScrubber(doubled).profile(sample_rows=1_000)
+        self.assertEqual(profile['duplicate_count'], doubled.sample(n=1_000, random_state=42).duplicated().sum())
+        self.assertLess(profile['duplicate_count'], doubled.duplicated().sum())
+
+    def test_hyperloglog_estimate(self):
+        hashes = pd.util.hash_pandas_object(pd.Series(range(200_000)), index=False).to_numpy()
+        estimate = hyperloglog_estimate(hyperloglog_registers(hashes))
+        self.assertAlmostEqual(estimate / 200_000, 1, delta=0.03)
+
     def test_remove_duplicate_records(self):
         df_no_duplicates = self.scrubber.remove_duplicate_records()
         self.assertEqual(df_no_duplicates.duplicated().sum(), 0, "Duplicates not removed correctly")
 
+    def test_remove_duplicate_records_by_key(self):
+        df_no_duplicates = self.scrubber.remove_duplicate_records(key_columns=['ID'])
+        self.assertEqual(df_no_duplicates['ID'].tolist(), [1, 2, 3, 4, 5], "Should keep the first row of each ID")
+        self.assertEqual(df_no_duplicates['Score'].iloc[-1], 25)
+        with self.assertRaises(ValueError):
+            self.scrubber.remove_duplicate_records(key_columns=['Missing'])
+
+    def test_remove_duplicate_records_against_history(self):
+        """Rows kept in an earlier batch are dropped from later batches, even after reopening the store."""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = FingerprintStore(pathlib.Path(tmp), capacity=1000)
+            first = DataScrubber(df.iloc[:3].copy()).remove_duplicate_records(['ID'], store)
+            self.assertEqual(len(first), 3)
+            self.assertEqual(len(store), 0, "Only the caller adds the kept rows, once they are written")
+            self.assertEqual(store.add(fingerprint_rows(first, ['ID']), assume_new=True), 3)
+
+            reopened = FingerprintStore(pathlib.Path(tmp))
+            self.assertEqual(len(reopened), 3)
+            second = DataScrubber(df.copy()).remove_duplicate_records(['ID'], reopened)
+            self.assertEqual(second['ID'].tolist(), [4, 5], "Only IDs not seen before should be kept")
+            reopened.add(fingerprint_rows(second, ['ID']), assume_new=True)
+            self.assertEqual(len(reopened), 5)
+
+    def test_fingerprint_store_is_exact(self):
+        """The Bloom filter may pass fingerprints it has not seen, but the sorted runs never do."""
+        fingerprints = fingerprint_rows(pd.DataFrame({'ID': np.arange(20_000)}))
+        with tempfile.TemporaryDirectory() as tmp:
+            store = FingerprintStore(pathlib.Path(tmp), capacity=1000, runs_per_tier=3)  # Undersized, so many false positives
+            for batch in np.array_split(fingerprints[:10_000], 5):
+                store.add(batch)
+            self.assertEqual(len(store.meta['runs']), 3, "Three runs of 2,000 should be merged into one")
+            self.assertTrue(store.contains(fingerprints[:10_000]).all())
+            self.assertFalse(store.contains(fingerprints[10_000:]).any())
+            self.assertEqual(store.add(fingerprints[5_000:15_000]), 5_000)
+
+    def test_fingerprint_store_merges_runs_of_similar_size(self):
+        """Small batches are merged with each other, never into the big run of earlier history."""
+        fingerprints = fingerprint_rows(pd.DataFrame({'ID': np.arange(10_000)}))
+        with tempfile.TemporaryDirectory() as tmp:
+            store = FingerprintStore(pathlib.Path(tmp), capacity=10_000, runs_per_tier=4)
+            store.add(fingerprints[:8_000])
+            (history_run,) = store.meta['runs']
+            for batch in np.array_split(fingerprints[8_000:], 40):
+                store.add(batch, assume_new=True)
+                self.assertEqual(store.meta['runs'][0], history_run, "The big run should not be rewritten")
+                sizes = [store.meta['run_sizes'][run] for run in store.meta['runs']]
+                self.assertEqual(sum(sizes), len(store))
+            self.assertLessEqual(len(store.meta['runs']), 1 + 3 * 3, "At most 3 runs per tier should be left")
+            self.assertTrue(store.contains(fingerprints).all())
+            self.assertEqual(len(store), 10_000)
+
+    def test_split_foreign_key_orphans(self):
+        sales = pd.DataFrame({
+            'SaleID': [1, 2, 3, 4, 5],
+            'CustomerID': [1008.0, 1009.0, None, 1500.0, 1001.5],
+            'ProductID': ['102', 'x', '103', '101', '101'],
+        })
+        references = {'CustomerID': KeyIndex(pd.Series([1001, 1008, 1009])), 'ProductID': KeyIndex(pd.Series([101.0, 102.0, 103.0]))}
+        valid, orphans = DataScrubber(sales).split_foreign_key_orphans(references)
+        self.assertEqual(valid['SaleID'].tolist(), [1, 3], "A missing key is allowed, as a NULL foreign key is")
+        self.assertEqual(str(valid['CustomerID'].dtype), 'Int64', "Float-ified IDs should become integers")
+        self.assertEqual(valid['CustomerID'].iloc[0], 1008)
+        self.assertEqual(orphans['OrphanKeys'].tolist(), ['ProductID', 'CustomerID', 'CustomerID'])
+        with self.assertRaises(ValueError):
+            DataScrubber(sales).split_foreign_key_orphans({'StoreID': KeyIndex(pd.Series([1]))})
+
+    def test_key_index_sparse_and_dense(self):
+        probes = np.array([5, 6, 10**12, -1])
+        for keys in ([5, 7, 10**12], [5, 7, 10**12 - 1, 10**12]):  # Sparse keys use searchsorted
+            self.assertEqual(KeyIndex(pd.Series(keys)).contains(probes).tolist(), [True, False, True, False])
+        dense = KeyIndex(pd.Series([7, 5, 5, 8]))
+        self.assertIsNotNone(dense.table)
+        self.assertEqual(dense.contains(np.array([4, 5, 6, 8, 9])).tolist(), [False, True, False, True, False])
+
     def test_rename_columns(self):
         df_renamed = self.scrubber.rename_columns({'ID': 'Identifier', 'Name': 'FullName'})
         self.assertIn('Identifier', df_renamed.columns, "Column ID not renamed correctly")
@@ -112,6 +266,48 @@ class TestDataScrubber(unittest.TestCase):
         df_reordered = self.scrubber.reorder_columns(['Name', 'ID', 'Date'])
         self.assertEqual(df_reordered.columns.tolist(), ['Name', 'ID', 'Date'], "Columns not reordered correctly")
 
+    def test_plan_matches_eager_methods(self):
+        """The fused plan gives the same result as calling the eager methods in order."""
+        eager = DataScrubber(df.copy())
+        eager.drop_columns(['Date'])
+        eager.remove_duplicate_records()
+        eager.filter_column_outliers('Score', 10, 25)
+        eager.format_column_strings_to_lower_and_trim('Name')
+        eager.rename_columns({'ID': 'Identifier'})
+
+        fused = (self.scrubber.plan()
+                 .drop_columns(['Date'])
+                 .remove_duplicate_records()
+                 .filter_column_outliers('Score', 10, 25)
+                 .format_column_strings_to_lower_and_trim('Name')
+                 .rename_columns({'ID': 'Identifier'})
+                 .execute())
+        pd.testing.assert_frame_equal(fused, eager.df)
+        self.assertIs(self.scrubber.df, fused, "Plan result not stored on the scrubber")
+
+    def test_plan_explain(self):
+        plan = self.scrubber.plan().drop_columns(['Date']).filter_column_outliers('Score', 10, 25)
+        explanation = plan.explain()
+        self.assertIn("Scan 3 of 4 columns", explanation, "Dropped columns should not be scanned")
+        self.assertIn("Score between 10 and 25", explanation, "Filter missing from plan")
+
+    def test_plan_values_are_not_column_keys(self):
+        """A fill value or a dtype name that matches a dropped column does not bring it back into the scan."""
+        named_like_values = pd.DataFrame({"Region": ["East", None], "Score": ["1", "2"], "N/A": [1, 2], "int64": [3, 4]})
+        plan = (DataScrubber(named_like_values).plan()
+                .drop_columns(["N/A", "int64"])
+                .handle_missing_data(fill_value="N/A")
+                .convert_column_to_new_data_type("Score", "int64"))
+        self.assertIn("Scan 2 of 4 columns: Region, Score", plan.explain())
+        result = plan.execute()
+        self.assertEqual(result.columns.tolist(), ["Region", "Score"])
+        self.assertEqual(result["Region"].tolist(), ["East", "N/A"])
+        self.assertEqual(result["Score"].tolist(), [1, 2])
+
+    def test_plan_missing_column(self):
+        with self.assertRaises(ValueError):
+            self.scrubber.plan().rename_columns({'ID': 'Identifier'}).drop_columns(['ID'])
+
 
 # Run the tests with verbosity=2 for detailed output
 if __name__ == "__main__":
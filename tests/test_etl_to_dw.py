@@ -0,0 +1,241 @@
+r"""
+tests/test_etl_to_dw.py
+
+To run, open a terminal in the root project folder.
+Activate your virtual environment if needed, and run one of the following commands:
+
+    py tests\test_etl_to_dw.py
+    python3 tests\test_etl_to_dw.py
+
+This test suite verifies that the manifest-driven loader in scripts/etl_to_dw.py
+loads both deployments, full and incrementally, in batches inside one transaction,
+and caches its compiled load plans.
+"""
+
+import unittest
+import pathlib
+import shutil
+import sqlite3
+import sys
+import tempfile
+from unittest import mock
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+import scripts.etl_to_dw as etl_to_dw  # noqa: E402
+from scripts.etl_to_dw import (  # noqa: E402
+    SALE_INDEXES,
+    WAREHOUSE_MANIFESTS,
+    ColumnSpec,
+    compile_load_plan,
+    create_metadata_tables,
+    create_schema,
+    get_load_plan,
+    load_data_to_db,
+    read_prepared_table,
+    upsert_rows,
+)
+from scripts.olap.olap_cubing import MONTHLY_SALES_DIMENSIONS, MONTHLY_SALES_METRICS, create_olap_cube_sql  # noqa: E402
+from scripts.warehouse import close_pools  # noqa: E402
+
+
+class TestEtlToDw(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = pathlib.Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        close_pools()
+        self.tmp_dir.cleanup()
+
+    def load_in_small_batches(self, manifest):
+        """Load with 7 rows per executemany, so every table spans several batches."""
+        bulk_insert = etl_to_dw.bulk_insert
+        with mock.patch.object(etl_to_dw, "bulk_insert",
+                               lambda cursor, table_plan, df: bulk_insert(cursor, table_plan, df, batch_size=7)):
+            load_data_to_db(manifest=manifest)
+
+    def manifest_in_tmp(self, deployment):
+        """The deployment's manifest, with a throwaway database and a copy of its prepared files."""
+        manifest = WAREHOUSE_MANIFESTS[deployment]
+        prepared_dir = self.tmp_path.joinpath(f"{deployment}_prepared")
+        prepared_dir.mkdir()
+        for table in manifest.tables:
+            shutil.copy(PROJECT_ROOT.joinpath(manifest.prepared_dir, table.prepared_file), prepared_dir)
+        return manifest._replace(db_path=self.tmp_path.joinpath(f"{deployment}.db"), prepared_dir=prepared_dir)
+
+    def read_table(self, manifest, table):
+        conn = sqlite3.connect(manifest.db_path)
+        try:
+            return pd.read_sql_query(f"SELECT * FROM {table} ORDER BY 1", conn)
+        finally:
+            conn.close()
+
+    def test_both_deployments_load_their_schema(self):
+        for deployment in WAREHOUSE_MANIFESTS:
+            manifest = self.manifest_in_tmp(deployment)
+            load_data_to_db(manifest=manifest)
+            for table in manifest.tables:
+                loaded = self.read_table(manifest, table.name)
+                prepared = pd.read_csv(manifest.prepared_dir.joinpath(table.prepared_file))
+                self.assertEqual(list(loaded.columns), [column.name for column in table.columns])
+                self.assertEqual(len(loaded), len(prepared), f"{deployment}.{table.name} should hold every prepared row")
+        self.assertIn("sale_month", self.read_table(manifest, "sale").columns, "P7 sales keep their own columns")
+
+    def test_incremental_load_writes_only_changes(self):
+        manifest = self.manifest_in_tmp("p7")
+        load_data_to_db(incremental=True, manifest=manifest)
+        first = self.read_table(manifest, "product")
+
+        products_path = manifest.prepared_dir.joinpath("products_data_P7_prepared.csv")
+        products = pd.read_csv(products_path)
+        products.loc[0, "UnitPrice"] = 999.99
+        products.to_csv(products_path, index=False)
+        load_data_to_db(incremental=True, manifest=manifest)
+
+        second = self.read_table(manifest, "product")
+        self.assertEqual(second.loc[0, "unit_price"], 999.99)
+        pd.testing.assert_frame_equal(second.iloc[1:], first.iloc[1:])
+        conn = sqlite3.connect(manifest.db_path)
+        (rows_written,) = conn.execute("SELECT rows_written FROM etl_watermark WHERE table_name = 'product'").fetchone()
+        conn.close()
+        self.assertEqual(rows_written, 1, "Only the changed product should be written")
+
+    def test_upsert_inserts_skips_and_updates(self):
+        """New keys are inserted, unchanged rows skipped, and changed rows updated, with their hashes."""
+        table_plan = compile_load_plan(WAREHOUSE_MANIFESTS["smart_sales"])["tables"][1]  # product
+        conn = sqlite3.connect(self.tmp_path.joinpath("upsert.db"))
+        cursor = conn.cursor()
+        cursor.execute(table_plan["ddl"])
+        create_metadata_tables(cursor)
+        products = pd.DataFrame({
+            "product_id": [101, 102, 103],
+            "product_name": ["laptop", "hoodie", "cable"],
+            "category": ["Electronics", "Clothing", "Electronics"],
+            "unit_price": [793.12, 39.10, 19.78],
+            "stock_quantity": [10, 25, 40],
+            "bin_number": ["A1", "B2", "C3"],
+        })
+
+        def state():
+            watermark = cursor.execute("SELECT max_key, rows_written FROM etl_watermark WHERE table_name = 'product'").fetchone()
+            hashes = dict(cursor.execute("SELECT row_key, row_hash FROM etl_row_hash WHERE table_name = 'product'").fetchall())
+            return watermark, hashes
+
+        self.assertEqual(upsert_rows(cursor, table_plan, products), 3)
+        watermark, first_hashes = state()
+        self.assertEqual(watermark, (103, 3))
+        self.assertEqual(sorted(first_hashes), [101, 102, 103])
+
+        self.assertEqual(upsert_rows(cursor, table_plan, products), 0, "Unchanged rows should be skipped")
+        self.assertEqual(state(), (watermark, first_hashes))
+
+        changed = pd.concat([products, products.iloc[[0]].assign(product_id=104)], ignore_index=True)
+        changed.loc[1, "unit_price"] = 44.50
+        self.assertEqual(upsert_rows(cursor, table_plan, changed), 2)
+        watermark, hashes = state()
+        self.assertEqual(watermark, (104, 2))
+        self.assertNotEqual(hashes[102], first_hashes[102])
+        self.assertEqual({key: hashes[key] for key in (101, 103)}, {key: first_hashes[key] for key in (101, 103)})
+        loaded = pd.read_sql_query("SELECT product_id, unit_price FROM product ORDER BY 1", conn)
+        self.assertEqual(loaded["product_id"].tolist(), [101, 102, 103, 104])
+        self.assertEqual(loaded["unit_price"].tolist()[1], 44.50)
+        conn.close()
+
+    def test_frames_in_memory_load_like_prepared_files(self):
+        from_files = self.manifest_in_tmp("smart_sales")
+        from_frames = from_files._replace(db_path=self.tmp_path.joinpath("from_frames.db"))
+        # Prepared frames as data_prep.py holds them: parsed dates, categoricals and nullable integers
+        sales = pd.read_csv(from_files.prepared_dir.joinpath("sales_data_prepared.csv"))
+        sales["SaleDate"] = pd.to_datetime(sales["SaleDate"])
+        sales["PaymentType"] = sales["PaymentType"].astype("category")
+        sales["CustomerID"] = sales["CustomerID"].astype("Int64")
+        load_data_to_db(incremental=True, manifest=from_files)
+        load_data_to_db(incremental=True, manifest=from_frames, frames={"sale": sales})
+        for table in ("sale", "sale_wide", "etl_row_hash"):
+            pd.testing.assert_frame_equal(self.read_table(from_frames, table), self.read_table(from_files, table))
+
+    def test_batched_load_matches_to_sql(self):
+        """Batched executemany loads the same rows as the DataFrame.to_sql() path it replaced."""
+        manifest = self.manifest_in_tmp("smart_sales")
+        self.load_in_small_batches(manifest)
+        plan = get_load_plan(manifest)
+        conn = sqlite3.connect(self.tmp_path.joinpath("to_sql.db"))
+        create_schema(conn.cursor(), plan)
+        for table_plan in plan["tables"]:
+            read_prepared_table(manifest, table_plan).to_sql(table_plan["name"], conn, if_exists="append", index=False)
+        conn.commit()
+        for table_plan in plan["tables"]:
+            expected = pd.read_sql_query(f"SELECT * FROM {table_plan['name']} ORDER BY 1", conn)
+            loaded = self.read_table(manifest, table_plan["name"])
+            self.assertGreater(len(loaded), 7)
+            pd.testing.assert_frame_equal(loaded, expected, check_dtype=False)
+        conn.close()
+
+    def test_failing_batch_rolls_back_the_whole_load(self):
+        manifest = self.manifest_in_tmp("smart_sales")
+        self.load_in_small_batches(manifest)
+        before = {table.name: self.read_table(manifest, table.name) for table in manifest.tables}
+
+        # A repeated sale_id in the last batch of sales fails the load after every other batch went in
+        sales_path = manifest.prepared_dir.joinpath("sales_data_prepared.csv")
+        sales = pd.read_csv(sales_path)
+        sales.loc[len(sales) - 1, "TransactionID"] = sales.loc[0, "TransactionID"]
+        sales.loc[0:len(sales) - 2, "SaleAmount"] += 1
+        sales.to_csv(sales_path, index=False)
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.load_in_small_batches(manifest)
+
+        for table, df in before.items():
+            pd.testing.assert_frame_equal(self.read_table(manifest, table), df, obj=f"{table} after the failed load")
+        conn = sqlite3.connect(manifest.db_path)
+        (journal_mode,) = conn.execute("PRAGMA journal_mode").fetchone()
+        (loads,) = conn.execute("SELECT COUNT(*) FROM etl_load_log").fetchone()
+        conn.close()
+        self.assertEqual(journal_mode, "wal")
+        self.assertEqual(loads, 1, "The failed load should not be logged")
+
+    def test_sale_indexes_serve_the_monthly_cube(self):
+        """A full load rebuilds every sale index, and the monthly sales cube query reads one of them."""
+        manifest = self.manifest_in_tmp("smart_sales")
+        load_data_to_db(manifest=manifest)
+        conn = sqlite3.connect(manifest.db_path)
+        indexes = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'sale'")}
+        self.assertLessEqual({statement.split()[5] for statement in SALE_INDEXES}, indexes)
+
+        with mock.patch("pandas.read_sql_query", wraps=pd.read_sql_query) as read_sql_query:
+            create_olap_cube_sql(MONTHLY_SALES_DIMENSIONS, MONTHLY_SALES_METRICS, db_path=manifest.db_path)
+        query, params = read_sql_query.call_args.args[0], read_sql_query.call_args.kwargs["params"]
+        plan = " ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params))
+        conn.close()
+        self.assertIn("USING COVERING INDEX idx_sale_", plan)
+
+    def test_load_plan_cache(self):
+        manifest = WAREHOUSE_MANIFESTS["p7"]._replace(db_path=self.tmp_path.joinpath("plan.db"))
+        plan_path = self.tmp_path.joinpath("plan.plan.json")
+        plan = get_load_plan(manifest)
+        self.assertTrue(plan_path.exists())
+        self.assertEqual(plan, compile_load_plan(manifest))
+
+        # A cached plan is read back as is, so a marker written into it survives...
+        plan_path.write_text(plan_path.read_text().replace('"deployment": "p7"', '"deployment": "cached"'))
+        self.assertEqual(get_load_plan(manifest)["deployment"], "cached")
+
+        # ...until the manifest changes
+        customer = manifest.tables[0]
+        changed = manifest._replace(tables=(
+            customer._replace(columns=customer.columns + (ColumnSpec("Email", "email", "TEXT"),)),
+        ) + manifest.tables[1:])
+        recompiled = get_load_plan(changed)
+        self.assertEqual(recompiled["deployment"], "p7")
+        self.assertIn("email TEXT", recompiled["tables"][0]["ddl"])
+
+
+# Run the tests with verbosity=2 for detailed output
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,96 @@
+r"""
+tests/test_olap_cube.py
+
+To run, open a terminal in the root project folder.
+Activate your virtual environment if needed, and run one of the following commands:
+
+    py tests\test_olap_cube.py
+    python3 tests\test_olap_cube.py
+
+This test suite verifies that Cube queries in scripts/olap/olap_cube.py agree with
+aggregating the same facts directly in pandas.
+"""
+
+import unittest
+import pathlib
+import sys
+import numpy as np
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from scripts.olap.olap_cube import Cube  # noqa: E402
+from scripts.olap.olap_cubing import add_time_dimensions, create_olap_cube  # noqa: E402
+
+# Random facts, so most cells hold several sales
+rng = np.random.default_rng(11)
+sales = add_time_dimensions(pd.DataFrame({
+    "sale_id": np.arange(2000),
+    "sale_date": rng.choice(pd.date_range("2024-01-01", "2024-12-31").strftime("%Y-%m-%d"), 2000),
+    "product_id": rng.integers(101, 109, 2000),
+    "store_id": rng.integers(401, 407, 2000),
+    "sale_amount_usd": rng.uniform(1, 2000, 2000).round(2),
+}))
+
+DIMENSIONS = ["Month", "MonthName", "product_id", "store_id"]
+METRICS = {"sale_amount_usd": ["sum", "mean", "min", "max"], "sale_id": "count"}
+
+
+class TestCube(unittest.TestCase):
+
+    def setUp(self):
+        self.cube = Cube(create_olap_cube(sales, DIMENSIONS, METRICS))
+
+    def test_dimensions_and_measures(self):
+        self.assertEqual(self.cube.dimensions, DIMENSIONS)
+        self.assertEqual(self.cube.measures, [
+            "sale_amount_usd_sum", "sale_amount_usd_mean", "sale_amount_usd_min", "sale_amount_usd_max", "sale_id_count",
+        ])
+
+    def test_rollup_matches_pandas(self):
+        for by, where in ((["Month"], None), (["MonthName", "store_id"], None),
+                          (["product_id"], {"Month": [1, 2, 3], "store_id": 404}), ([], {"MonthName": "July"})):
+            facts = sales
+            for dim, wanted in (where or {}).items():
+                facts = facts[facts[dim].isin(wanted if isinstance(wanted, list) else [wanted])]
+            expected = create_olap_cube(facts, by, METRICS).drop(columns=["sale_ids_start", "sale_ids_stop"]) if by else \
+                pd.DataFrame({
+                    "sale_amount_usd_sum": [facts["sale_amount_usd"].sum()],
+                    "sale_amount_usd_mean": [facts["sale_amount_usd"].mean()],
+                    "sale_amount_usd_min": [facts["sale_amount_usd"].min()],
+                    "sale_amount_usd_max": [facts["sale_amount_usd"].max()],
+                    "sale_id_count": [len(facts)],
+                })
+            pd.testing.assert_frame_equal(self.cube.rollup(by, where), expected)
+
+    def test_slice_and_dice(self):
+        cells = self.cube.cells
+        sliced = self.cube.slice("product_id", 103)
+        pd.testing.assert_frame_equal(sliced, cells[cells["product_id"] == 103].reset_index(drop=True))
+        diced = self.cube.dice({"MonthName": ["March", "May"], "store_id": 402})
+        expected = cells[cells["MonthName"].isin(["March", "May"]) & (cells["store_id"] == 402)].reset_index(drop=True)
+        pd.testing.assert_frame_equal(diced, expected)
+        self.assertEqual(len(self.cube.dice({"product_id": 999})), 0, "Unknown values should match no cells")
+        with self.assertRaises(ValueError):
+            self.cube.rollup(["Missing"])
+
+    def test_drill_down(self):
+        by_month = self.cube.rollup(["Month"])
+        by_month_product = self.cube.drill_down(["Month"], "product_id")
+        rolled_back = by_month_product.groupby("Month")["sale_amount_usd_sum"].sum().to_numpy()
+        np.testing.assert_allclose(rolled_back, by_month["sale_amount_usd_sum"].to_numpy())
+
+    def test_query_cache(self):
+        first = self.cube.rollup(["Month"], {"store_id": [401, 402]})
+        first["sale_amount_usd_sum"] = 0.0  # Changing a result must not change the cached one
+        again = self.cube.rollup(["Month"], {"store_id": [402, 401]})
+        self.assertEqual(self.cube.cache_info()["hits"], 1, "Same query in another order should hit the cache")
+        self.assertTrue((again["sale_amount_usd_sum"] > 0).all())
+
+
+# Run the tests with verbosity=2 for detailed output
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
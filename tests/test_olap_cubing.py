@@ -0,0 +1,444 @@
+r"""
+tests/test_olap_cubing.py
+
+To run, open a terminal in the root project folder.
+Activate your virtual environment if needed, and run one of the following commands:
+
+    py tests\test_olap_cubing.py
+    python3 tests\test_olap_cubing.py
+
+This test suite verifies that the cube builders in scripts/olap/olap_cubing.py agree with each other.
+"""
+
+import unittest
+import mmap
+import pathlib
+import sqlite3
+import sys
+import tempfile
+from unittest import mock
+import numpy as np
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from scripts.etl_to_dw import create_schema, refresh_sale_wide  # noqa: E402
+from scripts.warehouse import close_pools, connect_writer  # noqa: E402
+import scripts.olap.olap_cubing as olap_cubing  # noqa: E402
+from scripts.olap.olap_goal_sales_by_month import load_sale_ids  # noqa: E402
+from scripts.olap.olap_cubing import (  # noqa: E402
+    add_time_dimensions,
+    build_monthly_sales_cube,
+    create_olap_cube,
+    create_olap_cube_out_of_core,
+    create_olap_cube_parallel,
+    create_olap_cube_sql,
+    create_grouping_sets_cube,
+    get_or_build_cube,
+    mergeable_metrics,
+    query_sale_ids_by_cell,
+    read_cube_from_npy_bundle,
+    select_grouping,
+    sale_table_fingerprint,
+    sale_ids_fingerprint_path,
+    sale_watermark,
+    sort_sale_ids_by_cell,
+    update_olap_cube_incremental,
+    write_cube_to_npy_bundle,
+)
+
+# A small sale table spanning several months, products and weekdays
+sales = pd.DataFrame({
+    "sale_id": range(550, 562),
+    "sale_date": ["2024-01-06", "2024-01-06", "2024-01-16", "2024-02-01", "2024-02-29", "2024-03-03",
+                  "2024-03-03", "2024-07-04", "2024-07-19", "2024-08-08", "2024-12-24", "2024-12-31"],
+    "customer_id": [1008, 1009, 1004, 1006, 1001, 1002, 1008, 1003, 1005, 1007, 1001, 1009],
+    "product_id": [102, 105, 107, 102, 101, 101, 105, 102, 107, 102, 101, 101],
+    "store_id": [404, 403, 404, 406, 405, 404, 403, 401, 402, 404, 406, 405],
+    "sale_amount_usd": [39.1, 19.78, 335.1, 195.5, 793.12, 1586.24, 59.34, 78.2, 134.04, 117.3, 793.12, 2379.36],
+})
+
+# Dimension rows for the sales above, for cubes over customer and product attributes
+customers = pd.DataFrame({
+    "customer_id": range(1001, 1010),
+    "name": [f"Customer {number}" for number in range(1, 10)],
+    "region": ["East", "West", "East", "North", "South", "West", "East", "North", "South"],
+})
+products = pd.DataFrame({
+    "product_id": [101, 102, 105, 107],
+    "product_name": ["laptop", "hoodie", "cable", "desk"],
+    "category": ["Electronics", "Clothing", "Electronics", "Furniture"],
+})
+
+DIMENSIONS = ["Month", "MonthName", "product_id"]
+METRICS = {"sale_amount_usd": ["sum", "mean", "min", "max"], "sale_id": "count"}
+
+
+class TestOlapCubing(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Create a throwaway warehouse holding the sales above."""
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.db_path = pathlib.Path(cls.tmp_dir.name).joinpath("test_dw.db")
+        conn = sqlite3.connect(cls.db_path)
+        create_schema(conn.cursor())
+        sales.to_sql("sale", conn, if_exists="append", index=False)
+        conn.commit()
+        conn.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        close_pools()  # Pooled readers keep the database open, which blocks deleting it on Windows
+        cls.tmp_dir.cleanup()
+
+    def pandas_cube(self, dimensions, metrics):
+        return create_olap_cube(add_time_dimensions(sales.copy()), dimensions, metrics)
+
+    def test_sql_cube_matches_pandas_cube(self):
+        expected = self.pandas_cube(DIMENSIONS, METRICS)
+        actual = create_olap_cube_sql(DIMENSIONS, METRICS, db_path=self.db_path)
+        pd.testing.assert_frame_equal(actual, expected)
+
+    def test_name_dimensions_are_categorical(self):
+        for cube in (self.pandas_cube(DIMENSIONS, METRICS), create_olap_cube_sql(DIMENSIONS, METRICS, db_path=self.db_path)):
+            self.assertIsInstance(cube["MonthName"].dtype, pd.CategoricalDtype)
+        grouping_sets = create_grouping_sets_cube(DIMENSIONS, METRICS, db_path=self.db_path)
+        self.assertIsInstance(grouping_sets["MonthName"].dtype, pd.CategoricalDtype)
+
+    def test_sql_cube_day_of_week(self):
+        dimensions = ["Year", "DayOfWeek", "store_id"]
+        expected = self.pandas_cube(dimensions, METRICS)
+        actual = create_olap_cube_sql(dimensions, METRICS, db_path=self.db_path)
+        pd.testing.assert_frame_equal(actual, expected)
+
+    def test_sql_cube_without_sale_ids(self):
+        cube = create_olap_cube_sql(DIMENSIONS, METRICS, db_path=self.db_path, include_sale_ids=False)
+        self.assertNotIn("sale_ids_start", cube.columns, "sale_ids ranges should be left out")
+
+    def test_out_of_core_cube_matches_pandas_cube(self):
+        """Tiny chunks and a zero budget force a spill after every chunk."""
+        for dimensions in (DIMENSIONS, ["Year", "DayOfWeek", "store_id"]):
+            expected = self.pandas_cube(dimensions, METRICS)
+            with tempfile.TemporaryDirectory() as spill_dir:
+                spilled = create_olap_cube_out_of_core(
+                    dimensions, METRICS, db_path=self.db_path, chunk_rows=5, memory_budget=0, spill_dir=pathlib.Path(spill_dir)
+                )
+                self.assertEqual(list(pathlib.Path(spill_dir).iterdir()), [], "Spill files should be removed")
+            in_memory = create_olap_cube_out_of_core(dimensions, METRICS, db_path=self.db_path, chunk_rows=5)
+            for actual in (spilled, in_memory):
+                pd.testing.assert_frame_equal(actual, expected)
+
+    def test_out_of_core_cube_repartitions_and_streams_its_output(self):
+        """Partitions too big for the budget are split again, and the sorted runs stream into a bundle."""
+        rng = np.random.default_rng(17)
+        n = 3000
+        dates = pd.date_range("2024-01-01", "2024-12-31").strftime("%Y-%m-%d").to_numpy()
+        many_sales = pd.DataFrame({
+            "sale_id": np.arange(1, n + 1),
+            "sale_date": rng.choice(dates, n),
+            "product_id": rng.integers(101, 111, n),
+            "store_id": rng.integers(401, 405, n),
+            "sale_amount_usd": rng.uniform(1, 2000, n).round(2),
+        })
+        dimensions = ["Month", "MonthName", "product_id", "store_id"]
+        expected = create_olap_cube(add_time_dimensions(many_sales.copy()), dimensions, METRICS)
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = pathlib.Path(tmp)
+            db_path = tmp.joinpath("spill_dw.db")
+            conn = sqlite3.connect(db_path)
+            create_schema(conn.cursor())
+            many_sales.to_sql("sale", conn, if_exists="append", index=False)
+            conn.commit()
+            conn.close()
+
+            # Two partitions per level keep the number of runs, and so the test, small
+            with mock.patch.object(olap_cubing, "SPILL_PARTITIONS", 2), \
+                    mock.patch.object(olap_cubing, "spill_partial_cells", wraps=olap_cubing.spill_partial_cells) as spill, \
+                    mock.patch.object(olap_cubing, "merge_sorted_runs", wraps=olap_cubing.merge_sorted_runs) as merge:
+                streamed = create_olap_cube_out_of_core(
+                    dimensions, METRICS, db_path=db_path, chunk_rows=500, memory_budget=16_000,
+                    spill_dir=tmp, output_path=tmp.joinpath("cube.npcube"),
+                )
+            levels = {call.args[4] if len(call.args) > 4 else call.kwargs.get("level", 0) for call in spill.call_args_list}
+            self.assertIn(1, levels, "Oversized partitions should be spilled again one level deeper")
+            runs = merge.call_args.args[0]
+            self.assertTrue(any(len(run) > 1 for run in runs), "Runs should be merged a block at a time")
+            self.assertTrue(all(path.name in ("spill_dw.db", "cube.npcube") for path in tmp.iterdir()), "Spill files should be removed")
+            values = streamed["sale_id_count"].to_numpy()
+            while values is not None and not isinstance(values, mmap.mmap):
+                values = values.base
+            self.assertIsNotNone(values, "The streamed cube should stay memory-mapped")
+            pd.testing.assert_frame_equal(streamed, expected, check_dtype=False)
+            close_pools()
+
+    def test_parallel_cube_matches_pandas_cube(self):
+        for dimensions in (DIMENSIONS, ["Year", "DayOfWeek", "store_id"]):
+            expected = self.pandas_cube(dimensions, METRICS)
+            actual = create_olap_cube_parallel(dimensions, METRICS, db_path=self.db_path, max_workers=2, partitions=5)
+            pd.testing.assert_frame_equal(actual, expected)
+
+    def test_sale_id_ranges(self):
+        """Slicing the sorted sale IDs with a cell's range gives exactly that cell's sales."""
+        sales_df = add_time_dimensions(sales.copy())
+        cube = create_olap_cube(sales_df, DIMENSIONS, METRICS)
+        for sale_ids in (sort_sale_ids_by_cell(sales_df, DIMENSIONS), query_sale_ids_by_cell(DIMENSIONS, self.db_path)):
+            for _, cell in cube.iterrows():
+                expected = sales_df[
+                    (sales_df["Month"] == cell["Month"]) & (sales_df["product_id"] == cell["product_id"])
+                ]["sale_id"].tolist()
+                self.assertEqual(sale_ids[cell["sale_ids_start"]:cell["sale_ids_stop"]].tolist(), expected)
+
+    def test_grouping_sets_match_direct_aggregation(self):
+        """Every grouping set derived from finer sets equals aggregating the facts directly."""
+        cube = create_grouping_sets_cube(DIMENSIONS, METRICS, sales_df=add_time_dimensions(sales.copy()))
+        self.assertEqual(cube["grouping_id"].nunique(), 2 ** len(DIMENSIONS), "Not all grouping sets were built")
+        for grouped in (["Month", "product_id"], ["MonthName"], ["product_id"]):
+            expected = self.pandas_cube(grouped, METRICS).drop(columns=["sale_ids_start", "sale_ids_stop"])
+            actual = select_grouping(cube, DIMENSIONS, grouped)
+            pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+        grand_total = select_grouping(cube, DIMENSIONS, [])
+        self.assertAlmostEqual(grand_total["sale_amount_usd_sum"].iloc[0], sales["sale_amount_usd"].sum())
+        self.assertEqual(grand_total["sale_id_count"].iloc[0], len(sales))
+
+    def test_rollup_from_sql(self):
+        cube = create_grouping_sets_cube(DIMENSIONS, METRICS, db_path=self.db_path, rollup=True)
+        self.assertEqual(sorted(cube["grouping_id"].unique()), [0, 1, 3, 7], "ROLLUP should keep only the prefixes")
+
+    def test_npy_bundle_round_trip(self):
+        cube = self.pandas_cube(DIMENSIONS, METRICS)
+        cube["store_count"] = pd.array([None if i % 3 else i for i in range(len(cube))], dtype="Int64")
+        with mock.patch.object(olap_cubing, "OLAP_OUTPUT_DIR", pathlib.Path(self.tmp_dir.name)):
+            bundle_path = write_cube_to_npy_bundle(cube, "test_cube.npcube")
+        loaded = read_cube_from_npy_bundle(bundle_path)
+        self.assertIsInstance(loaded["MonthName"].dtype, pd.CategoricalDtype, "MonthName should be dictionary-encoded")
+        pd.testing.assert_frame_equal(loaded, cube, check_dtype=False, check_categorical=False)
+
+        def file_backed(values):
+            while values is not None and not isinstance(values, mmap.mmap):
+                values = values.base
+            return values is not None
+
+        for name in ("Month", "product_id", "sale_amount_usd_sum", "sale_id_count"):
+            self.assertTrue(file_backed(loaded[name].to_numpy()), f"{name} should not be copied out of its memory map")
+        self.assertTrue(file_backed(loaded["store_count"].array._data), "Nullable values should stay memory-mapped too")
+
+    def test_cube_cache(self):
+        """The cube is rebuilt only when the spec or the sale table changes."""
+        calls = []
+
+        def builder(dimensions, metrics, db_path, conn=None):
+            calls.append(dimensions)
+            return create_olap_cube_sql(dimensions, metrics, db_path=db_path, conn=conn)
+
+        builder.__name__ = "create_olap_cube_sql"
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                mock.patch.object(olap_cubing, "CUBE_CACHE_DIR", pathlib.Path(cache_dir)):
+            first = get_or_build_cube(DIMENSIONS, METRICS, db_path=self.db_path, builder=builder)
+            cached = get_or_build_cube(DIMENSIONS, METRICS, db_path=self.db_path, builder=builder)
+            self.assertEqual(len(calls), 1, "Unchanged warehouse should hit the cache")
+            pd.testing.assert_frame_equal(cached, first, check_dtype=False, check_categorical=False)
+
+            get_or_build_cube(["product_id"], METRICS, db_path=self.db_path, builder=builder, max_bytes=0)
+            self.assertEqual(len(calls), 2, "A new spec should be built")
+            self.assertEqual(len(list(pathlib.Path(cache_dir).glob("*.npcube"))), 0, "Cache should be trimmed to max_bytes")
+
+            streamed = get_or_build_cube(DIMENSIONS, METRICS, db_path=self.db_path, builder=create_olap_cube_out_of_core)
+            pd.testing.assert_frame_equal(streamed, first, check_dtype=False, check_categorical=False)
+            self.assertEqual(streamed.attrs["fingerprint"], first.attrs["fingerprint"], "A streamed bundle should keep its fingerprint")
+            self.assertEqual(len(list(pathlib.Path(cache_dir).glob("*.tmp"))), 0, "The streamed bundle should be moved into place")
+
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("INSERT INTO sale (sale_id, sale_date, product_id, sale_amount_usd) VALUES (999, '2024-05-05', 101, 1.0)")
+            conn.commit()
+            conn.close()
+            try:
+                get_or_build_cube(DIMENSIONS, METRICS, db_path=self.db_path, builder=builder)
+                self.assertEqual(len(calls), 3, "Changed sale table should rebuild the cube")
+            finally:
+                conn = sqlite3.connect(self.db_path)
+                conn.execute("DELETE FROM sale WHERE sale_id = 999")
+                conn.commit()
+                conn.close()
+
+    def test_monthly_cube_and_sale_ids_share_a_snapshot(self):
+        """A load committed between building the cube and reading its sale IDs changes neither."""
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = pathlib.Path(tmp)
+            db_path = tmp.joinpath("snapshot_dw.db")
+            conn = connect_writer(db_path)
+            create_schema(conn.cursor())
+            sales.iloc[:8].to_sql("sale", conn, if_exists="append", index=False)
+            conn.commit()
+            query_sale_ids = olap_cubing.query_sale_ids_by_cell
+
+            def load_then_query(*args, **kwargs):
+                sales.iloc[8:].to_sql("sale", conn, if_exists="append", index=False)  # A load commits meanwhile
+                conn.commit()
+                return query_sale_ids(*args, **kwargs)
+
+            with mock.patch.object(olap_cubing, "OLAP_OUTPUT_DIR", tmp), \
+                    mock.patch.object(olap_cubing, "CUBE_CACHE_DIR", tmp.joinpath("cache")), \
+                    mock.patch.object(olap_cubing, "query_sale_ids_by_cell", side_effect=load_then_query):
+                build_monthly_sales_cube(db_path)
+            conn.close()
+
+            cube = read_cube_from_npy_bundle(tmp.joinpath("monthlysales_olap_cube.npcube"))
+            sale_ids_path = tmp.joinpath("monthlysales_olap_cube_sale_ids.npy")
+            sale_ids = load_sale_ids(sale_ids_path, cube)
+            self.assertEqual(len(sale_ids), 8, "The sale IDs should come from the cube's snapshot")
+            self.assertEqual(int(cube["sale_id_count"].sum()), 8)
+            for _, cell in cube.iterrows():
+                self.assertEqual(int(cell["sale_ids_stop"] - cell["sale_ids_start"]), int(cell["sale_id_count"]))
+
+            with mock.patch.object(olap_cubing, "CUBE_CACHE_DIR", tmp.joinpath("cache")):
+                newer_cube = get_or_build_cube(DIMENSIONS, METRICS, db_path=db_path)
+            self.assertNotEqual(newer_cube.attrs["fingerprint"], cube.attrs["fingerprint"])
+            with self.assertRaises(ValueError):
+                load_sale_ids(sale_ids_path, newer_cube)
+            sale_ids_fingerprint_path(sale_ids_path).unlink()
+            with self.assertRaises(ValueError):
+                load_sale_ids(sale_ids_path, cube)
+            close_pools()
+
+    def test_fingerprint_covers_every_sale_column(self):
+        """Changing any column, or setting a key to NULL, changes the fingerprint."""
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = pathlib.Path(tmp).joinpath("fingerprint_dw.db")
+            conn = sqlite3.connect(db_path)
+            create_schema(conn.cursor())
+            sales.to_sql("sale", conn, if_exists="append", index=False)
+            conn.commit()
+            fingerprints = []
+            with mock.patch.object(olap_cubing, "CUBE_CACHE_DIR", pathlib.Path(tmp).joinpath("cache")):
+                fingerprints.append(sale_table_fingerprint(db_path))
+                for change in ("payment_type = 'Cash'", "campaign_id = 3", "discount_percent = 0.1",
+                               "customer_id = NULL", "product_id = NULL"):
+                    conn.execute(f"UPDATE sale SET {change} WHERE sale_id = 555")
+                    conn.commit()
+                    fingerprints.append(sale_table_fingerprint(db_path))
+                close_pools()
+                fingerprints.append(sale_table_fingerprint(db_path))  # Memoized on the file's stat
+            conn.close()
+            close_pools()
+        self.assertEqual(len(set(fingerprints)), len(fingerprints) - 1)
+        self.assertEqual(fingerprints[-1], fingerprints[-2])
+
+    def test_incremental_update_matches_full_rebuild(self):
+        """Merging random batches of new sales gives the same cube as re-aggregating everything."""
+        rng = np.random.default_rng(7)
+        dates = pd.date_range("2024-01-01", "2024-12-31").strftime("%Y-%m-%d").to_numpy()
+        partial_metrics = mergeable_metrics(METRICS)
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = pathlib.Path(tmp).joinpath("incremental_dw.db")
+            conn = sqlite3.connect(db_path)
+            create_schema(conn.cursor())
+            sales.to_sql("sale", conn, if_exists="append", index=False)
+            conn.commit()
+
+            cube = create_olap_cube_sql(DIMENSIONS, partial_metrics, db_path=db_path, include_sale_ids=False)
+            watermark = sale_watermark(db_path)
+            for batch in range(5):
+                n = int(rng.integers(1, 40))
+                pd.DataFrame({
+                    "sale_id": np.arange(watermark + 1, watermark + 1 + n),
+                    "sale_date": rng.choice(dates, n),
+                    "product_id": rng.integers(101, 112, n),
+                    "sale_amount_usd": rng.uniform(1, 2000, n).round(2),
+                }).to_sql("sale", conn, if_exists="append", index=False)
+                conn.commit()
+
+                cube, watermark = update_olap_cube_incremental(cube, DIMENSIONS, METRICS, watermark, db_path=db_path)
+                expected = create_olap_cube_sql(DIMENSIONS, METRICS, db_path=db_path, include_sale_ids=False)
+                pd.testing.assert_frame_equal(cube[expected.columns], expected, check_exact=False)
+            conn.close()
+
+            unchanged, same_watermark = update_olap_cube_incremental(cube, DIMENSIONS, METRICS, watermark, db_path=db_path)
+            self.assertIs(unchanged, cube)
+            self.assertEqual(same_watermark, watermark)
+            close_pools()
+
+    def test_incremental_update_ignores_rows_loaded_during_the_update(self):
+        """Rows committed between reading the watermark and the delta wait for the next update."""
+        partial_metrics = mergeable_metrics(METRICS)
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = pathlib.Path(tmp).joinpath("race_dw.db")
+            conn = sqlite3.connect(db_path)
+            create_schema(conn.cursor())
+            sales.iloc[:8].to_sql("sale", conn, if_exists="append", index=False)
+            conn.commit()
+            cube = create_olap_cube_sql(DIMENSIONS, partial_metrics, db_path=db_path, include_sale_ids=False)
+            watermark = sale_watermark(db_path)
+            sales.iloc[8:10].to_sql("sale", conn, if_exists="append", index=False)
+            conn.commit()
+
+            def watermark_then_load(db_path):
+                new_watermark = sale_watermark(db_path)
+                sales.iloc[10:].to_sql("sale", conn, if_exists="append", index=False)  # A load commits meanwhile
+                conn.commit()
+                return new_watermark
+
+            with mock.patch.object(olap_cubing, "sale_watermark", side_effect=watermark_then_load):
+                cube, watermark = update_olap_cube_incremental(cube, DIMENSIONS, METRICS, watermark, db_path=db_path)
+            self.assertEqual(watermark, int(sales["sale_id"].iloc[9]))
+            cube, watermark = update_olap_cube_incremental(cube, DIMENSIONS, METRICS, watermark, db_path=db_path)
+            conn.close()
+
+            expected = self.pandas_cube(DIMENSIONS, METRICS)
+            expected = expected.drop(columns=["sale_ids_start", "sale_ids_stop"])
+            pd.testing.assert_frame_equal(cube[expected.columns], expected, check_exact=False)
+            close_pools()
+
+    def test_wide_fact_table_dimensions(self):
+        """Cubes over region and category read sale_wide, which follows dimension changes incrementally."""
+        dimensions = ["region", "category", "Month"]
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = pathlib.Path(tmp).joinpath("wide_dw.db")
+            conn = sqlite3.connect(db_path, isolation_level=None)
+            cursor = conn.cursor()
+            create_schema(cursor)
+            customers.to_sql("customer", conn, if_exists="append", index=False)
+            products.to_sql("product", conn, if_exists="append", index=False)
+            sales.to_sql("sale", conn, if_exists="append", index=False)
+            self.assertEqual(refresh_sale_wide(cursor), len(sales))
+
+            def expected_cube():
+                current = pd.read_sql_query("SELECT * FROM customer", conn)
+                wide = sales.merge(current, on="customer_id").merge(products, on="product_id")
+                return create_olap_cube(add_time_dimensions(wide), dimensions, METRICS)
+
+            def assert_builders_match():
+                expected = expected_cube()
+                pd.testing.assert_frame_equal(create_olap_cube_sql(dimensions, METRICS, db_path=db_path), expected)
+                pd.testing.assert_frame_equal(create_olap_cube_out_of_core(dimensions, METRICS, db_path=db_path), expected)
+                streamed = create_olap_cube_out_of_core(
+                    dimensions, METRICS, db_path=db_path, chunk_rows=5, memory_budget=0, output_path=pathlib.Path(tmp, "wide.npcube")
+                )
+                pd.testing.assert_frame_equal(streamed, expected, check_categorical=False, check_dtype=False)
+                pd.testing.assert_frame_equal(
+                    create_olap_cube_parallel(dimensions, METRICS, db_path=db_path, max_workers=2, partitions=3), expected
+                )
+
+            assert_builders_match()
+
+            # Customer 1001 moves region: only that customer's two sales are rewritten
+            cursor.execute("UPDATE customer SET region = 'North' WHERE customer_id = 1001")
+            self.assertEqual(refresh_sale_wide(cursor), 2)
+            assert_builders_match()
+
+            # Nothing queued means nothing rewritten
+            self.assertEqual(refresh_sale_wide(cursor), 0)
+            conn.close()
+
+            with self.assertRaises(ValueError):
+                create_olap_cube_sql(["no_such_column"], METRICS, db_path=db_path)
+            close_pools()
+
+
+# Run the tests with verbosity=2 for detailed output
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
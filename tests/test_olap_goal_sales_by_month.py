@@ -0,0 +1,98 @@
+r"""
+tests/test_olap_goal_sales_by_month.py
+
+To run, open a terminal in the root project folder.
+Activate your virtual environment if needed, and run one of the following commands:
+
+    py tests\test_olap_goal_sales_by_month.py
+    python3 tests\test_olap_goal_sales_by_month.py
+
+This test suite verifies that the goal script's batch chart rendering only redraws
+charts whose input aggregates changed.
+"""
+
+import unittest
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from scripts.olap.olap_goal_sales_by_month import (  # noqa: E402
+    CHART_HASHES_FILE,
+    Chart,
+    chart_content_hash,
+    render_charts,
+    visualize_sales_by_month,
+)
+
+sales_by_month = pd.DataFrame({"Month": [1, 2, 3], "TotalSales": [100.0, 250.5, 75.25]})
+
+
+class TestRenderCharts(unittest.TestCase):
+
+    def test_unchanged_charts_are_skipped(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output_dir = pathlib.Path(tmp)
+            charts = [Chart("by_month.png", visualize_sales_by_month, sales_by_month)]
+            self.assertEqual(render_charts(charts, output_dir, max_workers=1), ["by_month.png"])
+            self.assertTrue(output_dir.joinpath("by_month.png").exists())
+            self.assertEqual(render_charts(charts, output_dir, max_workers=1), [], "Same data should not be redrawn")
+
+            changed = sales_by_month.assign(TotalSales=[100.0, 250.5, 80.0])
+            charts = [Chart("by_month.png", visualize_sales_by_month, changed)]
+            self.assertEqual(render_charts(charts, output_dir, max_workers=1), ["by_month.png"])
+            self.assertEqual(render_charts(charts, output_dir, max_workers=1, force=True), ["by_month.png"])
+
+            output_dir.joinpath("by_month.png").unlink()
+            self.assertEqual(render_charts(charts, output_dir, max_workers=2), ["by_month.png"], "A deleted chart should be redrawn")
+
+    def test_interrupted_hash_write_keeps_the_previous_record(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output_dir = pathlib.Path(tmp)
+            render_charts([Chart("by_month.png", visualize_sales_by_month, sales_by_month)], output_dir, max_workers=1)
+            hashes_path = output_dir.joinpath(CHART_HASHES_FILE)
+            before = hashes_path.read_text()
+
+            changed = sales_by_month.assign(TotalSales=[100.0, 250.5, 80.0])
+            with mock.patch("os.replace", side_effect=OSError("disk full")), self.assertRaises(OSError):
+                render_charts([Chart("by_month.png", visualize_sales_by_month, changed)], output_dir, max_workers=1)
+            self.assertEqual(hashes_path.read_text(), before, "A failed write should not touch the hash record")
+
+    def test_edited_render_function_changes_the_hash(self):
+        def render(data, output_path):
+            return {"kind": "bar", "labels": frozenset({"Month", "TotalSales"})}
+
+        def edited(data, output_path):
+            return {"kind": "line", "labels": frozenset({"Month", "TotalSales"})}
+
+        edited.__qualname__ = render.__qualname__
+        chart = Chart("by_month.png", render, sales_by_month)
+        self.assertEqual(chart_content_hash(chart), chart_content_hash(chart._replace(data=sales_by_month.copy())))
+        self.assertNotEqual(chart_content_hash(chart), chart_content_hash(chart._replace(render=edited)))
+
+        # The same function hashes the same in a process with other string hashes
+        script = (
+            "import sys; sys.path.append(sys.argv[1]); "
+            "from scripts.olap.olap_goal_sales_by_month import *; "
+            "print(chart_content_hash(Chart('by_month.png', visualize_sales_by_month, "
+            "pd.DataFrame({'Month': [1, 2, 3], 'TotalSales': [100.0, 250.5, 75.25]}))))"
+        )
+        hashes = {
+            subprocess.run([sys.executable, "-c", script, str(PROJECT_ROOT)], env={**os.environ, "PYTHONHASHSEED": seed},
+                           check=True, capture_output=True, text=True).stdout.strip()
+            for seed in ("1", "2")
+        }
+        self.assertEqual(hashes, {chart_content_hash(Chart("by_month.png", visualize_sales_by_month, sales_by_month))})
+
+
+# Run the tests with verbosity=2 for detailed output
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,175 @@
+r"""
+tests/test_pipeline.py
+
+To run, open a terminal in the root project folder.
+Activate your virtual environment if needed, and run one of the following commands:
+
+    py tests\test_pipeline.py
+    python3 tests\test_pipeline.py
+
+This test suite verifies that the pipeline runner in scripts/pipeline.py runs
+independent stages at the same time, passes results between stages in memory,
+skips stages whose inputs are unchanged, and reports the critical path, that
+the smart_sales pipeline builds the same warehouse as data_prep.py and etl_to_dw.py run by hand,
+and that it runs on the raw files shipped in data/raw.
+"""
+
+import unittest
+import asyncio
+import pathlib
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from benchmarks.benchmark_pipeline import make_project  # noqa: E402
+from scripts.etl_to_dw import WAREHOUSE_MANIFESTS  # noqa: E402
+from scripts.pipeline import Stage, build_stages, order_stages, run_pipeline  # noqa: E402
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = pathlib.Path(self.tmp_dir.name)
+        self.state_path = self.tmp_path.joinpath("pipeline_state.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_stages(self, stages, force=False):
+        return asyncio.run(run_pipeline(stages, force=force, state_path=self.state_path))
+
+    def test_branches_overlap_and_pass_frames(self):
+        # Each branch waits at the barrier for the other, so run one after another they would time out
+        barrier = threading.Barrier(2, timeout=10)
+
+        def branch(values):
+            def run(upstream):
+                barrier.wait()
+                time.sleep(0.2 if values[0] == 1 else 0.0)
+                return pd.DataFrame({"value": values})
+            return run
+
+        stages = [
+            Stage("combine", lambda upstream: pd.concat([upstream["slow"], upstream["fast"]]), after=("slow", "fast")),
+            Stage("slow", branch([1, 2])),
+            Stage("fast", branch([3])),
+            Stage("total", lambda upstream: int(upstream["combine"]["value"].sum()), after=("combine",)),
+        ]
+        run = self.run_stages(stages)
+        self.assertEqual(run.results["total"], 6)
+        self.assertEqual([timing.name for timing in run.critical_path], ["slow", "combine", "total"])
+        self.assertLess(run.timings["fast"].start, run.timings["slow"].end)
+
+    def test_unchanged_inputs_are_skipped(self):
+        raw_path = self.tmp_path.joinpath("raw.csv")
+        prepared_path = self.tmp_path.joinpath("prepared.csv")
+        raw_path.write_text("a\n1\n")
+        calls = []
+
+        def prepare(upstream):
+            calls.append("prepare")
+            prepared_path.write_text(raw_path.read_text())
+            return pd.read_csv(raw_path)
+
+        def summarize(upstream):
+            calls.append("summarize")
+            df = pd.read_csv(prepared_path) if upstream["prepare"] is None else upstream["prepare"]
+            return int(df["a"].sum())
+
+        stages = [
+            Stage("prepare", prepare, inputs=(raw_path,), outputs=(prepared_path,)),
+            Stage("summarize", summarize, after=("prepare",)),
+        ]
+        self.assertEqual(self.run_stages(stages).results["summarize"], 1)
+        run = self.run_stages(stages)
+        self.assertEqual(calls, ["prepare", "summarize"], "Unchanged inputs should not run anything")
+        self.assertTrue(all(timing.skipped for timing in run.timings.values()))
+
+        raw_path.write_text("a\n1\n2\n")
+        self.assertEqual(self.run_stages(stages).results["summarize"], 3, "A changed input reruns its downstream stages")
+        prepared_path.unlink()
+        self.run_stages(stages)
+        self.assertTrue(prepared_path.exists(), "A missing output should be written again")
+        self.assertEqual(calls[-1], "prepare", "Its downstream stage has the same inputs, so it is still skipped")
+        self.run_stages(stages, force=True)
+        self.assertEqual(calls.count("prepare"), 4)
+        self.assertEqual(calls.count("summarize"), 3)
+
+    def test_invalid_dependencies(self):
+        with self.assertRaises(ValueError):
+            order_stages([Stage("a", print, after=("b",)), Stage("b", print, after=("a",))])
+        with self.assertRaises(ValueError):
+            order_stages([Stage("a", print, after=("missing",))])
+
+    def read_warehouse(self, folder):
+        """Every table of a project copy's smart_sales warehouse, except the load log and watermarks."""
+        manifest = WAREHOUSE_MANIFESTS["smart_sales"]
+        conn = sqlite3.connect(folder.joinpath(manifest.db_path))  # Relative to the folder a script runs in
+        try:
+            tables = [table.name for table in manifest.tables] + ["sale_wide", "etl_row_hash"]
+            return {table: pd.read_sql_query(f"SELECT * FROM {table} ORDER BY 1", conn) for table in tables}
+        finally:
+            conn.close()
+
+    def run_scripts(self, folder, *scripts):
+        for script in scripts:
+            subprocess.run([sys.executable, script], cwd=folder, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def test_smart_sales_pipeline_end_to_end(self):
+        # Synthetic raw files, as in benchmarks/benchmark_pipeline.py, in throwaway copies of the project
+        pipelined, by_hand = self.tmp_path.joinpath("pipelined"), self.tmp_path.joinpath("by_hand")
+        make_project(pipelined, rows=500)
+        make_project(by_hand, rows=500)
+
+        self.run_scripts(pipelined, "scripts/pipeline.py")
+        first = self.read_warehouse(pipelined)
+        log_path = pipelined.joinpath("logs", "project_log.log")
+        lines_before_rerun = len(log_path.read_text().splitlines())
+        self.run_scripts(pipelined, "scripts/pipeline.py")
+        rerun_log = "\n".join(log_path.read_text().splitlines()[lines_before_rerun:])
+        self.assertEqual(rerun_log.count("inputs unchanged; skipped"), len(build_stages()), "Every stage should be skipped")
+        second = self.read_warehouse(pipelined)
+
+        self.run_scripts(by_hand, "scripts/data_prep.py", "scripts/etl_to_dw.py")
+        expected = self.read_warehouse(by_hand)
+        self.assertEqual(len(expected["sale"]), 500)
+        for table, df in expected.items():
+            pd.testing.assert_frame_equal(first[table], df, obj=f"{table} after the first run")
+            pd.testing.assert_frame_equal(second[table], df, obj=f"{table} after the skipped rerun")
+
+    def test_smart_sales_pipeline_on_shipped_raw_files(self):
+        """The raw files in data/raw, with a nameless product and the PreferredContact Method header, go all the way through."""
+        folder = self.tmp_path.joinpath("shipped")
+        make_project(folder, rows=1)
+        raw_dir = folder.joinpath("data", "raw")
+        for raw_path in PROJECT_ROOT.joinpath("data", "raw").glob("*.csv"):
+            shutil.copy(raw_path, raw_dir)
+
+        self.run_scripts(folder, "scripts/pipeline.py")
+        warehouse = self.read_warehouse(folder)
+        prepared_dir = folder.joinpath("data", "prepared")
+        raw_products = pd.read_csv(raw_dir.joinpath("products_data.csv"))
+        nameless = raw_products.loc[raw_products["ProductName"].isna(), "ProductID"].tolist()
+        self.assertTrue(nameless, "The shipped products file should hold a product without a name")
+        self.assertFalse(warehouse["product"]["product_id"].isin(nameless).any(), "Products without a name are dropped")
+        self.assertTrue(warehouse["customer"]["preferred_contact_method"].notna().all())
+        for table, file_name in (("customer", "customers_data_prepared.csv"), ("sale", "sales_data_prepared.csv")):
+            self.assertEqual(len(warehouse[table]), len(pd.read_csv(prepared_dir.joinpath(file_name))), table)
+        self.assertGreater(len(warehouse["sale"]), 90)
+
+
+# Run the tests with verbosity=2 for detailed output
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
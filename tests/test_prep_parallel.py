@@ -0,0 +1,110 @@
+r"""
+tests/test_prep_parallel.py
+
+To run, open a terminal in the root project folder.
+Activate your virtual environment if needed, and run one of the following commands:
+
+    py tests\test_prep_parallel.py
+    python3 tests\test_prep_parallel.py
+
+This test suite verifies that sharded, parallel prep in scripts/prep_parallel.py
+gives the same prepared file as cleaning the whole raw file at once, and quarantines
+the same sales when the shards check their own foreign keys.
+"""
+
+import unittest
+import pathlib
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from scripts.data_prep import PREPARED_DATA_DIR, RAW_DATA_DIR, enforce_foreign_keys, load_key_indexes  # noqa: E402
+from scripts.prep_parallel import (  # noqa: E402
+    PrepJob,
+    clean_sales,
+    find_cross_shard_duplicates,
+    prepare_whole_file,
+    run_prep_jobs,
+    split_into_shards,
+)
+
+
+class TestParallelPrep(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = pathlib.Path(self.tmp_dir.name)
+        # The real raw sales file, repeated so that duplicates land in different shards
+        raw = pd.read_csv(RAW_DATA_DIR.joinpath("sales_data.csv"), dtype=str)
+        raw = pd.concat([raw, raw.iloc[::-1], raw], ignore_index=True)
+        # A missing StoreID near the end makes a whole-file read infer floats for the column,
+        # while the shards before it would read integers
+        raw.loc[len(raw) - 3, "StoreID"] = None
+        self.raw_path = self.tmp_path.joinpath("sales_data.csv")
+        raw.to_csv(self.raw_path, index=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_shards_cover_every_line_once(self):
+        header, ranges = split_into_shards(self.raw_path, 700)
+        data = self.raw_path.read_bytes()
+        self.assertGreater(len(ranges), 5)
+        self.assertEqual(header + b"".join(data[start:stop] for start, stop in ranges), data)
+        self.assertTrue(all(data[stop - 1:stop] == b"\n" for _, stop in ranges))
+
+    def test_cross_shard_duplicates_keep_the_earliest_shard(self):
+        shards = [np.array([7, 3, 9], dtype=np.uint64), np.array([4, 9, 1], dtype=np.uint64),
+                  np.array([], dtype=np.uint64), np.array([1, 3, 7, 8], dtype=np.uint64)]
+        orders = [np.argsort(hashes, kind="stable") for hashes in shards]
+        duplicates = find_cross_shard_duplicates([hashes[order] for hashes, order in zip(shards, orders)], orders)
+        self.assertEqual([duplicate.tolist() for duplicate in duplicates],
+                         [[False, False, False], [False, True, False], [], [True, True, True, False]])
+
+    def test_sharded_prep_matches_whole_file(self):
+        expected_path = self.tmp_path.joinpath("whole.csv")
+        expected_rows, _ = prepare_whole_file(PrepJob("sales", self.raw_path, expected_path, clean_sales))
+
+        sharded_path = self.tmp_path.joinpath("sharded.csv")
+        job = PrepJob("sales", self.raw_path, sharded_path, clean_sales)
+        rows = run_prep_jobs([job], max_workers=2, shard_bytes=700)
+
+        self.assertEqual(rows["sales"], expected_rows)
+        self.assertEqual(sharded_path.read_text(), expected_path.read_text())
+        self.assertIn("Unknown", pd.read_csv(sharded_path, dtype=str)["StoreID"].tolist())
+
+    def test_shards_check_their_own_foreign_keys(self):
+        """Sharded sales are checked against the dimension files in the workers, as the whole file would be."""
+        customers = pd.read_csv(PREPARED_DATA_DIR.joinpath("customers_data_prepared.csv"))
+        customers_path = self.tmp_path.joinpath("customers.csv")
+        customers.iloc[2:].to_csv(customers_path, index=False)  # Sales of the first two customers become orphans
+        foreign_keys = {"CustomerID": (customers_path, "CustomerID")}
+
+        whole_path = self.tmp_path.joinpath("whole.csv")
+        prepare_whole_file(PrepJob("sales", self.raw_path, whole_path, clean_sales))
+        whole = pd.read_csv(whole_path, dtype=str, keep_default_na=False, na_values=[""])
+        expected_orphans_path = self.tmp_path.joinpath("expected_orphans.csv")
+        expected = enforce_foreign_keys(whole, load_key_indexes(foreign_keys), expected_orphans_path)
+
+        for shard_bytes in (700, 10**9):
+            sharded_path = self.tmp_path.joinpath(f"sharded_{shard_bytes}.csv")
+            orphans_path = self.tmp_path.joinpath("quarantine", f"orphans_{shard_bytes}.csv")
+            orphans_path.parent.mkdir(exist_ok=True)
+            orphans_path.write_text("left over from an earlier run\n")
+            job = PrepJob("sales", self.raw_path, sharded_path, clean_sales, foreign_keys, orphans_path)
+            rows = run_prep_jobs([job], max_workers=2, shard_bytes=shard_bytes)
+            self.assertEqual(rows["sales"], len(expected))
+            self.assertEqual(sharded_path.read_text(), expected.to_csv(index=False))
+            self.assertEqual(orphans_path.read_text(), expected_orphans_path.read_text())
+        self.assertGreater(len(pd.read_csv(expected_orphans_path)), 2)
+
+
+# Run the tests with verbosity=2 for detailed output
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,78 @@
+r"""
+tests/test_warehouse.py
+
+To run, open a terminal in the root project folder.
+Activate your virtual environment if needed, and run one of the following commands:
+
+    py tests\test_warehouse.py
+    python3 tests\test_warehouse.py
+
+This test suite verifies that readers from scripts/warehouse.py keep working,
+on a consistent snapshot, while a writer commits.
+"""
+
+import unittest
+import pathlib
+import sqlite3
+import sys
+import tempfile
+
+# For local imports, temporarily add project root to Python sys.path
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+from scripts.warehouse import close_pools, connect_writer, read_snapshot, reader, warehouse_generation  # noqa: E402
+
+
+class TestWarehouse(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = pathlib.Path(self.tmp_dir.name).joinpath("test_dw.db")
+        self.writer = connect_writer(self.db_path)
+        self.writer.execute("CREATE TABLE sale (sale_id INTEGER PRIMARY KEY, sale_amount_usd REAL)")
+        self.writer.execute("CREATE TABLE etl_load_log (generation INTEGER PRIMARY KEY, loaded_at TEXT, incremental INTEGER)")
+        self.load(range(10))
+
+    def tearDown(self):
+        self.writer.close()
+        close_pools()
+        self.tmp_dir.cleanup()
+
+    def load(self, sale_ids):
+        """Insert sales and log the load in one transaction, like etl_to_dw.load_data_to_db()."""
+        with self.writer:
+            self.writer.executemany("INSERT INTO sale VALUES (?, 1.0)", [(sale_id,) for sale_id in sale_ids])
+            self.writer.execute("INSERT INTO etl_load_log (loaded_at, incremental) VALUES ('now', 1)")
+
+    def test_snapshot_is_stable_while_a_load_commits(self):
+        self.assertEqual(self.writer.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        with read_snapshot(self.db_path) as conn:
+            before = conn.execute("SELECT COUNT(*) FROM sale").fetchone()[0]
+            generation = warehouse_generation(conn)
+            self.load(range(10, 15))  # Would raise "database is locked" under a rollback journal
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM sale").fetchone()[0], before)
+            self.assertEqual(warehouse_generation(conn), generation)
+        with reader(self.db_path) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM sale").fetchone()[0], 15)
+            self.assertEqual(warehouse_generation(conn), generation + 1)
+
+    def test_readers_are_pooled_and_read_only(self):
+        with reader(self.db_path) as first:
+            with self.assertRaises(sqlite3.OperationalError):
+                first.execute("DELETE FROM sale")
+        with reader(self.db_path) as second:
+            self.assertIs(second, first, "A returned connection should be reused")
+            with reader(self.db_path) as third:
+                self.assertIsNot(third, second, "A connection in use should not be lent twice")
+
+    def test_generation_without_load_log(self):
+        self.writer.execute("DROP TABLE etl_load_log")
+        with reader(self.db_path) as conn:
+            self.assertIsNone(warehouse_generation(conn))
+
+
+# Run the tests with verbosity=2 for detailed output
+if __name__ == "__main__":
+    unittest.main(verbosity=2)